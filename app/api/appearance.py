@@ -1,18 +1,20 @@
 import logging
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 from sqlalchemy.orm import Session
 
 import app.models as models
 import app.schemas as schemas
+from app.core.config import settings
 from app.core.dependencies import require_admin
 from app.core.exceptions import BusinessException
 from app.core.operation_result import OperationStatus
 from app.core.paging import PagingData
 from app.core.response import Response
 from app.core.result_codes import ResultCode
-from app.crud import crud_appearance
+from app.crud import crud_appearance, crud_appearance_analytics, crud_appearance_market_stats, \
+    crud_appearance_similarity
 from app.db.database import get_db
 
 router = APIRouter()
@@ -36,6 +38,54 @@ def create_appearance(
     return Response(data=new_appearance)
 
 
+@router.get("/top-movers", response_model=Response[List[schemas.AppearanceWithMarketStats]])
+def get_top_movers(
+        window: str = Query("24h", enum=list(crud_appearance.TOP_MOVER_WINDOWS)),
+        direction: str = Query(
+            crud_appearance.TOP_MOVERS_GAINERS,
+            enum=[crud_appearance.TOP_MOVERS_GAINERS, crud_appearance.TOP_MOVERS_LOSERS]
+        ),
+        appearance_type_id: Optional[int] = None,
+        limit: int = Query(20, ge=1, le=settings.APPEARANCE_TOP_MOVERS_MAX_LIMIT),
+        db: Session = Depends(get_db)
+):
+    """Biggest gainers or losers over the window, as of the last market stats refresh."""
+    logger.info(f"Fetching top movers with window: {window}, direction: {direction}, appearance_type_id: {appearance_type_id}, limit: {limit}")
+    operation_result = crud_appearance.get_top_movers(
+        db,
+        window=window,
+        direction=direction,
+        appearance_type_id=appearance_type_id,
+        limit=limit
+    )
+    logger.info(f"Found {len(operation_result.data)} top movers")
+    return Response(data=operation_result.data)
+
+
+@router.get("/price-spreads", response_model=Response[PagingData[schemas.AppearancePriceSpread]])
+def get_price_spreads(
+        page: int = 1,
+        page_size: int = 100,
+        sort_by: str = Query("spread", enum=list(crud_appearance_market_stats.SPREAD_SORT_COLUMNS)),
+        sort_order: str = Query('desc', enum=["asc", "desc"]),
+        db: Session = Depends(get_db)
+):
+    """
+    Latest price per platform, spread and fee-adjusted margin of appearances priced on at least two platforms
+    within PRICE_SPREAD_MAX_AGE_HOURS, as of the last market stats refresh.
+    """
+    logger.info(f"Fetching price spreads with page: {page}, page_size: {page_size}, sort_by: {sort_by}, sort_order: {sort_order}")
+    operation_result = crud_appearance_market_stats.get_price_spreads(
+        db,
+        page=page,
+        page_size=page_size,
+        sort_by=sort_by,
+        sort_order=sort_order
+    )
+    logger.info(f"Found {len(operation_result.data.items)} price spreads, total: {operation_result.data.total_count}")
+    return Response(data=operation_result.data)
+
+
 @router.get("/{appearance_id}", response_model=Response[schemas.Appearance])
 def get_appearance(
         appearance_id: int,
@@ -52,15 +102,78 @@ def get_appearance(
     return Response(data=operation_result.data)
 
 
-@router.get("", response_model=Response[PagingData[schemas.Appearance]])
+@router.get("/{appearance_id}/similar", response_model=Response[List[schemas.SimilarAppearance]])
+def get_similar_appearances(
+        appearance_id: int,
+        limit: int = Query(10, ge=1, le=settings.APPEARANCE_SIMILARITY_TOP_K),
+        db: Session = Depends(get_db)
+):
+    """Appearances whose daily price returns correlate most with this one, as of the last similarity job run."""
+    logger.info(f"Fetching up to {limit} similar appearances for appearance ID: {appearance_id}")
+    operation_result = crud_appearance_similarity.get_similar_appearances(db, appearance_id=appearance_id, limit=limit)
+    if operation_result.status == OperationStatus.NOT_FOUND:
+        logger.warning(f"Appearance with ID {appearance_id} not found.")
+        raise BusinessException(ResultCode.NOT_FOUND)
+
+    logger.info(f"Found {len(operation_result.data)} similar appearances for appearance ID: {appearance_id}")
+    return Response(data=operation_result.data)
+
+
+@router.get("/{appearance_id}/analytics", response_model=Response[schemas.AppearancePriceAnalytics])
+def get_appearance_price_analytics(
+        appearance_id: int,
+        window_days: int = Query(90, ge=2, le=settings.APPEARANCE_ANALYTICS_MAX_DAYS),
+        platform_id: Optional[int] = None,
+        short_ma_days: int = Query(7, ge=1, le=settings.APPEARANCE_ANALYTICS_MAX_DAYS),
+        long_ma_days: int = Query(30, ge=1, le=settings.APPEARANCE_ANALYTICS_MAX_DAYS),
+        volatility_days: int = Query(30, ge=2, le=settings.APPEARANCE_ANALYTICS_MAX_DAYS),
+        db: Session = Depends(get_db)
+):
+    """Volatility, max drawdown, moving averages and z-score of the current price, from the daily candles."""
+    logger.info(f"Fetching price analytics for appearance ID: {appearance_id}, window_days: {window_days}, platform_id: {platform_id}")
+    operation_result = crud_appearance_analytics.get_appearance_price_analytics(
+        db,
+        appearance_id=appearance_id,
+        window_days=window_days,
+        platform_id=platform_id,
+        short_ma_days=short_ma_days,
+        long_ma_days=long_ma_days,
+        volatility_days=volatility_days
+    )
+    if operation_result.status == OperationStatus.NOT_FOUND:
+        logger.warning(f"Appearance with ID {appearance_id} not found.")
+        raise BusinessException(ResultCode.NOT_FOUND)
+
+    logger.info(f"Price analytics for appearance ID {appearance_id} computed from {operation_result.data.observation_count} daily closes")
+    return Response(data=operation_result.data)
+
+
+@router.get("", response_model=Response[PagingData[schemas.AppearanceWithMarketStats]])
 def get_appearances(
         page: int = 1,
         page_size: int = 100,
         search_query: Optional[str] = None,
+        sort_by: str | None = Query(None, enum=list(crud_appearance.MARKET_STATS_SORT_COLUMNS)),
+        sort_order: str = Query('asc', enum=["asc", "desc"]),
+        min_price_cents: Optional[int] = Query(None, ge=0),
+        max_price_cents: Optional[int] = Query(None, ge=0),
         db: Session = Depends(get_db)
 ):
-    logger.info(f"Fetching appearances with page: {page}, page_size: {page_size}, search_query: {search_query}")
-    operation_result = crud_appearance.get_appearances(db, page=page, page_size=page_size, search_query=search_query)
+    """
+    Without ``sort_by`` appearances are ordered by id. Sorting by a market stat or filtering by current price
+    only returns appearances that have the stat.
+    """
+    logger.info(f"Fetching appearances with page: {page}, page_size: {page_size}, search_query: {search_query}, sort_by: {sort_by}, sort_order: {sort_order}, min_price_cents: {min_price_cents}, max_price_cents: {max_price_cents}")
+    operation_result = crud_appearance.get_appearances(
+        db,
+        page=page,
+        page_size=page_size,
+        search_query=search_query,
+        sort_by=sort_by,
+        sort_order=sort_order,
+        min_price_cents=min_price_cents,
+        max_price_cents=max_price_cents
+    )
     logger.info(f"Found {len(operation_result.data.items)} appearances, total: {operation_result.data.total_count}")
     return Response(data=operation_result.data)
 
@@ -0,0 +1,53 @@
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+import app.schemas as schemas
+from app.core.exceptions import BusinessException
+from app.core.operation_result import OperationStatus
+from app.core.response import Response
+from app.core.result_codes import ResultCode
+from app.crud import crud_market_index
+from app.db.database import get_db
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+
+@router.get("", response_model=Response[List[schemas.MarketIndex]])
+def get_market_indexes(db: Session = Depends(get_db)):
+    """Current level of the market-wide and every per-type index."""
+    logger.info("Fetching market indexes")
+    operation_result = crud_market_index.get_market_indexes(db)
+    logger.info(f"Found {len(operation_result.data)} market indexes")
+    return Response(data=operation_result.data)
+
+
+@router.get("/levels", response_model=Response[schemas.MarketIndexHistory])
+def get_market_index_levels(
+        weighting: str = Query(crud_market_index.WEIGHTING_LISTINGS, enum=list(crud_market_index.WEIGHTINGS)),
+        appearance_type_id: Optional[int] = None,
+        resolution: str = Query('hour', enum=["hour", "day"]),
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        db: Session = Depends(get_db)
+):
+    """Level history of the market-wide index, or of one appearance type's index with ``appearance_type_id``."""
+    logger.info(f"Fetching {resolution} {weighting} market index levels for appearance_type_id: {appearance_type_id}, start_date: {start_date}, end_date: {end_date}")
+    operation_result = crud_market_index.get_market_index_levels(
+        db,
+        weighting=weighting,
+        appearance_type_id=appearance_type_id,
+        resolution=resolution,
+        start_date=start_date,
+        end_date=end_date
+    )
+    if operation_result.status == OperationStatus.NOT_FOUND:
+        logger.warning(f"No {weighting} market index for appearance_type_id: {appearance_type_id}")
+        raise BusinessException(ResultCode.NOT_FOUND)
+
+    logger.info(f"Found {len(operation_result.data.levels)} market index levels")
+    return Response(data=operation_result.data)
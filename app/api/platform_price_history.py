@@ -1,34 +1,156 @@
 import logging
+from datetime import datetime
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, BackgroundTasks, Body, Depends, status
+from fastapi.params import Query
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import StreamingResponse
 
 import app.models as models
 import app.schemas as schemas
-from app.core.dependencies import require_admin
+from app.core.config import settings
+from app.core.dependencies import require_admin, get_current_user
 from app.core.exceptions import BusinessException
 from app.core.operation_result import OperationStatus
 from app.core.paging import PagingData
 from app.core.response import Response
 from app.core.result_codes import ResultCode
-from app.crud import crud_platform_price_history
-from app.db.database import get_db
+from app.crud import crud_platform_price_history, crud_platform_price_candle, crud_platform_price_quarantine
+from app.db.database import get_db, SessionLocal
+from app.services import price_history_ingest_queue, price_history_delete_jobs
+from app.services.price_downsampling import MIN_POINTS
+from app.services.price_history_stream import PriceHistoryStreamReader, resolve_stream_format, \
+    encode_price_history_export, media_type_for_format
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 
-@router.post("", status_code=status.HTTP_201_CREATED)
+@router.post("", status_code=status.HTTP_201_CREATED, response_model=Response[schemas.PlatformPriceHistoryIngestResult])
 def create_platform_price_histories(
         histories: List[schemas.PlatformPriceHistoryCreate],
+        on_conflict: str = Query('skip', enum=["skip", "update"]),
+        changes_only: bool = False,
         db: Session = Depends(get_db),
         current_user: models.User = Depends(require_admin)
 ):
-    logger.info(f"User {current_user.email} is creating {len(histories)} new platform price histories.")
-    operation_result = crud_platform_price_history.create_platform_price_histories(db=db, histories=histories)
-    logger.info(f"Successfully created {operation_result.data} platform price histories.")
-    return Response(message=f"Successfully created {operation_result.data} platform price histories.")
+    logger.info(f"User {current_user.email} is creating {len(histories)} new platform price histories, on_conflict: {on_conflict}, changes_only: {changes_only}")
+    operation_result = crud_platform_price_history.create_platform_price_histories(
+        db=db,
+        histories=histories,
+        on_conflict=on_conflict,
+        changes_only=changes_only
+    )
+    ingest_result = operation_result.data
+    if ingest_result.rejected:
+        logger.warning(f"{len(ingest_result.rejected)} platform price histories rejected for unknown references or expired months")
+    logger.info(
+        f"Platform price histories ingested, inserted: {ingest_result.inserted}, updated: {ingest_result.updated}, skipped: {ingest_result.skipped}, unchanged: {ingest_result.unchanged}, quarantined: {ingest_result.quarantined}, released: {ingest_result.released}")
+    return Response(
+        message=f"Successfully created {ingest_result.inserted} platform price histories.",
+        data=ingest_result
+    )
+
+
+@router.post("/by-platform-appearance-id", status_code=status.HTTP_201_CREATED,
+             response_model=Response[schemas.PlatformPriceHistoryIngestResult])
+def create_platform_price_histories_by_platform_appearance_id(
+        histories: List[schemas.PlatformPriceHistoryExternalCreate],
+        on_conflict: str = Query('skip', enum=["skip", "update"]),
+        changes_only: bool = False,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(require_admin)
+):
+    """Ingest points keyed by the platform's own item id; unknown ids are listed in ``unresolved``."""
+    logger.info(f"User {current_user.email} is creating {len(histories)} platform price histories by platform appearance id, on_conflict: {on_conflict}, changes_only: {changes_only}")
+    operation_result = crud_platform_price_history.create_platform_price_histories_by_platform_appearance_id(
+        db=db,
+        histories=histories,
+        on_conflict=on_conflict,
+        changes_only=changes_only
+    )
+    ingest_result = operation_result.data
+    if ingest_result.unresolved:
+        logger.warning(f"{len(ingest_result.unresolved)} platform appearance ids could not be resolved")
+    if ingest_result.rejected:
+        logger.warning(f"{len(ingest_result.rejected)} platform price histories rejected for unknown references or expired months")
+    logger.info(
+        f"Platform price histories ingested, inserted: {ingest_result.inserted}, updated: {ingest_result.updated}, skipped: {ingest_result.skipped}, unchanged: {ingest_result.unchanged}, quarantined: {ingest_result.quarantined}, released: {ingest_result.released}")
+    return Response(
+        message=f"Successfully created {ingest_result.inserted} platform price histories.",
+        data=ingest_result
+    )
+
+
+@router.post("/async", status_code=status.HTTP_202_ACCEPTED,
+             response_model=Response[schemas.PlatformPriceHistoryIngestBatch])
+def enqueue_platform_price_histories(
+        histories: List[schemas.PlatformPriceHistoryCreate],
+        on_conflict: str = Query('skip', enum=["skip", "update"]),
+        changes_only: bool = False,
+        current_user: models.User = Depends(require_admin)
+):
+    """
+    Queue a batch for the ingest worker and return immediately.
+
+    Queued batches are coalesced into larger transactions; poll ``/batches/{batch_id}`` for the outcome.
+    """
+    logger.info(f"User {current_user.email} is queueing {len(histories)} platform price histories, on_conflict: {on_conflict}, changes_only: {changes_only}")
+    ingest_batch = price_history_ingest_queue.enqueue_batch(histories, on_conflict=on_conflict, changes_only=changes_only)
+    logger.info(f"Queued platform price history batch {ingest_batch.batch_id}")
+    return Response(message="Platform price histories queued for ingestion.", data=ingest_batch)
+
+
+@router.get("/batches/{batch_id}", response_model=Response[schemas.PlatformPriceHistoryIngestBatch])
+def get_platform_price_history_batch(
+        batch_id: str,
+        current_user: models.User = Depends(require_admin)
+):
+    ingest_batch = price_history_ingest_queue.get_batch_status(batch_id)
+    if ingest_batch is None:
+        logger.warning(f"Platform price history batch {batch_id} not found")
+        raise BusinessException(ResultCode.NOT_FOUND)
+    return Response(data=ingest_batch)
+
+
+@router.post("/stream", status_code=status.HTTP_201_CREATED,
+             response_model=Response[schemas.PlatformPriceHistoryIngestResult])
+async def stream_platform_price_histories(
+        request: Request,
+        on_conflict: str = Query('skip', enum=["skip", "update"]),
+        changes_only: bool = False,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(require_admin)
+):
+    """
+    Bulk ingest a (optionally gzip-compressed) CSV or NDJSON body through Postgres COPY.
+
+    CSV bodies start with a header naming the columns; send ``Content-Encoding: gzip`` for compressed bodies.
+    """
+    stream_format = resolve_stream_format(request.headers.get("content-type"))
+    if not stream_format:
+        logger.warning(f"User {current_user.email} sent unsupported content type: {request.headers.get('content-type')}")
+        raise BusinessException(ResultCode.UNSUPPORTED_PRICE_HISTORY_FORMAT)
+
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    logger.info(f"User {current_user.email} is streaming {stream_format} platform price histories, gzipped: {gzipped}")
+    reader = PriceHistoryStreamReader(request.stream(), stream_format=stream_format, gzipped=gzipped)
+    operation_result = await run_in_threadpool(
+        crud_platform_price_history.copy_platform_price_histories,
+        db,
+        reader,
+        on_conflict,
+        changes_only
+    )
+    if operation_result.status == OperationStatus.INVALID:
+        logger.warning(f"Invalid platform price history stream from user {current_user.email}: {operation_result.data}")
+        raise BusinessException(ResultCode.INVALID_PRICE_HISTORY_STREAM)
+
+    logger.info(f"Successfully streamed {operation_result.data.accepted} platform price histories.")
+    return Response(data=operation_result.data)
 
 
 @router.get("", response_model=Response[PagingData[schemas.PlatformPriceHistory]])
@@ -37,21 +159,200 @@ def get_platform_price_histories(
         page_size: int = 100,
         platform_id: Optional[int] = None,
         appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        max_points: Optional[int] = Query(None, ge=MIN_POINTS, le=settings.PRICE_HISTORY_MAX_POINTS_LIMIT),
         db: Session = Depends(get_db)
 ):
-    logger.info(f"Fetching platform price histories with page: {page}, page_size: {page_size}, platform_id: {platform_id}, appearance_id: {appearance_id}")
+    logger.info(f"Fetching platform price histories with page: {page}, page_size: {page_size}, platform_id: {platform_id}, appearance_id: {appearance_id}, start_date: {start_date}, end_date: {end_date}, max_points: {max_points}")
+    # 降采样要把范围内的点全部读进内存，必须限定饰品或完整的时间范围
+    if max_points and appearance_id is None and (start_date is None or end_date is None):
+        logger.warning("Rejected downsampling without appearance_id or a bounded date range")
+        raise BusinessException(ResultCode.UNBOUNDED_PRICE_HISTORY_DOWNSAMPLING)
     operation_result = crud_platform_price_history.get_platform_price_histories(
         db,
         page=page,
         page_size=page_size,
         platform_id=platform_id,
-        appearance_id=appearance_id
+        appearance_id=appearance_id,
+        start_date=start_date,
+        end_date=end_date,
+        max_points=max_points
     )
+    if operation_result.status == OperationStatus.INVALID:
+        logger.warning("Rejected a price history read reaching archived months without appearance_id or a bounded date range")
+        raise BusinessException(ResultCode.UNBOUNDED_ARCHIVED_PRICE_HISTORY_READ)
     logger.info(
         f"Found {len(operation_result.data.items)} platform price histories, total: {operation_result.data.total_count}")
     return Response(data=operation_result.data)
 
 
+def _export_platform_price_histories(stream_format: str, **filters):
+    # 响应体在依赖退出后才开始发送，因此导出使用自己的会话，直到游标读完才关闭
+    db = SessionLocal()
+    try:
+        rows = crud_platform_price_history.iter_platform_price_histories(db, **filters)
+        yield from encode_price_history_export(rows, stream_format)
+    finally:
+        db.close()
+
+
+@router.get("/series", response_model=Response[List[schemas.PlatformPriceSeries]])
+def get_platform_price_series(
+        appearance_ids: List[int] = Query(..., max_length=settings.PRICE_HISTORY_SERIES_MAX_APPEARANCES),
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: Optional[int] = Query(None, ge=1),
+        max_points: Optional[int] = Query(None, ge=MIN_POINTS, le=settings.PRICE_HISTORY_MAX_POINTS_LIMIT),
+        db: Session = Depends(get_db)
+):
+    """
+    Price series of up to PRICE_HISTORY_SERIES_MAX_APPEARANCES appearances in one round trip.
+
+    Returns one series per (appearance, platform): the points within [start_date, end_date], or the last
+    ``limit`` points (PRICE_HISTORY_FETCH_COUNT by default when no start_date is given).
+    """
+    logger.info(f"Fetching price series of {len(appearance_ids)} appearances with platform_id: {platform_id}, start_date: {start_date}, end_date: {end_date}, limit: {limit}, max_points: {max_points}")
+    operation_result = crud_platform_price_history.get_platform_price_series(
+        db,
+        appearance_ids=appearance_ids,
+        platform_id=platform_id,
+        start_date=start_date,
+        end_date=end_date,
+        limit=limit,
+        max_points=max_points
+    )
+    logger.info(f"Found {len(operation_result.data)} price series")
+    return Response(data=operation_result.data)
+
+
+@router.post("/as-of", response_model=Response[List[schemas.PlatformPriceAsOf]])
+def get_platform_prices_as_of(
+        queries: List[schemas.PlatformPriceAsOfQuery] = Body(..., max_length=settings.PRICE_HISTORY_AS_OF_MAX_QUERIES),
+        platform_id: Optional[int] = None,
+        db: Session = Depends(get_db)
+):
+    """
+    The price in effect on every platform for each (appearance_id, at) pair, in request order.
+
+    A read sent as POST because a request may carry thousands of pairs.
+    """
+    logger.info(f"Looking up prices as of {len(queries)} points in time, platform_id: {platform_id}")
+    operation_result = crud_platform_price_history.get_platform_prices_as_of(
+        db,
+        queries=queries,
+        platform_id=platform_id
+    )
+    return Response(data=operation_result.data)
+
+
+@router.get("/export")
+def export_platform_price_histories(
+        format: str = Query('csv', enum=["csv", "ndjson"]),
+        platform_id: Optional[int] = None,
+        appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        current_user: models.User = Depends(get_current_user)
+):
+    """Stream every matching price point as CSV or NDJSON in a single pass, ordered by recorded_at."""
+    logger.info(f"User {current_user.email} is exporting platform price histories as {format}, platform_id: {platform_id}, appearance_id: {appearance_id}, start_date: {start_date}, end_date: {end_date}")
+    return StreamingResponse(
+        _export_platform_price_histories(
+            format,
+            platform_id=platform_id,
+            appearance_id=appearance_id,
+            start_date=start_date,
+            end_date=end_date
+        ),
+        media_type=media_type_for_format(format),
+        headers={"Content-Disposition": f'attachment; filename="platform_price_histories.{format}"'}
+    )
+
+
+@router.get("/quarantine", response_model=Response[PagingData[schemas.PlatformPriceQuarantine]])
+def get_quarantined_platform_prices(
+        page: int = 1,
+        page_size: int = 100,
+        appearance_id: Optional[int] = None,
+        platform_id: Optional[int] = None,
+        db: Session = Depends(get_db),
+        current_user: models.User = Depends(require_admin)
+):
+    """Incoming points held back by the outlier filter, newest first."""
+    logger.info(f"User {current_user.email} is fetching quarantined platform prices with page: {page}, page_size: {page_size}, appearance_id: {appearance_id}, platform_id: {platform_id}")
+    operation_result = crud_platform_price_quarantine.get_quarantined_prices(
+        db,
+        page=page,
+        page_size=page_size,
+        appearance_id=appearance_id,
+        platform_id=platform_id
+    )
+    logger.info(f"Found {len(operation_result.data.items)} quarantined platform prices, total: {operation_result.data.total_count}")
+    return Response(data=operation_result.data)
+
+
+@router.get("/candles", response_model=Response[List[schemas.PlatformPriceCandle]])
+def get_platform_price_candles(
+        appearance_id: int,
+        resolution: str = Query('day', enum=["hour", "day"]),
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        db: Session = Depends(get_db)
+):
+    logger.info(f"Fetching {resolution} candles for appearance_id: {appearance_id}, platform_id: {platform_id}, start_date: {start_date}, end_date: {end_date}")
+    operation_result = crud_platform_price_candle.get_platform_price_candles(
+        db,
+        appearance_id=appearance_id,
+        resolution=resolution,
+        platform_id=platform_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    logger.info(f"Found {len(operation_result.data)} candles for appearance_id: {appearance_id}")
+    return Response(data=operation_result.data)
+
+
+@router.post("/bulk-delete", status_code=status.HTTP_202_ACCEPTED,
+             response_model=Response[schemas.PlatformPriceHistoryDeleteJob])
+def bulk_delete_platform_price_histories(
+        delete_filter: schemas.PlatformPriceHistoryBulkDelete,
+        background_tasks: BackgroundTasks,
+        current_user: models.User = Depends(require_admin)
+):
+    """
+    Delete every point in [start_date, end_date], optionally of one platform / appearance, in the background.
+
+    Points are deleted in chunks of PRICE_HISTORY_DELETE_CHUNK_SIZE; poll ``/delete-jobs/{job_id}`` for progress.
+    Ranges reaching archived months are rejected, their points are kept in Parquet files.
+    """
+    if delete_filter.start_date > delete_filter.end_date:
+        logger.warning(f"User {current_user.email} sent an empty bulk delete range")
+        raise BusinessException(ResultCode.INVALID_PRICE_HISTORY_DATE_RANGE)
+    if price_history_delete_jobs.reaches_archived_months(delete_filter):
+        logger.warning(f"User {current_user.email} tried to bulk delete archived months: {delete_filter}")
+        raise BusinessException(ResultCode.ARCHIVED_PRICE_HISTORY_DELETE)
+
+    logger.info(f"User {current_user.email} is bulk deleting platform price histories: {delete_filter}")
+    job = price_history_delete_jobs.create_job(delete_filter)
+    background_tasks.add_task(price_history_delete_jobs.run_job, job.job_id, delete_filter)
+    return Response(message="Platform price history deletion started.", data=job)
+
+
+@router.get("/delete-jobs/{job_id}", response_model=Response[schemas.PlatformPriceHistoryDeleteJob])
+def get_platform_price_history_delete_job(
+        job_id: str,
+        current_user: models.User = Depends(require_admin)
+):
+    job = price_history_delete_jobs.get_job(job_id)
+    if job is None:
+        logger.warning(f"Platform price history delete job {job_id} not found")
+        raise BusinessException(ResultCode.NOT_FOUND)
+    return Response(data=job)
+
+
 @router.delete("/{platform_price_history_id}", response_model=Response)
 def delete_platform_price_history(
         platform_price_history_id: int,
@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 
 from fastapi import APIRouter, Depends
 from fastapi.params import Query
@@ -6,11 +7,13 @@ from sqlalchemy.orm import Session
 
 import app.models as models
 import app.schemas as schemas
+from app.core.config import settings
 from app.core.dependencies import get_current_user
 from app.core.paging import PagingData
 from app.core.response import Response
 from app.crud import crud_user_portfolio
 from app.db.database import get_db
+from app.services.price_downsampling import MIN_POINTS
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -25,15 +28,21 @@ def read_user_portfolio(
         sort_by: str | None = Query(
             None, enum=["quantity", "total_investment", "profit_loss", "current_market_value"]),
         sort_order: str = Query('desc', enum=["asc", "desc"]),
+        max_points: Optional[int] = Query(None, ge=MIN_POINTS, le=settings.PRICE_HISTORY_MAX_POINTS_LIMIT),
 ):
-    logger.info(f"User {current_user.email} is fetching their portfolio with page: {page}, page_size: {page_size}, sort_by: {sort_by}, sort_order: {sort_order}")
+    """
+    Without ``max_points`` each item carries its latest PRICE_HISTORY_FETCH_COUNT price points; with it, the
+    whole lookback window downsampled to at most ``max_points`` points per platform.
+    """
+    logger.info(f"User {current_user.email} is fetching their portfolio with page: {page}, page_size: {page_size}, sort_by: {sort_by}, sort_order: {sort_order}, max_points: {max_points}")
     operation_result = crud_user_portfolio.get_user_portfolio(
         db=db,
         user_id=current_user.id,
         page=page,
         page_size=page_size,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        max_points=max_points
     )
     logger.info(f"User {current_user.email} portfolio fetched successfully with {len(operation_result.data.items)} items, total: {operation_result.data.total_count}")
     return Response(data=operation_result.data)
@@ -1,3 +1,4 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 
@@ -17,6 +18,101 @@ class Settings(BaseSettings):
     LOGIN_ATTEMPT_WINDOW_MINUTES: int = 30
 
     PRICE_HISTORY_FETCH_COUNT: int = 30
+    # Upper bound of the max_points (LTTB downsampling) parameter of price history reads
+    PRICE_HISTORY_MAX_POINTS_LIMIT: int = 5000
+    # Maximum number of appearance ids per batch price series request
+    PRICE_HISTORY_SERIES_MAX_APPEARANCES: int = 500
+    # Maximum number of (appearance, time) pairs per as-of price lookup
+    PRICE_HISTORY_AS_OF_MAX_QUERIES: int = 10000
+    # Recent price points are only looked up inside this window so partitions can be pruned
+    PRICE_HISTORY_LOOKBACK_DAYS: int = 90
+
+    PRICE_HISTORY_PARTITION_MONTHS_AHEAD: int = 3
+    # 0 keeps every partition
+    PRICE_HISTORY_RETENTION_MONTHS: int = 0
+    # "detach" keeps expired partitions as standalone tables, "drop" removes them
+    PRICE_HISTORY_RETENTION_ACTION: str = "detach"
+
+    # In change-only ingest / compaction a point equal to the previous one is only kept once per interval. Reads
+    # carry the last point up to this far back forward to the start of their range, so it must be positive
+    PRICE_HISTORY_HEARTBEAT_MINUTES: int = Field(60, gt=0)
+
+    # Parquet cold tier: months entirely older than this many months are moved out of Postgres, 0 disables it
+    PRICE_HISTORY_ARCHIVE_AFTER_MONTHS: int = 0
+    PRICE_HISTORY_ARCHIVE_DIR: str = "archive/platform_price_history"
+
+    # Asynchronous ingest: batches queued in a Redis stream are coalesced by the ingest worker into one
+    # transaction of at most PRICE_HISTORY_INGEST_MAX_ROWS rows, flushed at least every PRICE_HISTORY_INGEST_FLUSH_SECONDS
+    PRICE_HISTORY_INGEST_STREAM: str = "price_history_ingest"
+    PRICE_HISTORY_INGEST_MAX_ROWS: int = 50000
+    PRICE_HISTORY_INGEST_FLUSH_SECONDS: int = 5
+    # Batches left unacknowledged this long (e.g. by a crashed worker) are taken over by another worker
+    PRICE_HISTORY_INGEST_CLAIM_IDLE_SECONDS: int = 300
+    # Batches delivered this many times without being acknowledged, or that cannot be decoded, are moved to the
+    # dead-letter stream and marked failed instead of being retried forever
+    PRICE_HISTORY_INGEST_MAX_DELIVERIES: int = 5
+    PRICE_HISTORY_INGEST_DEAD_LETTER_STREAM: str = "price_history_ingest_dead_letter"
+    PRICE_HISTORY_INGEST_STATUS_TTL_HOURS: int = 24
+
+    # Bulk deletes remove at most PRICE_HISTORY_DELETE_CHUNK_SIZE points per transaction and pause in between
+    PRICE_HISTORY_DELETE_CHUNK_SIZE: int = 5000
+    PRICE_HISTORY_DELETE_PAUSE_SECONDS: float = 0.1
+    PRICE_HISTORY_DELETE_STATUS_TTL_HOURS: int = 24
+
+    # Rows fetched per round trip from the server-side cursor when exporting price history
+    PRICE_HISTORY_EXPORT_BATCH_SIZE: int = 5000
+
+    # The in-memory platform_appearance_relations map is reloaded after this many seconds, and on unknown ids
+    # at most once per PLATFORM_APPEARANCE_MISS_REFRESH_SECONDS
+    PLATFORM_APPEARANCE_REFRESH_SECONDS: int = 300
+    PLATFORM_APPEARANCE_MISS_REFRESH_SECONDS: int = 10
+
+    # Price points are checked against in-memory sets of appearance and platform ids before ingest; the sets are
+    # reloaded after this many seconds, and on unknown ids at most once per CATALOG_ID_MISS_REFRESH_SECONDS
+    CATALOG_ID_REFRESH_SECONDS: int = 300
+    CATALOG_ID_MISS_REFRESH_SECONDS: int = 10
+
+    # Per-worker in-memory cache of recent appearance price series, 0 disables it
+    PRICE_SERIES_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    PRICE_SERIES_CACHE_MAX_POINTS: int = 2000
+
+    # Incoming prices whose robust z-score (log price vs. median / MAD of the last PRICE_OUTLIER_WINDOW points of
+    # the series) exceeds PRICE_OUTLIER_THRESHOLD are quarantined instead of stored, 0 disables the filter
+    PRICE_OUTLIER_THRESHOLD: float = 10
+    PRICE_OUTLIER_WINDOW: int = 30
+    # Series with fewer recent points are not filtered
+    PRICE_OUTLIER_MIN_POINTS: int = 5
+    # Lower bound of the log price spread, so small moves in a flat series are not flagged
+    PRICE_OUTLIER_MIN_SPREAD: float = 0.1
+    # This many consecutive quarantined points of a series that agree with each other are taken as a genuine move
+    # to a new price level: they are released into the history and the reference window restarts from them,
+    # 0 keeps every flagged point quarantined
+    PRICE_OUTLIER_REBASE_POINTS: int = 5
+    PRICE_OUTLIER_CACHE_MAX_SERIES: int = 100000
+
+    # appearance_market_stats is refreshed on ingest; the periodic refresh job, which keeps the 24h / 7d changes
+    # current for appearances without new prices, commits this many appearances at a time
+    APPEARANCE_MARKET_STATS_CHUNK_SIZE: int = 1000
+    # Most appearances a single top movers request may return
+    APPEARANCE_TOP_MOVERS_MAX_LIMIT: int = 100
+    # Cross-platform spreads only compare latest prices recorded within this many hours
+    PRICE_SPREAD_MAX_AGE_HOURS: int = 24
+    # Liquidity metrics compare the daily listings of the last this many days with the same span before
+    LIQUIDITY_WINDOW_DAYS: int = 7
+
+    # Level of a market index when it gets its first constituents
+    MARKET_INDEX_BASE_LEVEL: float = 1000
+
+    # The similarity job correlates the daily returns of the last APPEARANCE_SIMILARITY_WINDOW_DAYS days and keeps
+    # the APPEARANCE_SIMILARITY_TOP_K most correlated appearances of each; appearances with fewer daily returns
+    # are skipped. The correlation matrix is computed APPEARANCE_SIMILARITY_BLOCK_SIZE rows at a time
+    APPEARANCE_SIMILARITY_WINDOW_DAYS: int = 90
+    APPEARANCE_SIMILARITY_TOP_K: int = 20
+    APPEARANCE_SIMILARITY_MIN_OBSERVATIONS: int = 20
+    APPEARANCE_SIMILARITY_BLOCK_SIZE: int = 1024
+
+    # Longest window, in days, of the price analytics endpoint and of its moving averages and volatility
+    APPEARANCE_ANALYTICS_MAX_DAYS: int = 365
 
     class Config:
         env_file = ".env"
@@ -21,6 +21,14 @@ class ResultCode(Enum):
     # Planform Errors (3000-3099)
     PLATFORM_ALREADY_EXISTS = (2003, "Platform with this name already exists", 400)
 
+    # Platform price history Errors (3100-3199)
+    UNSUPPORTED_PRICE_HISTORY_FORMAT = (3100, "Unsupported price history format, use text/csv or application/x-ndjson", 415)
+    INVALID_PRICE_HISTORY_STREAM = (3101, "Invalid price history stream", 400)
+    INVALID_PRICE_HISTORY_DATE_RANGE = (3102, "start_date must not be after end_date", 400)
+    UNBOUNDED_PRICE_HISTORY_DOWNSAMPLING = (3103, "max_points requires appearance_id or both start_date and end_date", 400)
+    UNBOUNDED_ARCHIVED_PRICE_HISTORY_READ = (3104, "Reading archived months requires appearance_id or both start_date and end_date", 400)
+    ARCHIVED_PRICE_HISTORY_DELETE = (3105, "The range reaches archived months, whose points cannot be deleted", 400)
+
     # User purchase transaction Errors (4000-4099)
 
     # User sale transaction Errors (4100-4199)
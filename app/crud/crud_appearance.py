@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Optional, Set
 
-from sqlalchemy import func
+from sqlalchemy import func, asc, desc
 from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.orm import joinedload
 
@@ -47,15 +47,56 @@ def get_appearance_by_id(db: Session, appearance_id: int) -> OperationResult[sch
     return OperationResult(status=OperationStatus.SUCCESS, data=schemas.Appearance.model_validate(db_appearance))
 
 
+def get_appearance_ids(db: Session) -> Set[int]:
+    return {appearance_id for appearance_id, in db.query(models.Appearance.id).all()}
+
+
+# 可排序的市场统计列，均有 (列, appearance_id) 索引
+MARKET_STATS_SORT_COLUMNS = {
+    "current_price": models.AppearanceMarketStats.current_price_cents,
+    "listings_count": models.AppearanceMarketStats.listings_count,
+    "change_24h": models.AppearanceMarketStats.change_24h,
+    "change_7d": models.AppearanceMarketStats.change_7d,
+    "average_listings": models.AppearanceMarketStats.average_listings,
+    "turnover_rate": models.AppearanceMarketStats.turnover_rate,
+}
+
+
 def get_appearances(
         db: Session,
         page: int = 1,
         page_size: int = 100,
-        search_query: Optional[str] = None
-) -> OperationResult[PagingData[schemas.Appearance]]:
+        search_query: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        sort_order: str = 'asc',
+        min_price_cents: Optional[int] = None,
+        max_price_cents: Optional[int] = None
+) -> OperationResult[PagingData[schemas.AppearanceWithMarketStats]]:
+    """
+    Page through appearances with their market stats, by id or by one of MARKET_STATS_SORT_COLUMNS.
+
+    Sorting by a market stat, or filtering by current price, leaves out the appearances that lack it, so the
+    page is read from the stats index in order.
+    """
+    market_stats = models.AppearanceMarketStats
+    sort_column = MARKET_STATS_SORT_COLUMNS.get(sort_by)
+
     # 基础查询，包含所有过滤条件
     base_query = db.query(models.Appearance.id)  # 仅选择 ID 以提高效率
 
+    if sort_column is not None or min_price_cents is not None or max_price_cents is not None:
+        base_query = base_query.join(market_stats, market_stats.appearance_id == models.Appearance.id)
+        if sort_column is not None:
+            # 排序列需出现在 select 中，搜索时的 DISTINCT 才能按其排序
+            base_query = (
+                base_query.add_columns(sort_column, market_stats.appearance_id)
+                .filter(sort_column.isnot(None))
+            )
+        if min_price_cents is not None:
+            base_query = base_query.filter(market_stats.current_price_cents >= min_price_cents)
+        if max_price_cents is not None:
+            base_query = base_query.filter(market_stats.current_price_cents <= max_price_cents)
+
     if search_query:
         # 使用 join 替代 any()，这在某些情况下对 count 更友好
         # 注意：这里需要明确 join，因为我们只 select ID
@@ -65,11 +106,11 @@ def get_appearances(
                 (models.Appearance.name.ilike(f"%{search_query}%")) |
                 (models.AppearanceAlias.alias_name.ilike(f"%{search_query}%"))
             )
+            .distinct()  # 别名 JOIN 后确保每个 Appearance ID 只出现一次
         )
 
     # 1. 计算总数 (在应用分页前)
-    # 使用 count(distinct) 来确保在 JOIN 后计数正确
-    subquery = base_query.distinct().subquery()
+    subquery = base_query.subquery()
     total_count = db.query(func.count()).select_from(subquery).scalar()
 
     if total_count == 0:
@@ -81,16 +122,22 @@ def get_appearances(
     # 2. 获取当前页的 Appearance IDs
     offset = (page - 1) * page_size
 
+    if sort_column is not None:
+        # 按统计表自身的 appearance_id 决胜，使排序与 (列, appearance_id) 索引一致
+        order_func = desc if sort_order == 'desc' else asc
+        order_by = (order_func(sort_column), order_func(market_stats.appearance_id))
+    else:
+        order_by = (models.Appearance.id,)  # 稳定的分页需要 order_by
+
     appearance_ids_on_page = (
         base_query
-        .distinct()  # 确保每个 Appearance ID 只出现一次
-        .order_by(models.Appearance.id)  # 稳定的分页需要 order_by
+        .order_by(*order_by)
         .offset(offset)
         .limit(page_size)
         .all()
     )
 
-    # 从元组列表中提取 IDs: [(id1,), (id2,)] -> [id1, id2]
+    # 从元组列表中提取 IDs: [(id1, ...), (id2, ...)] -> [id1, id2]
     ids = [item[0] for item in appearance_ids_on_page]
 
     if not ids:
@@ -107,13 +154,17 @@ def get_appearances(
         .filter(models.Appearance.id.in_(ids))
         .options(
             selectinload(models.Appearance.appearance_aliases),
-            selectinload(models.Appearance.appearance_types)
+            selectinload(models.Appearance.appearance_types),
+            selectinload(models.Appearance.market_stats),
+            selectinload(models.Appearance.platform_liquidity)
         )
-        .order_by(models.Appearance.id)  # 保持与 ID 查询相同的顺序
         .all()
     )
+    # 保持与 ID 查询相同的顺序
+    page_positions = {appearance_id: position for position, appearance_id in enumerate(ids)}
+    db_appearances.sort(key=lambda db_appearance: page_positions[db_appearance.id])
 
-    items = [schemas.Appearance.model_validate(db_appearance) for db_appearance in db_appearances]
+    items = [schemas.AppearanceWithMarketStats.model_validate(db_appearance) for db_appearance in db_appearances]
 
     return OperationResult(
         status=OperationStatus.SUCCESS,
@@ -121,6 +172,67 @@ def get_appearances(
     )
 
 
+# 涨跌榜的时间窗口对应的涨跌幅列
+TOP_MOVER_WINDOWS = {
+    "24h": models.AppearanceMarketStats.change_24h,
+    "7d": models.AppearanceMarketStats.change_7d,
+}
+
+TOP_MOVERS_GAINERS = "gainers"
+TOP_MOVERS_LOSERS = "losers"
+
+
+def get_top_movers(
+        db: Session,
+        window: str = "24h",
+        direction: str = TOP_MOVERS_GAINERS,
+        appearance_type_id: Optional[int] = None,
+        limit: int = 20
+) -> OperationResult[List[schemas.AppearanceWithMarketStats]]:
+    """
+    The appearances that gained (or lost) the most over ``window``, read from appearance_market_stats.
+
+    Gainers are ordered by descending change and only include rising appearances, losers the other way
+    round. The walk follows the change index, so the cost does not depend on the size of the price history.
+    """
+    market_stats = models.AppearanceMarketStats
+    change_column = TOP_MOVER_WINDOWS[window]
+
+    query = db.query(market_stats.appearance_id)
+    if direction == TOP_MOVERS_LOSERS:
+        query = query.filter(change_column < 0).order_by(change_column.asc(), market_stats.appearance_id.asc())
+    else:
+        query = query.filter(change_column > 0).order_by(change_column.desc(), market_stats.appearance_id.desc())
+    if appearance_type_id is not None:
+        query = query.join(
+            models.appearance_type_relations,
+            models.appearance_type_relations.c.appearance_id == market_stats.appearance_id
+        ).filter(models.appearance_type_relations.c.appearance_type_id == appearance_type_id)
+
+    ids = [appearance_id for appearance_id, in query.limit(limit).all()]
+    if not ids:
+        return OperationResult(status=OperationStatus.SUCCESS, data=[])
+
+    db_appearances = (
+        db.query(models.Appearance)
+        .filter(models.Appearance.id.in_(ids))
+        .options(
+            selectinload(models.Appearance.appearance_aliases),
+            selectinload(models.Appearance.appearance_types),
+            selectinload(models.Appearance.market_stats),
+            selectinload(models.Appearance.platform_liquidity)
+        )
+        .all()
+    )
+    ranks = {appearance_id: rank for rank, appearance_id in enumerate(ids)}
+    db_appearances.sort(key=lambda db_appearance: ranks[db_appearance.id])
+
+    return OperationResult(
+        status=OperationStatus.SUCCESS,
+        data=[schemas.AppearanceWithMarketStats.model_validate(db_appearance) for db_appearance in db_appearances]
+    )
+
+
 def update_appearance(
         db: Session,
         appearance_id: int,
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+
+import app.models as models
+import app.schemas as schemas
+from app.core.operation_result import OperationResult, OperationStatus
+from app.services.appearance_similarity import carry_forward
+from app.services.price_analytics import TRADING_DAYS_PER_YEAR, rolling_mean, rolling_std, max_drawdown, z_score
+
+
+def _optional(value) -> Optional[float]:
+    return None if value is None or np.isnan(value) else float(value)
+
+
+def get_appearance_price_analytics(
+        db: Session,
+        appearance_id: int,
+        window_days: int = 90,
+        platform_id: Optional[int] = None,
+        short_ma_days: int = 7,
+        long_ma_days: int = 30,
+        volatility_days: int = 30
+) -> OperationResult[schemas.AppearancePriceAnalytics]:
+    """
+    Risk statistics of an appearance over the last ``window_days`` days, today included, from its daily candles.
+
+    Each day's price is the cheapest daily close across platforms (or of ``platform_id``), carried forward
+    over days without a candle. Volatility is the annualized standard deviation of daily log returns, max
+    drawdown the largest fall from a running peak, and the z-score places the current price within the
+    window. Enough earlier days are loaded for the rolling values to be defined from the first day shown.
+    """
+    if not db.query(models.Appearance.id).filter(models.Appearance.id == appearance_id).first():
+        return OperationResult(status=OperationStatus.NOT_FOUND)
+
+    lookback_days = max(long_ma_days - 1, volatility_days)
+    today = datetime.now(tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start_day = today - timedelta(days=window_days - 1 + lookback_days)
+    day_count = window_days + lookback_days
+
+    candles = models.PlatformPriceCandleDaily
+    query = (
+        select(candles.bucket_start, func.min(candles.close_price_cents))
+        .where(candles.appearance_id == appearance_id, candles.bucket_start >= start_day)
+        .group_by(candles.bucket_start)
+    )
+    if platform_id:
+        query = query.where(candles.platform_id == platform_id)
+    closes = np.full(day_count, np.nan)
+    for bucket_start, close_price_cents in db.execute(query).all():
+        day = (bucket_start - start_day).days
+        if 0 <= day < day_count:
+            closes[day] = close_price_cents
+
+    analytics = schemas.AppearancePriceAnalytics(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        window_days=window_days,
+        short_ma_days=short_ma_days,
+        long_ma_days=long_ma_days,
+        volatility_days=volatility_days,
+        observation_count=int(np.count_nonzero(~np.isnan(closes[lookback_days:])))
+    )
+    observed_days = np.flatnonzero(~np.isnan(closes))
+    if not len(observed_days):
+        return OperationResult(status=OperationStatus.SUCCESS, data=analytics)
+
+    # 从首个收盘价开始计算，之前的日期没有价格
+    first_day = observed_days[0]
+    prices = carry_forward(closes[first_day:])
+    returns = np.insert(np.diff(np.log(prices)), 0, np.nan)
+    moving_average_short = rolling_mean(prices, short_ma_days)
+    moving_average_long = rolling_mean(prices, long_ma_days)
+    rolling_volatility = rolling_std(returns[1:], volatility_days) * np.sqrt(TRADING_DAYS_PER_YEAR)
+    rolling_volatility = np.insert(rolling_volatility, 0, np.nan)
+
+    # 只展示窗口内的日期
+    shown = slice(max(lookback_days - first_day, 0), None)
+    window_prices = prices[shown]
+    window_returns = returns[shown][~np.isnan(returns[shown])]
+    days = [start_day + timedelta(days=int(first_day + offset)) for offset in range(len(prices))][shown]
+
+    analytics.current_price_cents = int(prices[-1])
+    analytics.volatility = (
+        float(window_returns.std(ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR)) if len(window_returns) >= 2 else None
+    )
+    analytics.max_drawdown = max_drawdown(window_prices)
+    analytics.moving_average_short_cents = _optional(moving_average_short[-1])
+    analytics.moving_average_long_cents = _optional(moving_average_long[-1])
+    analytics.z_score = z_score(prices[-1], window_prices)
+    analytics.points = [
+        schemas.AppearancePriceAnalyticsPoint(
+            day=day,
+            close_price_cents=int(close_price_cents),
+            moving_average_short_cents=_optional(short_value),
+            moving_average_long_cents=_optional(long_value),
+            rolling_volatility=_optional(volatility_value)
+        )
+        for day, close_price_cents, short_value, long_value, volatility_value in zip(
+            days,
+            window_prices,
+            moving_average_short[shown],
+            moving_average_long[shown],
+            rolling_volatility[shown]
+        )
+    ]
+    return OperationResult(status=OperationStatus.SUCCESS, data=analytics)
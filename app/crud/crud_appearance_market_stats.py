@@ -0,0 +1,313 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List
+
+from sqlalchemy import select, delete, func, text, asc, desc
+from sqlalchemy.orm import Session
+
+import app.models as models
+import app.schemas as schemas
+from app.core.config import settings
+from app.core.operation_result import OperationResult, OperationStatus
+from app.core.paging import PagingData
+from app.crud import crud_market_index
+
+# 每个平台的日 K 线：最近窗口与前一个等长窗口的每日平均挂单数，以及最近窗口内日收盘挂单数的减少量。
+# 窗口前一天的收盘挂单数作为首日减少量的基准
+_REFRESH_PLATFORM_LIQUIDITY_SQL = text("""
+INSERT INTO appearance_platform_liquidity (
+    appearance_id, platform_id, average_listings, previous_average_listings, listings_trend,
+    delisted_listings, turnover_rate, updated_at
+)
+SELECT w.appearance_id,
+       w.platform_id,
+       w.average_listings,
+       w.previous_average_listings,
+       w.average_listings / NULLIF(w.previous_average_listings, 0) - 1,
+       w.delisted_listings,
+       w.delisted_listings / NULLIF(w.average_listings, 0),
+       NOW()
+FROM (
+    SELECT d.appearance_id,
+           d.platform_id,
+           avg(d.average_listings) FILTER (WHERE d.bucket_start >= d.window_start) AS average_listings,
+           avg(d.average_listings) FILTER (WHERE d.bucket_start < d.window_start) AS previous_average_listings,
+           coalesce(sum(greatest(d.previous_close_quantity - d.close_quantity_on_sale, 0))
+                    FILTER (WHERE d.bucket_start >= d.window_start), 0) AS delisted_listings
+    FROM (
+        SELECT c.appearance_id,
+               c.platform_id,
+               c.bucket_start,
+               c.close_quantity_on_sale,
+               c.quantity_on_sale_sum::DOUBLE PRECISION / NULLIF(c.quantity_on_sale_count, 0) AS average_listings,
+               lag(c.close_quantity_on_sale) OVER (
+                   PARTITION BY c.appearance_id, c.platform_id ORDER BY c.bucket_start
+               ) AS previous_close_quantity,
+               date_trunc('day', NOW(), 'UTC') - make_interval(days => :window_days - 1) AS window_start
+        FROM platform_price_candles_daily c
+        WHERE c.appearance_id = ANY(CAST(:appearance_ids AS BIGINT[]))
+          AND c.bucket_start >= date_trunc('day', NOW(), 'UTC') - make_interval(days => 2 * :window_days - 1)
+    ) d
+    GROUP BY d.appearance_id, d.platform_id
+) w
+WHERE w.average_listings IS NOT NULL
+ORDER BY w.appearance_id, w.platform_id
+ON CONFLICT (appearance_id, platform_id) DO UPDATE SET
+    average_listings = EXCLUDED.average_listings,
+    previous_average_listings = EXCLUDED.previous_average_listings,
+    listings_trend = EXCLUDED.listings_trend,
+    delisted_listings = EXCLUDED.delisted_listings,
+    turnover_rate = EXCLUDED.turnover_rate,
+    updated_at = EXCLUDED.updated_at
+""")
+
+# 当前价（各平台最新价中的最低价）、挂单数与跨平台价差来自 platform_latest_price，30 天区间来自日 K 线，
+# 均为按外观的索引查询。
+# 涨跌幅逐平台取参考时刻的小时 K 线收盘价，比较同一组平台现在与当时的最低价，
+# 各平台交替上报不同价位时不会被当成涨跌
+_REFRESH_MARKET_STATS_SQL = text("""
+INSERT INTO appearance_market_stats (
+    appearance_id, current_price_cents, listings_count, change_24h, change_7d,
+    min_price_30d_cents, max_price_30d_cents, lowest_price_cents, highest_price_cents, spread_cents, margin_cents,
+    average_listings, listings_trend, turnover_rate, updated_at
+)
+SELECT a.id,
+       latest.lowest_price_cents,
+       latest.listings_count,
+       change_24h.change,
+       change_7d.change,
+       range_30d.min_price_cents,
+       range_30d.max_price_cents,
+       spread.lowest_price_cents,
+       spread.highest_price_cents,
+       spread.highest_price_cents - spread.lowest_price_cents,
+       spread.margin_cents,
+       liquidity.average_listings,
+       liquidity.listings_trend,
+       liquidity.turnover_rate,
+       NOW()
+FROM appearances a
+LEFT JOIN LATERAL (
+    SELECT min(l.lowest_price_cents) AS lowest_price_cents, sum(l.quantity_on_sale) AS listings_count
+    FROM platform_latest_price l
+    WHERE l.appearance_id = a.id
+) latest ON TRUE
+LEFT JOIN LATERAL (
+    SELECT min(l.lowest_price_cents)::DOUBLE PRECISION / NULLIF(min(r.close_price_cents), 0) - 1 AS change
+    FROM platform_latest_price l
+    CROSS JOIN LATERAL (
+        SELECT c.close_price_cents
+        FROM platform_price_candles_hourly c
+        WHERE c.appearance_id = l.appearance_id
+          AND c.platform_id = l.platform_id
+          AND c.bucket_start <= NOW() - INTERVAL '24 hours'
+        ORDER BY c.bucket_start DESC
+        LIMIT 1
+    ) r
+    WHERE l.appearance_id = a.id
+) change_24h ON TRUE
+LEFT JOIN LATERAL (
+    SELECT min(l.lowest_price_cents)::DOUBLE PRECISION / NULLIF(min(r.close_price_cents), 0) - 1 AS change
+    FROM platform_latest_price l
+    CROSS JOIN LATERAL (
+        SELECT c.close_price_cents
+        FROM platform_price_candles_hourly c
+        WHERE c.appearance_id = l.appearance_id
+          AND c.platform_id = l.platform_id
+          AND c.bucket_start <= NOW() - INTERVAL '7 days'
+        ORDER BY c.bucket_start DESC
+        LIMIT 1
+    ) r
+    WHERE l.appearance_id = a.id
+) change_7d ON TRUE
+LEFT JOIN LATERAL (
+    SELECT min(c.low_price_cents) AS min_price_cents, max(c.high_price_cents) AS max_price_cents
+    FROM platform_price_candles_daily c
+    WHERE c.appearance_id = a.id
+      AND c.bucket_start >= date_trunc('day', NOW() - INTERVAL '30 days', 'UTC')
+) range_30d ON TRUE
+LEFT JOIN LATERAL (
+    SELECT min(s.lowest_price_cents) AS lowest_price_cents,
+           max(s.lowest_price_cents) AS highest_price_cents,
+           round(max(s.net_price_cents) FILTER (WHERE s.price_rank > 1))::BIGINT - min(s.lowest_price_cents) AS margin_cents
+    FROM (
+        SELECT l.lowest_price_cents,
+               l.lowest_price_cents * (1 - p.fee_rate) AS net_price_cents,
+               row_number() OVER (ORDER BY l.lowest_price_cents, l.platform_id) AS price_rank
+        FROM platform_latest_price l
+        JOIN platforms p ON p.id = l.platform_id
+        WHERE l.appearance_id = a.id
+          AND l.recorded_at >= NOW() - make_interval(hours => :spread_max_age_hours)
+    ) s
+    HAVING count(*) > 1
+) spread ON TRUE
+LEFT JOIN LATERAL (
+    SELECT sum(q.average_listings) AS average_listings,
+           sum(q.average_listings) FILTER (WHERE q.previous_average_listings IS NOT NULL)
+               / NULLIF(sum(q.previous_average_listings), 0) - 1 AS listings_trend,
+           sum(q.delisted_listings) / NULLIF(sum(q.average_listings), 0) AS turnover_rate
+    FROM appearance_platform_liquidity q
+    WHERE q.appearance_id = a.id
+    HAVING count(*) > 0
+) liquidity ON TRUE
+WHERE a.id = ANY(CAST(:appearance_ids AS BIGINT[]))
+ORDER BY a.id
+ON CONFLICT (appearance_id) DO UPDATE SET
+    current_price_cents = EXCLUDED.current_price_cents,
+    listings_count = EXCLUDED.listings_count,
+    change_24h = EXCLUDED.change_24h,
+    change_7d = EXCLUDED.change_7d,
+    min_price_30d_cents = EXCLUDED.min_price_30d_cents,
+    max_price_30d_cents = EXCLUDED.max_price_30d_cents,
+    lowest_price_cents = EXCLUDED.lowest_price_cents,
+    highest_price_cents = EXCLUDED.highest_price_cents,
+    spread_cents = EXCLUDED.spread_cents,
+    margin_cents = EXCLUDED.margin_cents,
+    average_listings = EXCLUDED.average_listings,
+    listings_trend = EXCLUDED.listings_trend,
+    turnover_rate = EXCLUDED.turnover_rate,
+    updated_at = EXCLUDED.updated_at
+RETURNING appearance_id, current_price_cents, listings_count
+""")
+
+
+def refresh_appearance_market_stats(db: Session, appearance_ids: Iterable[int]) -> None:
+    """
+    Recompute the market stats of the given appearances from platform_latest_price and the candles.
+
+    Runs in the caller's transaction, after the latest prices and candles of the same change were updated.
+    Ids of appearances that no longer exist are ignored. Changes of current price or listings are recorded for
+    the market indexes, see crud_market_index.fold_market_index_changes.
+
+    The per-platform liquidity (average daily listings, their trend against the previous window, and the
+    listings that disappeared between daily closes as a turnover proxy) is rebuilt from the daily candles
+    of the last 2 x LIQUIDITY_WINDOW_DAYS days, then summed into the appearance stats.
+    """
+    appearance_ids = sorted(set(appearance_ids))
+    if not appearance_ids:
+        return
+
+    # 锁住旧统计，保证并发入库按顺序记录各自的变化
+    market_stats = models.AppearanceMarketStats
+    previous = {
+        appearance_id: (current_price_cents, listings_count)
+        for appearance_id, current_price_cents, listings_count in db.execute(
+            select(market_stats.appearance_id, market_stats.current_price_cents, market_stats.listings_count)
+            .where(market_stats.appearance_id.in_(appearance_ids))
+            .order_by(market_stats.appearance_id)
+            .with_for_update()
+        ).all()
+    }
+
+    liquidity = models.AppearancePlatformLiquidity
+    db.execute(
+        _REFRESH_PLATFORM_LIQUIDITY_SQL,
+        {"appearance_ids": appearance_ids, "window_days": settings.LIQUIDITY_WINDOW_DAYS}
+    )
+    # 本次未刷新的行（窗口内已没有挂单数据的平台）删除
+    db.execute(
+        delete(liquidity).where(liquidity.appearance_id.in_(appearance_ids), liquidity.updated_at < func.now())
+    )
+
+    refreshed = db.execute(
+        _REFRESH_MARKET_STATS_SQL,
+        {"appearance_ids": appearance_ids, "spread_max_age_hours": settings.PRICE_SPREAD_MAX_AGE_HOURS}
+    ).all()
+
+    changes = [
+        (appearance_id, *previous.get(appearance_id, (None, None)), current_price_cents, listings_count)
+        for appearance_id, current_price_cents, listings_count in refreshed
+        if previous.get(appearance_id, (None, None)) != (current_price_cents, listings_count)
+    ]
+    crud_market_index.record_market_stats_changes(db, changes)
+
+
+def get_appearance_id_chunks(db: Session, chunk_size: int) -> Iterable[List[int]]:
+    """All appearance ids in ascending chunks of at most ``chunk_size``, read one chunk at a time."""
+    last_id = None
+    while True:
+        query = select(models.Appearance.id).order_by(models.Appearance.id).limit(chunk_size)
+        if last_id is not None:
+            query = query.where(models.Appearance.id > last_id)
+        appearance_ids = db.execute(query).scalars().all()
+        if not appearance_ids:
+            return
+        yield appearance_ids
+        last_id = appearance_ids[-1]
+
+
+# 价差列表可排序的列，均有 (列, appearance_id) 索引
+SPREAD_SORT_COLUMNS = {
+    "spread": models.AppearanceMarketStats.spread_cents,
+    "margin": models.AppearanceMarketStats.margin_cents,
+}
+
+
+def get_price_spreads(
+        db: Session,
+        page: int = 1,
+        page_size: int = 100,
+        sort_by: str = "spread",
+        sort_order: str = "desc"
+) -> OperationResult[PagingData[schemas.AppearancePriceSpread]]:
+    """
+    Appearances priced on at least two platforms, with their cross-platform spread and fee-adjusted margin.
+
+    The page is read in order from the stats index; only the per-platform latest prices of that page are
+    loaded afterwards.
+    """
+    market_stats = models.AppearanceMarketStats
+    sort_column = SPREAD_SORT_COLUMNS[sort_by]
+    order_func = asc if sort_order == "asc" else desc
+
+    query = (
+        db.query(market_stats, models.Appearance.name)
+        .join(models.Appearance, models.Appearance.id == market_stats.appearance_id)
+        .filter(sort_column.isnot(None))
+    )
+    total_count = query.count()
+    rows = (
+        query.order_by(order_func(sort_column), order_func(market_stats.appearance_id))
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    if not rows:
+        return OperationResult(status=OperationStatus.SUCCESS, data=PagingData(items=[], total_count=total_count))
+
+    # 与刷新统计时相同的时效窗口，只展示参与比较的平台报价
+    recorded_after = datetime.now(tz=timezone.utc) - timedelta(hours=settings.PRICE_SPREAD_MAX_AGE_HOURS)
+    latest_prices = db.execute(
+        select(models.PlatformLatestPrice, models.Platform.fee_rate)
+        .join(models.Platform, models.Platform.id == models.PlatformLatestPrice.platform_id)
+        .where(
+            models.PlatformLatestPrice.appearance_id.in_([stats.appearance_id for stats, _ in rows]),
+            models.PlatformLatestPrice.recorded_at >= recorded_after
+        )
+        .order_by(models.PlatformLatestPrice.lowest_price_cents, models.PlatformLatestPrice.platform_id)
+    ).all()
+    platform_prices_map = {}
+    for latest_price, fee_rate in latest_prices:
+        platform_prices_map.setdefault(latest_price.appearance_id, []).append(
+            schemas.PlatformLatestPrice(
+                platform_id=latest_price.platform_id,
+                lowest_price_cents=latest_price.lowest_price_cents,
+                quantity_on_sale=latest_price.quantity_on_sale,
+                recorded_at=latest_price.recorded_at,
+                fee_rate=fee_rate,
+                net_price_cents=round(latest_price.lowest_price_cents * (1 - fee_rate))
+            )
+        )
+
+    items = [
+        schemas.AppearancePriceSpread(
+            appearance_id=stats.appearance_id,
+            appearance_name=appearance_name,
+            lowest_price_cents=stats.lowest_price_cents,
+            highest_price_cents=stats.highest_price_cents,
+            spread_cents=stats.spread_cents,
+            margin_cents=stats.margin_cents,
+            platform_prices=platform_prices_map.get(stats.appearance_id, [])
+        )
+        for stats, appearance_name in rows
+    ]
+    return OperationResult(status=OperationStatus.SUCCESS, data=PagingData(items=items, total_count=total_count))
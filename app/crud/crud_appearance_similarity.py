@@ -0,0 +1,117 @@
+from datetime import datetime
+from typing import List, Tuple
+
+import numpy as np
+from sqlalchemy import select, delete, func, insert
+from sqlalchemy.orm import Session, selectinload
+
+import app.models as models
+import app.schemas as schemas
+from app.core.config import settings
+from app.core.operation_result import OperationResult, OperationStatus
+
+# 每条 INSERT 写入的相似度行数
+_INSERT_BATCH_SIZE = 10000
+
+
+def load_daily_closes(db: Session, start_day: datetime, day_count: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily close (cheapest across platforms) of every appearance with daily candles since ``start_day``.
+
+    Returns the sorted appearance ids and a float64 matrix of one row per appearance and ``day_count``
+    columns, NaN where an appearance has no candle. Candles are streamed in batches straight into the matrix.
+    """
+    candles = models.PlatformPriceCandleDaily
+    in_window = candles.bucket_start >= start_day
+    appearance_ids = np.array(
+        db.execute(select(candles.appearance_id).where(in_window).distinct().order_by(candles.appearance_id))
+        .scalars().all(),
+        dtype=np.int64
+    )
+    closes = np.full((len(appearance_ids), day_count), np.nan)
+    if not len(appearance_ids):
+        return appearance_ids, closes
+
+    day_index = func.floor(func.extract("epoch", candles.bucket_start - start_day) / 86400).label("day_index")
+    query = (
+        select(candles.appearance_id, day_index, func.min(candles.close_price_cents))
+        .where(in_window)
+        .group_by(candles.appearance_id, day_index)
+    )
+    result = db.execute(query.execution_options(yield_per=settings.PRICE_HISTORY_EXPORT_BATCH_SIZE))
+    try:
+        for rows in result.partitions():
+            batch = np.array(rows, dtype=np.float64)
+            days = batch[:, 1].astype(np.intp)
+            in_range = days < day_count
+            closes[np.searchsorted(appearance_ids, batch[in_range, 0].astype(np.int64)), days[in_range]] = \
+                batch[in_range, 2]
+    finally:
+        result.close()
+    return appearance_ids, closes
+
+
+def replace_appearance_similarities(
+        db: Session,
+        appearance_ids: np.ndarray,
+        neighbours: np.ndarray,
+        correlations: np.ndarray,
+        computed_at: datetime
+) -> int:
+    """
+    Replace all stored neighbours in one transaction, so readers see either the previous or the new run.
+
+    ``neighbours`` holds, per appearance, indices into ``appearance_ids`` in descending correlation.
+    Returns the number of rows written.
+    """
+    db.execute(delete(models.AppearanceSimilarity))
+    ranks = np.arange(1, neighbours.shape[1] + 1)
+    appearances_per_batch = max(_INSERT_BATCH_SIZE // max(len(ranks), 1), 1)
+    row_count = 0
+    for start in range(0, len(appearance_ids), appearances_per_batch):
+        stop = start + appearances_per_batch
+        rows = [
+            {
+                "appearance_id": int(appearance_id),
+                "rank": int(rank),
+                "similar_appearance_id": int(appearance_ids[neighbour]),
+                "correlation": float(correlation),
+                "computed_at": computed_at,
+            }
+            for appearance_id, row_neighbours, row_correlations in zip(
+                appearance_ids[start:stop], neighbours[start:stop], correlations[start:stop]
+            )
+            for rank, neighbour, correlation in zip(ranks, row_neighbours, row_correlations)
+        ]
+        if rows:
+            db.execute(insert(models.AppearanceSimilarity), rows)
+            row_count += len(rows)
+    db.commit()
+    return row_count
+
+
+def get_similar_appearances(
+        db: Session,
+        appearance_id: int,
+        limit: int = 10
+) -> OperationResult[List[schemas.SimilarAppearance]]:
+    if not db.query(models.Appearance.id).filter(models.Appearance.id == appearance_id).first():
+        return OperationResult(status=OperationStatus.NOT_FOUND)
+
+    db_similarities = (
+        db.query(models.AppearanceSimilarity)
+        .filter(models.AppearanceSimilarity.appearance_id == appearance_id)
+        .options(
+            selectinload(models.AppearanceSimilarity.similar_appearance).options(
+                selectinload(models.Appearance.appearance_aliases),
+                selectinload(models.Appearance.appearance_types)
+            )
+        )
+        .order_by(models.AppearanceSimilarity.rank)
+        .limit(limit)
+        .all()
+    )
+    return OperationResult(
+        status=OperationStatus.SUCCESS,
+        data=[schemas.SimilarAppearance.model_validate(db_similarity) for db_similarity in db_similarities]
+    )
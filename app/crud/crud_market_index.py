@@ -0,0 +1,284 @@
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, delete, func, or_, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import app.models as models
+import app.schemas as schemas
+from app.core.config import settings
+from app.core.operation_result import OperationResult, OperationStatus
+
+WEIGHTING_LISTINGS = "listings"
+WEIGHTING_EQUAL = "equal"
+WEIGHTINGS = (WEIGHTING_LISTINGS, WEIGHTING_EQUAL)
+
+
+def _lock_indexes(db: Session, appearance_type_ids: Optional[List[int]] = None) -> List[models.MarketIndex]:
+    """
+    The market-wide and given per-type indexes, created at the base level if missing, locked in id order.
+
+    Without ``appearance_type_ids`` all existing indexes are locked.
+    """
+    if appearance_type_ids is None:
+        return db.query(models.MarketIndex).order_by(models.MarketIndex.id).with_for_update().all()
+
+    scope_filter = or_(
+        models.MarketIndex.appearance_type_id.is_(None),
+        models.MarketIndex.appearance_type_id.in_(appearance_type_ids)
+    )
+    existing = set(db.execute(
+        select(models.MarketIndex.appearance_type_id, models.MarketIndex.weighting).where(scope_filter)
+    ).all())
+    missing = [
+        {"appearance_type_id": appearance_type_id, "weighting": weighting, "level": settings.MARKET_INDEX_BASE_LEVEL}
+        for appearance_type_id in [None, *appearance_type_ids]
+        for weighting in WEIGHTINGS
+        if (appearance_type_id, weighting) not in existing
+    ]
+    if missing:
+        # 并发创建时以先提交者为准
+        db.execute(insert(models.MarketIndex).values(missing).on_conflict_do_nothing())
+
+    return (
+        db.query(models.MarketIndex)
+        .filter(scope_filter)
+        .order_by(models.MarketIndex.id)
+        .with_for_update()
+        .all()
+    )
+
+
+# 同一时刻只允许一个事务把变化链接进指数的 advisory lock 键
+_FOLD_LOCK_KEY = 7_341_002_101
+
+
+def record_market_stats_changes(db: Session, changes: Sequence[Sequence]) -> None:
+    """
+    Append changes of appearance current prices and listings, in the caller's transaction.
+
+    ``changes`` holds (appearance_id, old_price_cents, old_listings, new_price_cents, new_listings) per
+    appearance, with None for a missing price. Ingest never locks the index rows; the changes are chained into
+    the indexes later by fold_market_index_changes.
+    """
+    if not changes:
+        return
+    db.execute(insert(models.MarketIndexChange), [
+        dict(zip(("appearance_id", "old_price_cents", "old_listings", "new_price_cents", "new_listings"), change))
+        for change in changes
+    ])
+
+
+def _chain_indexes(
+        db: Session,
+        changes: Sequence[Sequence],
+        appearance_type_ids: Dict[int, List[int]],
+        changed_at: datetime
+) -> None:
+    """
+    Chain the market indexes forward by one set of changes, at most one per appearance.
+
+    The listings-weighted index moves by the change of sum(listings * price) at the previous listings, the
+    equal-weighted index by the geometric mean of the price relatives. Appearances gaining or losing their
+    price, and listings changes, only adjust the constituents and never move the level, like a divisor
+    adjustment. The new levels are recorded in the hourly market_index_levels bucket of ``changed_at``.
+    """
+    old_prices, old_listings, new_prices, new_listings = (
+        np.array([change[column] or 0 for change in changes], dtype=np.float64) for column in range(1, 5)
+    )
+
+    # 每个指数范围内的变动下标：全市场包含全部，分类指数只包含该分类的外观
+    scope_members: Dict[Optional[int], List[int]] = {None: list(range(len(changes)))}
+    for position, change in enumerate(changes):
+        for appearance_type_id in appearance_type_ids.get(change[0], []):
+            scope_members.setdefault(appearance_type_id, []).append(position)
+
+    levels = []
+    for market_index in _lock_indexes(db, sorted(key for key in scope_members if key is not None)):
+        members = scope_members.get(market_index.appearance_type_id)
+        if members is None:
+            continue
+        old_price, new_price = old_prices[members], new_prices[members]
+        old_weight, new_weight = old_listings[members], new_listings[members]
+        was_priced, is_priced = old_price > 0, new_price > 0
+        repriced = was_priced & is_priced
+
+        if market_index.weighting == WEIGHTING_LISTINGS:
+            if market_index.weighted_sum > 0:
+                moved = np.sum(old_weight[repriced] * (new_price[repriced] - old_price[repriced]))
+                market_index.level *= float((market_index.weighted_sum + moved) / market_index.weighted_sum)
+            weighted_sum = market_index.weighted_sum + np.sum(new_weight * new_price) - np.sum(old_weight * old_price)
+            market_index.weighted_sum = max(float(weighted_sum), 0.0)
+        elif market_index.constituent_count > 0:
+            log_relatives = np.log(new_price[repriced] / old_price[repriced])
+            market_index.level *= float(np.exp(np.sum(log_relatives) / market_index.constituent_count))
+
+        market_index.constituent_count = max(
+            market_index.constituent_count + int(np.count_nonzero(is_priced & ~was_priced))
+            - int(np.count_nonzero(was_priced & ~is_priced)),
+            0
+        )
+        market_index.updated_at = changed_at
+        levels.append({
+            "market_index_id": market_index.id,
+            "bucket_start": changed_at.replace(minute=0, second=0, microsecond=0),
+            "level": market_index.level,
+            "constituent_count": market_index.constituent_count,
+        })
+
+    db.flush()
+    insert_stmt = insert(models.MarketIndexLevel).values(levels)
+    db.execute(insert_stmt.on_conflict_do_update(
+        index_elements=[models.MarketIndexLevel.market_index_id, models.MarketIndexLevel.bucket_start],
+        set_={"level": insert_stmt.excluded.level, "constituent_count": insert_stmt.excluded.constituent_count}
+    ))
+
+
+def _fold_changes(db: Session) -> int:
+    """Chain every pending change into the indexes and delete it, in the caller's transaction."""
+    changes_table = models.MarketIndexChange
+    rows = sorted(db.execute(
+        delete(changes_table).returning(
+            changes_table.id, changes_table.appearance_id, changes_table.old_price_cents, changes_table.old_listings,
+            changes_table.new_price_cents, changes_table.new_listings, changes_table.created_at
+        )
+    ).all())
+    if not rows:
+        return 0
+
+    type_relations = models.appearance_type_relations
+    appearance_type_ids: Dict[int, List[int]] = {}
+    for appearance_id, appearance_type_id in db.execute(
+            select(type_relations.c.appearance_id, type_relations.c.appearance_type_id)
+            .where(type_relations.c.appearance_id.in_({row.appearance_id for row in rows}))
+    ).all():
+        appearance_type_ids.setdefault(appearance_id, []).append(appearance_type_id)
+
+    # 按写入顺序切成外观不重复的段，同一外观的先后变化依次链接
+    run, run_appearance_ids = [], set()
+    for row in rows:
+        if row.appearance_id in run_appearance_ids:
+            _chain_indexes(db, [change[1:6] for change in run], appearance_type_ids, run[-1].created_at)
+            run, run_appearance_ids = [], set()
+        run.append(row)
+        run_appearance_ids.add(row.appearance_id)
+    _chain_indexes(db, [change[1:6] for change in run], appearance_type_ids, run[-1].created_at)
+    return len(rows)
+
+
+def fold_market_index_changes(db: Session) -> int:
+    """
+    Chain the pending market_index_changes into the indexes in a short transaction of its own and commit.
+
+    Only one fold runs at a time; a fold finding another one in progress returns 0 at once, the running or the
+    next fold picks its changes up. Returns the number of changes folded.
+    """
+    if not db.execute(select(func.pg_try_advisory_xact_lock(_FOLD_LOCK_KEY))).scalar():
+        db.rollback()
+        return 0
+    folded_count = _fold_changes(db)
+    db.commit()
+    return folded_count
+
+
+def rebase_market_indexes(db: Session) -> int:
+    """
+    Recompute the constituents of every index from appearance_market_stats without moving the levels.
+
+    Ingest only sees price and listings changes; appearances joining or leaving a type, or being deleted, are
+    picked up here. Returns the number of indexes rebased.
+    """
+    # 挡住新变化的写入并等已写入变化的事务提交，把它们全部链接进指数后再读统计：
+    # 此后提交的入库会在新的成分之上继续链接，不会被重复计入
+    db.execute(select(func.pg_advisory_xact_lock(_FOLD_LOCK_KEY)))
+    db.execute(text("LOCK TABLE market_index_changes IN EXCLUSIVE MODE"))
+    _lock_indexes(db)
+    _fold_changes(db)
+
+    market_stats = models.AppearanceMarketStats
+    type_relations = models.appearance_type_relations
+    weighted_price = market_stats.current_price_cents * func.coalesce(market_stats.listings_count, 0)
+    priced = market_stats.current_price_cents > 0
+
+    totals = {None: db.execute(select(func.sum(weighted_price), func.count()).where(priced)).one()}
+    for appearance_type_id, weighted_sum, constituent_count in db.execute(
+            select(type_relations.c.appearance_type_id, func.sum(weighted_price), func.count())
+            .join(market_stats, market_stats.appearance_id == type_relations.c.appearance_id)
+            .where(priced)
+            .group_by(type_relations.c.appearance_type_id)
+    ).all():
+        totals[appearance_type_id] = (weighted_sum, constituent_count)
+
+    _lock_indexes(db, sorted(key for key in totals if key is not None))
+    # 已存在但当前没有成分的分类指数同样需要清零
+    market_indexes = _lock_indexes(db)
+    for market_index in market_indexes:
+        weighted_sum, constituent_count = totals.get(market_index.appearance_type_id, (None, 0))
+        market_index.weighted_sum = float(weighted_sum or 0) if market_index.weighting == WEIGHTING_LISTINGS else 0
+        market_index.constituent_count = constituent_count
+    db.commit()
+    return len(market_indexes)
+
+
+def _get_market_index(db: Session, weighting: str, appearance_type_id: Optional[int]) -> Optional[models.MarketIndex]:
+    query = db.query(models.MarketIndex).filter(models.MarketIndex.weighting == weighting)
+    if appearance_type_id is None:
+        return query.filter(models.MarketIndex.appearance_type_id.is_(None)).first()
+    return query.filter(models.MarketIndex.appearance_type_id == appearance_type_id).first()
+
+
+def get_market_indexes(db: Session) -> OperationResult[List[schemas.MarketIndex]]:
+    db_market_indexes = (
+        db.query(models.MarketIndex)
+        .order_by(models.MarketIndex.appearance_type_id.nulls_first(), models.MarketIndex.weighting)
+        .all()
+    )
+    return OperationResult(
+        status=OperationStatus.SUCCESS,
+        data=[schemas.MarketIndex.model_validate(db_market_index) for db_market_index in db_market_indexes]
+    )
+
+
+def get_market_index_levels(
+        db: Session,
+        weighting: str = WEIGHTING_LISTINGS,
+        appearance_type_id: Optional[int] = None,
+        resolution: str = "hour",
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+) -> OperationResult[schemas.MarketIndexHistory]:
+    """Current level and level history of one index; daily resolution keeps the last hourly level of each day."""
+    db_market_index = _get_market_index(db, weighting=weighting, appearance_type_id=appearance_type_id)
+    if not db_market_index:
+        return OperationResult(status=OperationStatus.NOT_FOUND)
+
+    index_levels = models.MarketIndexLevel
+    query = select(index_levels.bucket_start, index_levels.level, index_levels.constituent_count).where(
+        index_levels.market_index_id == db_market_index.id
+    )
+    if start_date:
+        query = query.where(index_levels.bucket_start >= start_date)
+    if end_date:
+        query = query.where(index_levels.bucket_start <= end_date)
+    if resolution == "day":
+        day_start = func.date_trunc("day", index_levels.bucket_start, 'UTC')
+        query = (
+            query.with_only_columns(day_start.label("bucket_start"), index_levels.level, index_levels.constituent_count)
+            .distinct(day_start)
+            .order_by(day_start, index_levels.bucket_start.desc())
+        )
+    else:
+        query = query.order_by(index_levels.bucket_start)
+
+    return OperationResult(
+        status=OperationStatus.SUCCESS,
+        data=schemas.MarketIndexHistory(
+            **schemas.MarketIndex.model_validate(db_market_index).model_dump(),
+            levels=[
+                schemas.MarketIndexLevel(bucket_start=bucket_start, level=level, constituent_count=constituent_count)
+                for bucket_start, level, constituent_count in db.execute(query).all()
+            ]
+        )
+    )
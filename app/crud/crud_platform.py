@@ -1,9 +1,13 @@
+from typing import Set
+
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 import app.models as models
 import app.schemas as schemas
 from app.core.operation_result import OperationResult, OperationStatus
 from app.core.paging import PagingData
+from app.crud import crud_appearance_market_stats
 
 
 def _get_platform_by_name(db: Session, name: str):
@@ -15,7 +19,7 @@ def create_platform(db: Session, platform: schemas.PlatformCreate) -> OperationR
     if db_platform:
         return OperationResult(status=OperationStatus.CONFLICT, data=schemas.Platform.model_validate(db_platform))
 
-    db_platform = models.Platform(name=platform.name)
+    db_platform = models.Platform(name=platform.name, fee_rate=platform.fee_rate)
     db.add(db_platform)
     db.commit()
     db.refresh(db_platform)
@@ -31,6 +35,10 @@ def get_platform_by_id(db: Session, platform_id: int) -> OperationResult[schemas
     return OperationResult(status=OperationStatus.SUCCESS, data=schemas.Platform.model_validate(db_platform))
 
 
+def get_platform_ids(db: Session) -> Set[int]:
+    return {platform_id for platform_id, in db.query(models.Platform.id).all()}
+
+
 def get_platforms(db: Session, page: int = 1, page_size: int = 100) -> OperationResult[PagingData[schemas.Platform]]:
     total_count = db.query(models.Platform).count()
     if total_count == 0:
@@ -61,12 +69,10 @@ def update_platform(
         platform_id: int,
         platform: schemas.PlatformUpdate
 ) -> OperationResult[schemas.Platform]:
-    operation_result = get_platform_by_id(db, platform_id=platform_id)
-    if operation_result.status == OperationStatus.NOT_FOUND:
+    db_platform = db.query(models.Platform).filter(models.Platform.id == platform_id).first()
+    if not db_platform:
         return OperationResult(status=OperationStatus.NOT_FOUND)
 
-    db_platform = operation_result.data
-
     update_data = platform.model_dump(exclude_unset=True)
     if "name" in update_data and update_data["name"] != db_platform.name:
         existing_platform = _get_platform_by_name(db, name=update_data["name"])
@@ -76,9 +82,20 @@ def update_platform(
                 data=schemas.Platform.model_validate(existing_platform)
             )
 
+    fee_rate_changed = "fee_rate" in update_data and update_data["fee_rate"] != db_platform.fee_rate
     for key, value in update_data.items():
         setattr(db_platform, key, value)
     db.add(db_platform)
+    if fee_rate_changed:
+        # 手续费影响扣费后的价差，需重算在该平台有报价的外观
+        db.flush()
+        crud_appearance_market_stats.refresh_appearance_market_stats(
+            db,
+            db.execute(
+                select(models.PlatformLatestPrice.appearance_id)
+                .where(models.PlatformLatestPrice.platform_id == platform_id)
+            ).scalars()
+        )
     db.commit()
     db.refresh(db_platform)
 
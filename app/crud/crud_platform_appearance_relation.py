@@ -0,0 +1,16 @@
+from typing import Dict, Tuple
+
+from sqlalchemy.orm import Session
+
+import app.models as models
+
+
+def get_platform_appearance_map(db: Session) -> Dict[Tuple[int, str], int]:
+    """All relations as {(platform_id, platform_appearance_id): appearance_id}."""
+    rows = db.query(
+        models.PlatformAppearanceRelation.platform_id,
+        models.PlatformAppearanceRelation.platform_appearance_id,
+        models.PlatformAppearanceRelation.appearance_id,
+    ).all()
+    return {(platform_id, platform_appearance_id): appearance_id
+            for platform_id, platform_appearance_id, appearance_id in rows}
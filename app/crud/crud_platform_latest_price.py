@@ -0,0 +1,110 @@
+from typing import Optional
+
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import FromClause
+
+import app.models as models
+
+
+def upsert_platform_latest_prices(db: Session, source: FromClause) -> None:
+    """
+    Merge the newest point per (appearance, platform) of ``source`` into platform_latest_price.
+
+    ``source`` must expose appearance_id, platform_id, lowest_price_cents, quantity_on_sale and recorded_at.
+    Older points arriving late never overwrite a newer latest price.
+    """
+    newest_points = (
+        select(
+            source.c.appearance_id,
+            source.c.platform_id,
+            source.c.lowest_price_cents,
+            source.c.quantity_on_sale,
+            source.c.recorded_at,
+        )
+        .distinct(source.c.appearance_id, source.c.platform_id)
+        .order_by(source.c.appearance_id, source.c.platform_id, source.c.recorded_at.desc())
+    )
+
+    insert_stmt = insert(models.PlatformLatestPrice).from_select(
+        ["appearance_id", "platform_id", "lowest_price_cents", "quantity_on_sale", "recorded_at"],
+        newest_points
+    )
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[models.PlatformLatestPrice.appearance_id, models.PlatformLatestPrice.platform_id],
+        set_={
+            "lowest_price_cents": insert_stmt.excluded.lowest_price_cents,
+            "quantity_on_sale": insert_stmt.excluded.quantity_on_sale,
+            "recorded_at": insert_stmt.excluded.recorded_at,
+        },
+        where=models.PlatformLatestPrice.recorded_at <= insert_stmt.excluded.recorded_at
+    )
+    db.execute(upsert_stmt)
+
+
+def rebuild_platform_latest_prices(
+        db: Session,
+        appearance_id: Optional[int] = None,
+        platform_id: Optional[int] = None
+) -> None:
+    """Recompute latest prices from platform_price_history, e.g. after history rows were deleted."""
+    delete_stmt = delete(models.PlatformLatestPrice)
+    if appearance_id:
+        delete_stmt = delete_stmt.where(models.PlatformLatestPrice.appearance_id == appearance_id)
+    if platform_id:
+        delete_stmt = delete_stmt.where(models.PlatformLatestPrice.platform_id == platform_id)
+    db.execute(delete_stmt)
+
+    history_query = select(models.PlatformPriceHistory)
+    if appearance_id:
+        history_query = history_query.where(models.PlatformPriceHistory.appearance_id == appearance_id)
+    if platform_id:
+        history_query = history_query.where(models.PlatformPriceHistory.platform_id == platform_id)
+
+    upsert_platform_latest_prices(db, history_query.subquery())
+
+
+def rebuild_removed_platform_latest_prices(db: Session, source: FromClause) -> None:
+    """
+    Recompute the latest prices that pointed at a point of ``source``, e.g. the points just deleted.
+
+    ``source`` must expose appearance_id, platform_id and recorded_at; other latest prices are left alone.
+    """
+    removed_series = db.execute(
+        delete(models.PlatformLatestPrice)
+        .where(
+            tuple_(
+                models.PlatformLatestPrice.appearance_id,
+                models.PlatformLatestPrice.platform_id,
+                models.PlatformLatestPrice.recorded_at
+            ).in_(select(source.c.appearance_id, source.c.platform_id, source.c.recorded_at))
+        )
+        .returning(models.PlatformLatestPrice.appearance_id, models.PlatformLatestPrice.platform_id)
+    ).all()
+    if not removed_series:
+        return
+
+    history_query = select(models.PlatformPriceHistory).where(
+        tuple_(models.PlatformPriceHistory.appearance_id, models.PlatformPriceHistory.platform_id).in_(
+            [tuple(series) for series in removed_series]
+        )
+    )
+    upsert_platform_latest_prices(db, history_query.subquery())
+
+
+def get_latest_price_subquery(db: Session, name: str = 'latest_price_subquery'):
+    """Latest price of each appearance across all platforms, read from platform_latest_price."""
+    return (
+        db.query(
+            models.PlatformLatestPrice.appearance_id,
+            models.PlatformLatestPrice.lowest_price_cents.label("price"),
+            models.PlatformLatestPrice.quantity_on_sale,
+        )
+        .distinct(models.PlatformLatestPrice.appearance_id)
+        .order_by(
+            models.PlatformLatestPrice.appearance_id,
+            models.PlatformLatestPrice.recorded_at.desc()
+        )
+        .subquery(name)
+    )
@@ -0,0 +1,188 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from sqlalchemy import select, delete, func, case, tuple_
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import FromClause
+
+import app.models as models
+import app.schemas as schemas
+from app.core.operation_result import OperationResult, OperationStatus
+
+# 分辨率同时也是 date_trunc 的单位
+CANDLE_MODELS = {
+    "hour": models.PlatformPriceCandleHourly,
+    "day": models.PlatformPriceCandleDaily,
+}
+
+_BUCKET_SIZES = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+
+def _truncate(value: datetime, unit: str) -> datetime:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    value = value.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if unit == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def _upsert_candles(db: Session, candle_model, unit: str, source: FromClause) -> None:
+    bucket_start = func.date_trunc(unit, source.c.recorded_at, 'UTC')
+    batch_candles = (
+        select(
+            source.c.appearance_id,
+            source.c.platform_id,
+            bucket_start.label("bucket_start"),
+            func.array_agg(aggregate_order_by(source.c.lowest_price_cents, source.c.recorded_at.asc()))[1],
+            func.max(source.c.lowest_price_cents),
+            func.min(source.c.lowest_price_cents),
+            func.array_agg(aggregate_order_by(source.c.lowest_price_cents, source.c.recorded_at.desc()))[1],
+            func.min(source.c.quantity_on_sale),
+            func.sum(source.c.quantity_on_sale),
+            func.count(source.c.quantity_on_sale),
+            func.array_agg(aggregate_order_by(source.c.quantity_on_sale, source.c.recorded_at.desc()))[1],
+            func.min(source.c.recorded_at),
+            func.max(source.c.recorded_at),
+        )
+        .group_by(source.c.appearance_id, source.c.platform_id, bucket_start)
+    )
+
+    insert_stmt = insert(candle_model).from_select(
+        [
+            "appearance_id", "platform_id", "bucket_start",
+            "open_price_cents", "high_price_cents", "low_price_cents", "close_price_cents",
+            "min_quantity_on_sale", "quantity_on_sale_sum", "quantity_on_sale_count", "close_quantity_on_sale",
+            "open_recorded_at", "close_recorded_at",
+        ],
+        batch_candles
+    )
+    excluded = insert_stmt.excluded
+    # 迟到的乱序点只在早于现有开盘点 / 晚于现有收盘点时才替换开盘价 / 收盘价；挂单数之和与点数直接累加
+    upsert_stmt = insert_stmt.on_conflict_do_update(
+        index_elements=[candle_model.appearance_id, candle_model.platform_id, candle_model.bucket_start],
+        set_={
+            "open_price_cents": case(
+                (excluded.open_recorded_at < candle_model.open_recorded_at, excluded.open_price_cents),
+                else_=candle_model.open_price_cents
+            ),
+            "high_price_cents": func.greatest(candle_model.high_price_cents, excluded.high_price_cents),
+            "low_price_cents": func.least(candle_model.low_price_cents, excluded.low_price_cents),
+            "close_price_cents": case(
+                (excluded.close_recorded_at >= candle_model.close_recorded_at, excluded.close_price_cents),
+                else_=candle_model.close_price_cents
+            ),
+            "min_quantity_on_sale": func.least(candle_model.min_quantity_on_sale, excluded.min_quantity_on_sale),
+            "quantity_on_sale_sum":
+                func.coalesce(candle_model.quantity_on_sale_sum, 0) + func.coalesce(excluded.quantity_on_sale_sum, 0),
+            "quantity_on_sale_count":
+                func.coalesce(candle_model.quantity_on_sale_count, 0) + excluded.quantity_on_sale_count,
+            "close_quantity_on_sale": case(
+                (excluded.close_recorded_at >= candle_model.close_recorded_at, excluded.close_quantity_on_sale),
+                else_=candle_model.close_quantity_on_sale
+            ),
+            "open_recorded_at": func.least(candle_model.open_recorded_at, excluded.open_recorded_at),
+            "close_recorded_at": func.greatest(candle_model.close_recorded_at, excluded.close_recorded_at),
+        }
+    )
+    db.execute(upsert_stmt)
+
+
+def upsert_platform_price_candles(db: Session, source: FromClause) -> None:
+    """Fold the points of ``source`` into the hourly and daily candles, including late out-of-order points."""
+    for unit, candle_model in CANDLE_MODELS.items():
+        _upsert_candles(db, candle_model, unit, source)
+
+
+def rebuild_platform_price_candle_buckets(db: Session, source: FromClause) -> None:
+    """Recompute, from platform_price_history, the candles whose buckets contain a point of ``source``."""
+    history = models.PlatformPriceHistory
+    first_recorded_at, last_recorded_at = db.execute(
+        select(func.min(source.c.recorded_at), func.max(source.c.recorded_at))
+    ).one()
+    if first_recorded_at is None:
+        return
+
+    for unit, candle_model in CANDLE_MODELS.items():
+        # date_trunc 之后的条件无法裁剪分区，另外用常量给出涉及的桶的整体时间范围
+        range_start = _truncate(first_recorded_at, unit)
+        range_end = _truncate(last_recorded_at, unit) + _BUCKET_SIZES[unit]
+        touched_buckets = (
+            select(source.c.appearance_id, source.c.platform_id, func.date_trunc(unit, source.c.recorded_at, 'UTC'))
+            .distinct()
+        )
+        db.execute(
+            delete(candle_model).where(
+                candle_model.bucket_start >= range_start,
+                candle_model.bucket_start < range_end,
+                tuple_(candle_model.appearance_id, candle_model.platform_id, candle_model.bucket_start)
+                .in_(touched_buckets)
+            )
+        )
+        history_query = select(history).where(
+            history.recorded_at >= range_start,
+            history.recorded_at < range_end,
+            tuple_(history.appearance_id, history.platform_id, func.date_trunc(unit, history.recorded_at, 'UTC'))
+            .in_(touched_buckets)
+        )
+        _upsert_candles(db, candle_model, unit, history_query.subquery())
+
+
+def rebuild_platform_price_candles(
+        db: Session,
+        appearance_id: Optional[int] = None,
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+) -> None:
+    """Recompute the candles touching [start_date, end_date] from platform_price_history."""
+    for unit, candle_model in CANDLE_MODELS.items():
+        delete_stmt = delete(candle_model)
+        history_query = select(models.PlatformPriceHistory)
+        if appearance_id:
+            delete_stmt = delete_stmt.where(candle_model.appearance_id == appearance_id)
+            history_query = history_query.where(models.PlatformPriceHistory.appearance_id == appearance_id)
+        if platform_id:
+            delete_stmt = delete_stmt.where(candle_model.platform_id == platform_id)
+            history_query = history_query.where(models.PlatformPriceHistory.platform_id == platform_id)
+        if start_date:
+            bucket_floor = _truncate(start_date, unit)
+            delete_stmt = delete_stmt.where(candle_model.bucket_start >= bucket_floor)
+            history_query = history_query.where(models.PlatformPriceHistory.recorded_at >= bucket_floor)
+        if end_date:
+            bucket_ceiling = _truncate(end_date, unit)
+            delete_stmt = delete_stmt.where(candle_model.bucket_start <= bucket_ceiling)
+            history_query = history_query.where(
+                models.PlatformPriceHistory.recorded_at < bucket_ceiling + _BUCKET_SIZES[unit]
+            )
+
+        db.execute(delete_stmt)
+        _upsert_candles(db, candle_model, unit, history_query.subquery())
+
+
+def get_platform_price_candles(
+        db: Session,
+        appearance_id: int,
+        resolution: str = "day",
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+) -> OperationResult[List[schemas.PlatformPriceCandle]]:
+    candle_model = CANDLE_MODELS[resolution]
+
+    query = db.query(candle_model).filter(candle_model.appearance_id == appearance_id)
+    if platform_id:
+        query = query.filter(candle_model.platform_id == platform_id)
+    if start_date:
+        query = query.filter(candle_model.bucket_start >= _truncate(start_date, resolution))
+    if end_date:
+        query = query.filter(candle_model.bucket_start <= end_date)
+
+    db_candles = query.order_by(candle_model.platform_id, candle_model.bucket_start).all()
+
+    items = [schemas.PlatformPriceCandle.model_validate(db_candle) for db_candle in db_candles]
+    return OperationResult(status=OperationStatus.SUCCESS, data=items)
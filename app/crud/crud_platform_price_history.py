@@ -1,21 +1,736 @@
-from typing import List, Optional
+import heapq
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+from itertools import groupby, islice
+from operator import attrgetter, itemgetter
+from typing import Iterator, List, Optional, Set, Tuple
 
+import numpy as np
+import psycopg2
+from sqlalchemy import Table, MetaData, Column, BigInteger, Integer, DateTime, Date, Boolean, Identity, select, \
+    delete, update, func, cast, exists, and_, or_, false, true, text, tuple_, ColumnElement
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DataError, IntegrityError
 from sqlalchemy.orm import Session
 
 import app.models as models
 import app.schemas as schemas
+from app.core.config import settings
 from app.core.operation_result import OperationResult, OperationStatus
 from app.core.paging import PagingData
+from app.crud import crud_appearance_market_stats, crud_market_index, crud_platform_latest_price, \
+    crud_platform_price_candle, crud_platform_price_history_archive, crud_platform_price_quarantine
+from app.jobs.price_history_partitions import add_months, current_month
+from app.services.catalog_id_cache import catalog_id_cache
+from app.services.price_history_stream import PriceHistoryStreamReader
+from app.services.platform_appearance_resolver import platform_appearance_resolver
+from app.services.price_downsampling import downsample_series
+from app.services.price_outlier_filter import price_outlier_filter
+from app.services.price_history_archive import ARCHIVE_COLUMNS, read_archived_rows, iter_archived_rows
+from app.services.price_series_cache import price_series_cache
 
+# 每次入库先写入事务级临时表，再由它一次性派生出主表与各类汇总表的更新
+_price_history_staging = Table(
+    "platform_price_history_staging",
+    MetaData(),
+    Column("row_id", BigInteger, Identity(), primary_key=True),
+    Column("appearance_id", BigInteger, nullable=False),
+    Column("platform_id", Integer, nullable=False),
+    Column("lowest_price_cents", BigInteger, nullable=False),
+    Column("quantity_on_sale", Integer),
+    Column("recorded_at", DateTime(timezone=True), nullable=False),
+    Column("existed", Boolean, nullable=False, server_default=false()),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
 
-def create_platform_price_histories(
+# 批量删除时每个分块删掉的点，用于在同一事务内重算 K 线与最新价
+_deleted_price_points = Table(
+    "platform_price_history_deleted",
+    MetaData(),
+    Column("appearance_id", BigInteger, nullable=False),
+    Column("platform_id", Integer, nullable=False),
+    Column("recorded_at", DateTime(timezone=True), nullable=False),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+_PRICE_HISTORY_COLUMNS = ["appearance_id", "platform_id", "lowest_price_cents", "quantity_on_sale", "recorded_at"]
+_PRICE_POINT_KEY = ["appearance_id", "platform_id", "recorded_at"]
+
+ON_CONFLICT_SKIP = "skip"
+ON_CONFLICT_UPDATE = "update"
+
+REJECTED_UNKNOWN_APPEARANCE = "unknown_appearance_id"
+REJECTED_UNKNOWN_PLATFORM = "unknown_platform_id"
+REJECTED_EXPIRED = "expired_recorded_at"
+REJECTED_ARCHIVED = "archived_month"
+
+# 进程内缓存已确认存在的月分区，避免每个批次都去创建
+_known_partition_months = set()
+# 建分区的 DDL 等待主表锁的上限，调用顺序出错时报错而不是与本进程的会话互相等待
+_PARTITION_DDL_LOCK_TIMEOUT = "5s"
+
+
+def _ensure_partitions(db: Session, months: Set[date]) -> None:
+    """
+    Create the missing monthly partitions of ``months`` in a separate short transaction.
+
+    Creating a partition locks platform_price_history exclusively, so this must run before the session's
+    transaction touches the parent table; otherwise the DDL would wait on the session it is called from.
+    Upcoming months are created ahead of time by the partition job, this only covers backfills.
+    """
+    missing_months = sorted(month for month in months if month not in _known_partition_months)
+    if not missing_months:
+        return
+
+    with db.get_bind().begin() as connection:
+        connection.execute(text(f"SET LOCAL lock_timeout = '{_PARTITION_DDL_LOCK_TIMEOUT}'"))
+        for month in missing_months:
+            connection.execute(select(func.create_platform_price_history_partition(month)))
+    _known_partition_months.update(missing_months)
+
+
+def _as_utc(recorded_at: datetime) -> datetime:
+    # 与分区边界一致按 UTC 处理，不带时区的时间视为 UTC
+    if recorded_at.tzinfo is None:
+        return recorded_at.replace(tzinfo=timezone.utc)
+    return recorded_at.astimezone(timezone.utc)
+
+
+def _month_of(recorded_at: datetime) -> date:
+    return _as_utc(recorded_at).date().replace(day=1)
+
+
+def _partition_months(history_dicts: List[dict]) -> Set[date]:
+    return {_month_of(history_dict["recorded_at"]) for history_dict in history_dicts}
+
+
+def _month_bounds(month: date) -> Tuple[datetime, datetime]:
+    next_month = add_months(month, 1)
+    return (
+        datetime(month.year, month.month, 1, tzinfo=timezone.utc),
+        datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+    )
+
+
+def _retention_cutoff() -> Optional[datetime]:
+    """
+    Start of the oldest month kept by partition retention, None when retention is disabled.
+
+    Older months are detached (or dropped) by the partition job; their table may still exist, so points in
+    them can neither be routed to a partition nor get a new one and are rejected before staging.
+    """
+    if settings.PRICE_HISTORY_RETENTION_MONTHS <= 0:
+        return None
+    cutoff_start, _ = _month_bounds(add_months(current_month(), -settings.PRICE_HISTORY_RETENTION_MONTHS))
+    return cutoff_start
+
+
+def _staged_partition_months(db: Session) -> Set[date]:
+    return set(db.execute(
+        select(
+            cast(func.date_trunc('month', func.timezone('UTC', _price_history_staging.c.recorded_at)), Date)
+        ).distinct()
+    ).scalars())
+
+
+def _staged_key_matches(other) -> ColumnElement[bool]:
+    return and_(*[_price_history_staging.c[name] == other.c[name] for name in _PRICE_POINT_KEY])
+
+
+# 与上一个点（批次内的前一个点，或已入库的最新点）价格和在售数量都相同的点属于同一段“平台期”；
+# 平台期内以起点为锚按心跳间隔分槽，每个槽只保留第一个点，因此长期不变的价格仍会定期留下一个点
+_DROP_UNCHANGED_STAGED_SQL = text(f"""
+WITH candidates AS (
+    SELECT s.row_id, s.appearance_id, s.platform_id, s.lowest_price_cents, s.quantity_on_sale, s.recorded_at,
+           l.recorded_at AS latest_recorded_at,
+           l.lowest_price_cents = s.lowest_price_cents
+               AND l.quantity_on_sale IS NOT DISTINCT FROM s.quantity_on_sale AS matches_latest
+    FROM {_price_history_staging.name} s
+    LEFT JOIN platform_latest_price l ON l.appearance_id = s.appearance_id AND l.platform_id = s.platform_id
+    WHERE l.recorded_at IS NULL OR s.recorded_at > l.recorded_at
+),
+changes AS (
+    SELECT *,
+           CASE
+               WHEN lag(row_id) OVER pair_points IS NULL THEN NOT coalesce(matches_latest, false)
+               ELSE lowest_price_cents <> lag(lowest_price_cents) OVER pair_points
+                   OR quantity_on_sale IS DISTINCT FROM lag(quantity_on_sale) OVER pair_points
+           END AS starts_run
+    FROM candidates
+    WINDOW pair_points AS (PARTITION BY appearance_id, platform_id ORDER BY recorded_at)
+),
+runs AS (
+    SELECT *,
+           count(*) FILTER (WHERE starts_run) OVER (
+               PARTITION BY appearance_id, platform_id ORDER BY recorded_at
+           ) AS run_no
+    FROM changes
+),
+slots AS (
+    SELECT row_id, appearance_id, platform_id, recorded_at, run_no,
+           coalesce(floor(extract(EPOCH FROM recorded_at - CASE
+               WHEN run_no = 0 THEN latest_recorded_at
+               ELSE min(recorded_at) OVER (PARTITION BY appearance_id, platform_id, run_no)
+           END) / :heartbeat_seconds), 0) AS slot
+    FROM runs
+),
+ranked AS (
+    SELECT row_id, run_no, slot,
+           row_number() OVER (PARTITION BY appearance_id, platform_id, run_no, slot ORDER BY recorded_at) AS slot_rank
+    FROM slots
+)
+DELETE FROM {_price_history_staging.name}
+WHERE row_id IN (SELECT row_id FROM ranked WHERE slot_rank > 1 OR (run_no = 0 AND slot = 0))
+""")
+
+
+def _heartbeat_seconds() -> int:
+    """Heartbeat interval of change-only storage in seconds."""
+    return settings.PRICE_HISTORY_HEARTBEAT_MINUTES * 60
+
+
+def _carry_forward_interval() -> timedelta:
+    return timedelta(seconds=_heartbeat_seconds())
+
+
+def _drop_unchanged_staged_points(db: Session) -> int:
+    """Remove staged points that only repeat the previous point of their series within the heartbeat interval."""
+    return db.execute(_DROP_UNCHANGED_STAGED_SQL, {"heartbeat_seconds": _heartbeat_seconds()}).rowcount
+
+
+def _release_level_shifts(db: Session, staged_rows: List[Row], is_outlier: np.ndarray) -> Tuple[Set[int], int]:
+    """
+    Release the flagged points of series that moved to a new price level, see PriceOutlierFilter.is_level_shift.
+
+    The run of a series is every point quarantined after its last stored point, including the flagged staged
+    ones. When it is a level shift the staged points are kept and the earlier quarantined ones are moved back
+    into the staging table, so the whole run is stored. Returns the kept staged row ids and the moved count.
+    """
+    if not price_outlier_filter.rebase_points:
+        return set(), 0
+
+    # 批次内正常点之后的离群点才可能与之前隔离的点连成一段
+    run_after = {}
+    flagged_by_series = {}
+    for (row_id, appearance_id, platform_id, price, quantity, recorded_at), outlier in zip(staged_rows, is_outlier):
+        key = (appearance_id, platform_id)
+        if outlier:
+            flagged_by_series.setdefault(key, []).append((recorded_at, price, row_id))
+        elif key not in run_after or recorded_at > run_after[key]:
+            run_after[key] = recorded_at
+    if not flagged_by_series:
+        return set(), 0
+
+    quarantine = models.PlatformPriceQuarantine
+    latest = models.PlatformLatestPrice
+    quarantined_rows = db.execute(
+        select(quarantine.id, quarantine.appearance_id, quarantine.platform_id, quarantine.lowest_price_cents,
+               quarantine.quantity_on_sale, quarantine.recorded_at)
+        .outerjoin(
+            latest,
+            and_(latest.appearance_id == quarantine.appearance_id, latest.platform_id == quarantine.platform_id)
+        )
+        .where(
+            tuple_(quarantine.appearance_id, quarantine.platform_id).in_(list(flagged_by_series)),
+            or_(latest.recorded_at.is_(None), quarantine.recorded_at > latest.recorded_at)
+        )
+        .order_by(quarantine.recorded_at, quarantine.id)
+    ).all()
+    quarantined_by_series = {}
+    for quarantine_id, appearance_id, platform_id, *point in quarantined_rows:
+        quarantined_by_series.setdefault((appearance_id, platform_id), []).append((quarantine_id, *point))
+
+    kept_row_ids = set()
+    released_ids = []
+    released_dicts = {}
+    for key, flagged_points in flagged_by_series.items():
+        after = run_after.get(key)
+        earlier_points = [
+            point for point in quarantined_by_series.get(key, []) if after is None or point[3] > after
+        ]
+        staged_points = [point for point in flagged_points if after is None or point[0] > after]
+        # 同一时间点重复隔离时只保留最新的一条，本批次的点优先
+        run = {recorded_at: price for _, price, _, recorded_at in earlier_points}
+        run.update((recorded_at, price) for recorded_at, price, _ in staged_points)
+        if not price_outlier_filter.is_level_shift([run[recorded_at] for recorded_at in sorted(run)]):
+            continue
+
+        kept_row_ids.update(row_id for _, _, row_id in staged_points)
+        staged_times = {recorded_at for recorded_at, _, _ in staged_points}
+        for quarantine_id, price, quantity, recorded_at in earlier_points:
+            released_ids.append(quarantine_id)
+            if recorded_at not in staged_times:
+                released_dicts[(*key, recorded_at)] = {
+                    "appearance_id": key[0],
+                    "platform_id": key[1],
+                    "lowest_price_cents": price,
+                    "quantity_on_sale": quantity,
+                    "recorded_at": recorded_at,
+                }
+
+    if released_ids:
+        db.execute(delete(quarantine).where(quarantine.id.in_(released_ids)))
+    if released_dicts:
+        db.execute(insert(_price_history_staging), list(released_dicts.values()))
+    return kept_row_ids, len(released_dicts)
+
+
+def _quarantine_staged_outliers(db: Session) -> Tuple[int, int]:
+    """
+    Move staged points the outlier filter flags into platform_price_quarantine, unless their series moved to a
+    new price level. Returns the quarantined count and the count of earlier quarantined points released.
+    """
+    staging = _price_history_staging
+    rows = db.execute(
+        select(staging.c.row_id, staging.c.appearance_id, staging.c.platform_id, staging.c.lowest_price_cents,
+               staging.c.quantity_on_sale, staging.c.recorded_at)
+    ).all()
+    if not rows:
+        return 0, 0
+
+    row_ids, appearance_ids, platform_ids, prices = (np.array(column) for column in list(zip(*rows))[:4])
+    outlier_check = price_outlier_filter.check(db, appearance_ids, platform_ids, prices)
+    if not outlier_check.is_outlier.any():
+        return 0, 0
+
+    kept_row_ids, released_count = _release_level_shifts(db, rows, outlier_check.is_outlier)
+    flagged = [index for index in np.flatnonzero(outlier_check.is_outlier) if int(row_ids[index]) not in kept_row_ids]
+    if not flagged:
+        return 0, released_count
+
+    scores = {
+        int(row_ids[index]): (int(outlier_check.medians[index]), float(outlier_check.deviations[index]))
+        for index in flagged
+    }
+    quarantined_rows = db.execute(
+        delete(staging)
+        .where(staging.c.row_id.in_(list(scores)))
+        .returning(staging.c.row_id, *[staging.c[name] for name in _PRICE_HISTORY_COLUMNS])
+    ).all()
+    crud_platform_price_quarantine.create_quarantined_prices(db, [
+        {
+            **dict(zip(_PRICE_HISTORY_COLUMNS, point)),
+            "median_price_cents": scores[row_id][0],
+            "deviation": scores[row_id][1],
+        }
+        for row_id, *point in quarantined_rows
+    ])
+    return len(quarantined_rows), released_count
+
+
+def _merge_staged_price_histories(
         db: Session,
-        histories: List[schemas.PlatformPriceHistoryCreate]
-) -> OperationResult[int]:
-    history_dicts = [history.model_dump() for history in histories]
-    db.bulk_insert_mappings(models.PlatformPriceHistory, history_dicts)
+        on_conflict: str = ON_CONFLICT_SKIP,
+        changes_only: bool = False
+) -> schemas.PlatformPriceHistoryIngestResult:
+    """
+    Merge the staged batch into platform_price_history, keyed by (appearance_id, platform_id, recorded_at).
+
+    With ``changes_only`` points equal to the previous point of their series are dropped unless a heartbeat
+    interval has passed, see _DROP_UNCHANGED_STAGED_SQL. Afterwards the staging table only holds the rows that
+    were actually inserted or updated, which is what all derived tables are refreshed from. The partitions
+    of the staged months must already exist, see _ensure_partitions.
+    """
+    staged_count = db.execute(select(func.count()).select_from(_price_history_staging)).scalar()
+
+    # 1. 批次内重复的点只保留最后一条
+    later_duplicate = _price_history_staging.alias("later_duplicate")
+    db.execute(
+        delete(_price_history_staging).where(
+            _staged_key_matches(later_duplicate),
+            _price_history_staging.c.row_id < later_duplicate.c.row_id
+        )
+    )
+    quarantined_count, released_count = _quarantine_staged_outliers(db) if price_outlier_filter.enabled else (0, 0)
+    unchanged_count = _drop_unchanged_staged_points(db) if changes_only else 0
+
+    # 2. 标记主表中已存在的点，用于区分新增与更新（分区表上无法通过 RETURNING xmax 判断）
+    history_table = models.PlatformPriceHistory.__table__
+    db.execute(
+        update(_price_history_staging)
+        .where(exists().where(_staged_key_matches(history_table)))
+        .values(existed=true())
+    )
+
+    # 3. 写入主表，冲突时跳过或仅在数值变化时更新
+    staged_rows = select(*[_price_history_staging.c[name] for name in _PRICE_HISTORY_COLUMNS])
+    insert_stmt = insert(history_table).from_select(_PRICE_HISTORY_COLUMNS, staged_rows)
+    if on_conflict == ON_CONFLICT_UPDATE:
+        insert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=_PRICE_POINT_KEY,
+            set_={
+                "lowest_price_cents": insert_stmt.excluded.lowest_price_cents,
+                "quantity_on_sale": insert_stmt.excluded.quantity_on_sale,
+            },
+            where=or_(
+                history_table.c.lowest_price_cents != insert_stmt.excluded.lowest_price_cents,
+                history_table.c.quantity_on_sale.is_distinct_from(insert_stmt.excluded.quantity_on_sale)
+            )
+        )
+    else:
+        insert_stmt = insert_stmt.on_conflict_do_nothing(index_elements=_PRICE_POINT_KEY)
+
+    merged = insert_stmt.returning(*[history_table.c[name] for name in _PRICE_POINT_KEY]).cte("merged")
+
+    # 4. 从暂存表中剔除被跳过的行，后续汇总表只基于真正写入的数据更新
+    pruned = (
+        delete(_price_history_staging)
+        .where(~exists().where(_staged_key_matches(merged)))
+        .returning(_price_history_staging.c.row_id)
+        .cte("pruned")
+    )
+
+    inserted_count, updated_count = db.execute(
+        select(
+            func.count().filter(~_price_history_staging.c.existed),
+            func.count().filter(_price_history_staging.c.existed),
+        )
+        .select_from(_price_history_staging.join(merged, _staged_key_matches(merged)))
+        .add_cte(pruned)
+    ).one()
+
+    crud_platform_latest_price.upsert_platform_latest_prices(db, _price_history_staging)
+    crud_platform_price_candle.upsert_platform_price_candles(db, _price_history_staging)
+    if updated_count:
+        # 被改写的点可能原本就是最高 / 最低价，K 线无法增量修正，只能按桶重算
+        updated_points = select(_price_history_staging).where(_price_history_staging.c.existed).subquery()
+        crud_platform_price_candle.rebuild_platform_price_candle_buckets(db, updated_points)
+    crud_appearance_market_stats.refresh_appearance_market_stats(
+        db,
+        db.execute(select(_price_history_staging.c.appearance_id).distinct()).scalars()
+    )
+
+    return schemas.PlatformPriceHistoryIngestResult(
+        accepted=staged_count,
+        inserted=inserted_count,
+        updated=updated_count,
+        skipped=staged_count + released_count - inserted_count - updated_count - unchanged_count - quarantined_count,
+        unchanged=unchanged_count,
+        quarantined=quarantined_count,
+        released=released_count
+    )
+
+
+def _collect_series_changes(db: Session) -> tuple:
+    """Read what the merged batch changed per appearance before the staging table is dropped on commit."""
+    staging = _price_history_staging
+    touched_ids = set(db.execute(select(staging.c.appearance_id).distinct()).scalars())
+    rewritten_ids = set(db.execute(select(staging.c.appearance_id).where(staging.c.existed).distinct()).scalars())
+
+    # 只有本进程已缓存的序列才需要追加新点
+    appendable_ids = price_series_cache.cached_appearance_ids() & (touched_ids - rewritten_ids)
+    new_points = {}
+    if appendable_ids:
+        rows = db.execute(
+            select(staging.c.appearance_id, staging.c.platform_id, staging.c.lowest_price_cents,
+                   staging.c.quantity_on_sale, staging.c.recorded_at)
+            .where(staging.c.appearance_id.in_(appendable_ids))
+            .order_by(staging.c.appearance_id, staging.c.recorded_at)
+        ).all()
+        for appearance_id, *point in rows:
+            new_points.setdefault(appearance_id, []).append(point)
+
+    return touched_ids, rewritten_ids, new_points
+
+
+def _collect_outlier_window_points(db: Session) -> List[tuple]:
+    """Newly inserted points in time order, to be rolled into the outlier filter windows after commit."""
+    if not price_outlier_filter.enabled:
+        return []
+    staging = _price_history_staging
+    return db.execute(
+        select(staging.c.appearance_id, staging.c.platform_id, staging.c.lowest_price_cents)
+        .where(~staging.c.existed)
+        .order_by(staging.c.recorded_at)
+    ).all()
+
+
+def _ingest_history_dicts(
+        db: Session,
+        history_dicts: List[dict],
+        on_conflict: str,
+        changes_only: bool
+) -> schemas.PlatformPriceHistoryIngestResult:
+    if not history_dicts:
+        return schemas.PlatformPriceHistoryIngestResult(accepted=0, inserted=0, updated=0, skipped=0)
+
+    _ensure_partitions(db, _partition_months(history_dicts))
+    _price_history_staging.create(bind=db.connection())
+    db.execute(insert(_price_history_staging), history_dicts)
+    ingest_result = _merge_staged_price_histories(db, on_conflict=on_conflict, changes_only=changes_only)
+    series_changes = _collect_series_changes(db)
+    window_points = _collect_outlier_window_points(db)
     db.commit()
-    return OperationResult(status=OperationStatus.SUCCESS, data=len(history_dicts))
+    price_series_cache.record_ingest(*series_changes)
+    price_outlier_filter.record(window_points)
+    crud_market_index.fold_market_index_changes(db)
+    return ingest_result
+
+
+def _split_rejected_histories(
+        db: Session,
+        histories: List[schemas.PlatformPriceHistoryCreate],
+        indexes: Optional[List[int]] = None
+) -> Tuple[List[dict], List[schemas.PlatformPriceHistoryRejection]]:
+    """
+    Split ``histories`` into insertable dicts and rejections of expired points, points in archived months
+    or dangling references.
+
+    Rejections are reported at ``indexes``, the positions of ``histories`` in the request, by default their own.
+    """
+    unknown_appearance_ids, unknown_platform_ids = catalog_id_cache.unknown_ids(
+        db,
+        appearance_ids=(history.appearance_id for history in histories),
+        platform_ids=(history.platform_id for history in histories)
+    )
+    retention_cutoff = _retention_cutoff()
+    # 归档月份的唯一约束只在热表上，再写入会与归档文件中的点重复
+    archived_months = crud_platform_price_history_archive.get_archived_months(
+        db, {_month_of(history.recorded_at) for history in histories}
+    )
+
+    history_dicts = []
+    rejected = []
+    for index, history in zip(indexes or range(len(histories)), histories):
+        if retention_cutoff is not None and _as_utc(history.recorded_at) < retention_cutoff:
+            rejected.append(schemas.PlatformPriceHistoryRejection(index=index, reason=REJECTED_EXPIRED))
+        elif _month_of(history.recorded_at) in archived_months:
+            rejected.append(schemas.PlatformPriceHistoryRejection(index=index, reason=REJECTED_ARCHIVED))
+        elif history.appearance_id in unknown_appearance_ids:
+            rejected.append(schemas.PlatformPriceHistoryRejection(index=index, reason=REJECTED_UNKNOWN_APPEARANCE))
+        elif history.platform_id in unknown_platform_ids:
+            rejected.append(schemas.PlatformPriceHistoryRejection(index=index, reason=REJECTED_UNKNOWN_PLATFORM))
+        else:
+            history_dicts.append(history.model_dump())
+    return history_dicts, rejected
+
+
+def create_platform_price_histories(
+        db: Session,
+        histories: List[schemas.PlatformPriceHistoryCreate],
+        on_conflict: str = ON_CONFLICT_SKIP,
+        changes_only: bool = False
+) -> OperationResult[schemas.PlatformPriceHistoryIngestResult]:
+    """
+    Points referencing unknown appearances or platforms, older than the retention window or in archived months
+    are rejected one by one, the rest is stored.
+    """
+    history_dicts, rejected = _split_rejected_histories(db, histories)
+    try:
+        ingest_result = _ingest_history_dicts(db, history_dicts, on_conflict=on_conflict, changes_only=changes_only)
+    except IntegrityError:
+        # ID 集合可能落后于数据库（例如饰品刚被删除），强制刷新后重新校验一次
+        db.rollback()
+        catalog_id_cache.invalidate()
+        history_dicts, rejected = _split_rejected_histories(db, histories)
+        ingest_result = _ingest_history_dicts(db, history_dicts, on_conflict=on_conflict, changes_only=changes_only)
+
+    ingest_result.rejected = rejected
+    return OperationResult(status=OperationStatus.SUCCESS, data=ingest_result)
+
+
+def _split_external_histories(
+        db: Session,
+        histories: List[schemas.PlatformPriceHistoryExternalCreate]
+) -> Tuple[List[dict], List[schemas.PlatformPriceHistoryRejection], List[schemas.PlatformAppearanceReference]]:
+    """Resolve platform item ids to appearances, then split the resolved points like ``_split_rejected_histories``."""
+    keys = [(history.platform_id, history.platform_appearance_id) for history in histories]
+    appearance_ids = platform_appearance_resolver.resolve(db, keys)
+
+    resolved_histories = []
+    indexes = []
+    unresolved = {}
+    for index, (key, history) in enumerate(zip(keys, histories)):
+        appearance_id = appearance_ids.get(key)
+        if appearance_id is None:
+            unresolved[key] = schemas.PlatformAppearanceReference(platform_id=key[0], platform_appearance_id=key[1])
+            continue
+        resolved_histories.append(schemas.PlatformPriceHistoryCreate(
+            appearance_id=appearance_id, **history.model_dump(exclude={"platform_appearance_id"})
+        ))
+        indexes.append(index)
+
+    history_dicts, rejected = _split_rejected_histories(db, resolved_histories, indexes)
+    return history_dicts, rejected, list(unresolved.values())
+
+
+def create_platform_price_histories_by_platform_appearance_id(
+        db: Session,
+        histories: List[schemas.PlatformPriceHistoryExternalCreate],
+        on_conflict: str = ON_CONFLICT_SKIP,
+        changes_only: bool = False
+) -> OperationResult[schemas.PlatformPriceHistoryIngestResult]:
+    """
+    Resolve platform item ids to appearances in bulk; points of unknown items are reported, not stored.
+
+    Resolved points are rejected one by one like in ``create_platform_price_histories``.
+    """
+    history_dicts, rejected, unresolved = _split_external_histories(db, histories)
+    try:
+        ingest_result = _ingest_history_dicts(db, history_dicts, on_conflict=on_conflict, changes_only=changes_only)
+    except IntegrityError:
+        # 商品映射与 ID 集合都可能落后于数据库（例如饰品刚被删除），强制刷新后重新解析一次
+        db.rollback()
+        platform_appearance_resolver.invalidate()
+        catalog_id_cache.invalidate()
+        history_dicts, rejected, unresolved = _split_external_histories(db, histories)
+        ingest_result = _ingest_history_dicts(db, history_dicts, on_conflict=on_conflict, changes_only=changes_only)
+
+    ingest_result.unresolved = unresolved
+    ingest_result.rejected = rejected
+    return OperationResult(status=OperationStatus.SUCCESS, data=ingest_result)
+
+
+def _reject_staged_histories(db: Session) -> List[schemas.PlatformPriceHistoryRejection]:
+    """
+    Remove staged points that are expired, in archived months or have dangling references and report them by
+    their row index in the stream.
+    """
+    staging = _price_history_staging
+    # row_id 按 COPY 的读入顺序从 1 开始分配
+    rejected = []
+    retention_cutoff = _retention_cutoff()
+    if retention_cutoff is not None:
+        expired_row_ids = db.execute(
+            delete(staging).where(staging.c.recorded_at < retention_cutoff).returning(staging.c.row_id)
+        ).scalars().all()
+        rejected.extend(
+            schemas.PlatformPriceHistoryRejection(index=row_id - 1, reason=REJECTED_EXPIRED)
+            for row_id in expired_row_ids
+        )
+
+    archived_months = crud_platform_price_history_archive.get_archived_months(db, _staged_partition_months(db))
+    if archived_months:
+        archived_row_ids = db.execute(
+            delete(staging)
+            .where(or_(*[
+                and_(staging.c.recorded_at >= month_start, staging.c.recorded_at < month_end)
+                for month_start, month_end in map(_month_bounds, archived_months)
+            ]))
+            .returning(staging.c.row_id)
+        ).scalars().all()
+        rejected.extend(
+            schemas.PlatformPriceHistoryRejection(index=row_id - 1, reason=REJECTED_ARCHIVED)
+            for row_id in archived_row_ids
+        )
+
+    unknown_appearance_ids, unknown_platform_ids = catalog_id_cache.unknown_ids(
+        db,
+        appearance_ids=db.execute(select(staging.c.appearance_id).distinct()).scalars(),
+        platform_ids=db.execute(select(staging.c.platform_id).distinct()).scalars()
+    )
+    if unknown_appearance_ids or unknown_platform_ids:
+        rejected_rows = db.execute(
+            delete(staging)
+            .where(or_(staging.c.appearance_id.in_(unknown_appearance_ids), staging.c.platform_id.in_(unknown_platform_ids)))
+            .returning(staging.c.row_id, staging.c.appearance_id)
+        ).all()
+        rejected.extend(
+            schemas.PlatformPriceHistoryRejection(
+                index=row_id - 1,
+                reason=REJECTED_UNKNOWN_APPEARANCE if appearance_id in unknown_appearance_ids else REJECTED_UNKNOWN_PLATFORM
+            )
+            for row_id, appearance_id in rejected_rows
+        )
+    return sorted(rejected, key=attrgetter("index"))
+
+
+def copy_platform_price_histories(
+        db: Session,
+        reader: PriceHistoryStreamReader,
+        on_conflict: str = ON_CONFLICT_SKIP,
+        changes_only: bool = False
+) -> OperationResult[schemas.PlatformPriceHistoryIngestResult]:
+    """
+    Stream rows into the staging table with COPY and merge them, without materializing the body.
+
+    Rows referencing unknown appearances or platforms, older than the retention window or in archived months
+    are rejected one by one, the rest is stored. Only a
+    reference deleted after the id cache was loaded still fails the whole stream.
+    """
+    try:
+        columns = reader.read_header()
+        _price_history_staging.create(bind=db.connection())
+
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {_price_history_staging.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                reader
+            )
+        except psycopg2.OperationalError:
+            # read 回调里的异常被 psycopg2 转成 QueryCanceled，换回原始的解析错误
+            if reader.error is None:
+                raise
+            raise ValueError(f"Malformed price history stream: {reader.error}") from reader.error
+        finally:
+            cursor.close()
+
+        rejected = _reject_staged_histories(db)
+        # 暂存表是临时表，到这里会话还没有碰过主表
+        _ensure_partitions(db, _staged_partition_months(db))
+        ingest_result = _merge_staged_price_histories(db, on_conflict=on_conflict, changes_only=changes_only)
+        series_changes = _collect_series_changes(db)
+        window_points = _collect_outlier_window_points(db)
+        db.commit()
+    except (ValueError, psycopg2.DataError, psycopg2.IntegrityError, DataError, IntegrityError) as e:
+        db.rollback()
+        if isinstance(e, (psycopg2.IntegrityError, IntegrityError)):
+            # 请求体已经读完无法重试，只刷新 ID 集合让下一次上传能正确拒绝
+            catalog_id_cache.invalidate()
+        return OperationResult(status=OperationStatus.INVALID, data=str(e))
+
+    ingest_result.rejected = rejected
+
+    price_series_cache.record_ingest(*series_changes)
+    price_outlier_filter.record(window_points)
+    crud_market_index.fold_market_index_changes(db)
+    return OperationResult(status=OperationStatus.SUCCESS, data=ingest_result)
+
+
+def _history_conditions(
+        history_table,
+        platform_id: Optional[int] = None,
+        appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        appearance_ids: Optional[List[int]] = None
+) -> list:
+    series_conditions = []
+    if platform_id:
+        series_conditions.append(history_table.c.platform_id == platform_id)
+    if appearance_id:
+        series_conditions.append(history_table.c.appearance_id == appearance_id)
+    if appearance_ids:
+        series_conditions.append(history_table.c.appearance_id.in_(appearance_ids))
+
+    # 时间范围直接作用在分区键上，PostgreSQL 可以裁剪掉范围外的月分区
+    conditions = list(series_conditions)
+    if end_date:
+        conditions.append(history_table.c.recorded_at <= end_date)
+    if start_date:
+        carry_forward = _carry_forward_interval()
+        # 只存变化点时 start_date 处的价格由它之前最近的点决定，心跳保证该点不早于 start_date - 心跳间隔
+        carried_forward_points = (
+            select(history_table.c.id, history_table.c.recorded_at)
+            .where(
+                *series_conditions,
+                history_table.c.recorded_at < start_date,
+                history_table.c.recorded_at >= start_date - carry_forward
+            )
+            .distinct(history_table.c.appearance_id, history_table.c.platform_id)
+            .order_by(history_table.c.appearance_id, history_table.c.platform_id,
+                      history_table.c.recorded_at.desc())
+        )
+        conditions.append(or_(
+            history_table.c.recorded_at >= start_date,
+            tuple_(history_table.c.id, history_table.c.recorded_at).in_(carried_forward_points)
+        ))
+        conditions.append(history_table.c.recorded_at >= start_date - carry_forward)
+    return conditions
 
 
 def get_platform_price_histories(
@@ -23,16 +738,55 @@ def get_platform_price_histories(
         page: int = 1,
         page_size: int = 100,
         platform_id: Optional[int] = None,
-        appearance_id: Optional[int] = None
+        appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        max_points: Optional[int] = None
 ) -> OperationResult[PagingData[schemas.PlatformPriceHistory]]:
-    base_query = db.query(models.PlatformPriceHistory)
+    """
+    With ``start_date`` the oldest item may be the last point before it, i.e. the price in effect at start_date.
 
-    if platform_id:
-        base_query = base_query.filter(models.PlatformPriceHistory.platform_id == platform_id)
-    if appearance_id:
-        base_query = base_query.filter(models.PlatformPriceHistory.appearance_id == appearance_id)
+    With ``max_points`` every (appearance, platform) series in range is downsampled to at most that many points
+    (LTTB) before paging. All points in range are loaded for that, so callers bound the query by an appearance
+    or a complete date range.
+
+    Archived points are loaded the same way, so a query reaching archived months without such bounds is
+    INVALID instead of reading whole archive files.
+    """
+    base_query = db.query(models.PlatformPriceHistory).filter(
+        *_history_conditions(
+            models.PlatformPriceHistory.__table__,
+            platform_id=platform_id,
+            appearance_id=appearance_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+    )
+
+    # 查询回溯到已归档的月份时，合并 Parquet 冷数据
+    archives = crud_platform_price_history_archive.get_overlapping_archives(
+        db,
+        platform_id=platform_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    if archives and appearance_id is None and (start_date is None or end_date is None):
+        return OperationResult(status=OperationStatus.INVALID)
+    archived_table = read_archived_rows(
+        [archive.path for archive in archives],
+        appearance_id=appearance_id,
+        start_date=start_date,
+        end_date=end_date,
+        descending=True,
+        carry_forward=_carry_forward_interval(),
+        platform_id=platform_id
+    ) if archives else None
+    archived_count = archived_table.num_rows if archived_table is not None else 0
 
-    total_count = base_query.count()
+    if max_points:
+        return _get_downsampled_price_histories(base_query, archived_table, page, page_size, max_points)
+
+    total_count = base_query.count() + archived_count
 
     if total_count == 0:
         return OperationResult(
@@ -41,25 +795,439 @@ def get_platform_price_histories(
         )
 
     offset = (page - 1) * page_size
-    db_platform_price_histories = (
-        base_query
-        .order_by(models.PlatformPriceHistory.recorded_at.desc())
-        .offset(offset)
-        .limit(page_size)
-        .all()
+    if not archived_count:
+        db_platform_price_histories = (
+            base_query
+            .order_by(models.PlatformPriceHistory.recorded_at.desc())
+            .offset(offset)
+            .limit(page_size)
+            .all()
+        )
+        items = [
+            schemas.PlatformPriceHistory.model_validate(db_platform_price_history)
+            for db_platform_price_history in db_platform_price_histories
+        ]
+    else:
+        # 热数据和冷数据各取前 offset + page_size 条，归并后再切出当前页
+        window = offset + page_size
+        hot_items = [
+            schemas.PlatformPriceHistory.model_validate(db_platform_price_history)
+            for db_platform_price_history in base_query.order_by(
+                models.PlatformPriceHistory.recorded_at.desc(),
+                models.PlatformPriceHistory.id.desc()
+            ).limit(window).all()
+        ]
+        archived_items = [
+            schemas.PlatformPriceHistory.model_validate(row)
+            for row in archived_table.slice(0, window).to_pylist()
+        ]
+        merged_items = heapq.merge(
+            hot_items,
+            archived_items,
+            key=lambda item: (item.recorded_at, item.id),
+            reverse=True
+        )
+        items = list(islice(merged_items, offset, window))
+
+    return OperationResult(
+        status=OperationStatus.SUCCESS,
+        data=PagingData(items=items, total_count=total_count)
     )
 
+
+def _get_downsampled_price_histories(
+        base_query,
+        archived_table,
+        page: int,
+        page_size: int,
+        max_points: int
+) -> OperationResult[PagingData[schemas.PlatformPriceHistory]]:
+    history = models.PlatformPriceHistory
+    rows = base_query.with_entities(*[getattr(history, name) for name in ARCHIVE_COLUMNS]).all()
+    if archived_table is not None:
+        rows.extend(iter_archived_rows(archived_table, ARCHIVE_COLUMNS))
+    if not rows:
+        return OperationResult(status=OperationStatus.SUCCESS, data=PagingData(items=[], total_count=0))
+
+    _, appearance_ids, platform_ids, prices, _, recorded_ats = zip(*rows)
+    kept_indices = downsample_series(
+        np.column_stack((np.array(appearance_ids), np.array(platform_ids))),
+        np.array([recorded_at.timestamp() for recorded_at in recorded_ats]),
+        np.array(prices),
+        max_points
+    )
+
+    # 与普通查询一致按时间倒序分页
+    kept_rows = sorted(
+        (rows[index] for index in kept_indices),
+        key=lambda row: (row[5], row[0]),
+        reverse=True
+    )
+    offset = (page - 1) * page_size
     items = [
-        schemas.PlatformPriceHistory.model_validate(db_platform_price_history)
-        for db_platform_price_history in db_platform_price_histories
+        schemas.PlatformPriceHistory.model_validate(dict(zip(ARCHIVE_COLUMNS, row)))
+        for row in kept_rows[offset:offset + page_size]
     ]
-
     return OperationResult(
         status=OperationStatus.SUCCESS,
-        data=PagingData(items=items, total_count=total_count)
+        data=PagingData(items=items, total_count=len(kept_rows))
     )
 
 
+def get_platform_price_series(
+        db: Session,
+        appearance_ids: List[int],
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        max_points: Optional[int] = None
+) -> OperationResult[List[schemas.PlatformPriceSeries]]:
+    """
+    Price series of many appearances at once, one per (appearance, platform), points in ascending time order.
+
+    ``limit`` keeps the last points of each series; without ``start_date`` it defaults to
+    PRICE_HISTORY_FETCH_COUNT within PRICE_HISTORY_LOOKBACK_DAYS so the query stays on recent partitions.
+    """
+    if not start_date:
+        start_date = datetime.now(tz=timezone.utc) - timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+        limit = limit or settings.PRICE_HISTORY_FETCH_COUNT
+
+    history_table = models.PlatformPriceHistory.__table__
+    columns = [history_table.c[name] for name in _PRICE_HISTORY_COLUMNS]
+    conditions = _history_conditions(
+        history_table,
+        platform_id=platform_id,
+        start_date=start_date,
+        end_date=end_date,
+        appearance_ids=appearance_ids
+    )
+    if limit:
+        # 每个序列按时间倒序编号，只取最近的 limit 个点
+        ranked = (
+            select(
+                *columns,
+                func.row_number().over(
+                    partition_by=(history_table.c.appearance_id, history_table.c.platform_id),
+                    order_by=history_table.c.recorded_at.desc()
+                ).label("rn")
+            )
+            .where(*conditions)
+            .subquery()
+        )
+        query = select(*[ranked.c[name] for name in _PRICE_HISTORY_COLUMNS]).where(ranked.c.rn <= limit)
+    else:
+        query = select(*columns).where(*conditions)
+    rows = db.execute(query).all()
+
+    archives = crud_platform_price_history_archive.get_overlapping_archives(
+        db,
+        platform_id=platform_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    if archives:
+        archived_table = read_archived_rows(
+            [archive.path for archive in archives],
+            start_date=start_date,
+            end_date=end_date,
+            carry_forward=_carry_forward_interval(),
+            appearance_ids=appearance_ids,
+            platform_id=platform_id
+        )
+        rows.extend(iter_archived_rows(archived_table, _PRICE_HISTORY_COLUMNS))
+
+    rows.sort(key=itemgetter(0, 1, 4))
+    if max_points and rows:
+        appearance_id_column, platform_id_column, prices, _, recorded_ats = zip(*rows)
+        kept_indices = downsample_series(
+            np.column_stack((np.array(appearance_id_column), np.array(platform_id_column))),
+            np.array([recorded_at.timestamp() for recorded_at in recorded_ats]),
+            np.array(prices),
+            max_points
+        )
+        rows = [rows[index] for index in kept_indices]
+
+    series_list = []
+    for (series_appearance_id, series_platform_id), series_rows in groupby(rows, key=itemgetter(0, 1)):
+        series_rows = list(series_rows)
+        if limit:
+            # 合并冷数据后重新截取最近的 limit 个点
+            series_rows = series_rows[-limit:]
+        series_list.append(schemas.PlatformPriceSeries(
+            appearance_id=series_appearance_id,
+            platform_id=series_platform_id,
+            points=[
+                schemas.PlatformPriceSeriesPoint(
+                    lowest_price_cents=lowest_price_cents,
+                    quantity_on_sale=quantity_on_sale,
+                    recorded_at=recorded_at
+                )
+                for _, _, lowest_price_cents, quantity_on_sale, recorded_at in series_rows
+            ]
+        ))
+
+    return OperationResult(status=OperationStatus.SUCCESS, data=series_list)
+
+
+# 每个 (查询, 平台) 组合通过唯一约束索引 (appearance_id, platform_id, recorded_at) 反向取一条，分区可在执行期裁剪
+_PRICES_AS_OF_SQL = text("""
+SELECT q.query_index, p.id AS platform_id, h.lowest_price_cents, h.quantity_on_sale, h.recorded_at
+FROM unnest(CAST(:appearance_ids AS bigint[]), CAST(:ats AS timestamptz[]))
+         WITH ORDINALITY AS q(appearance_id, at, query_index)
+CROSS JOIN platforms p
+CROSS JOIN LATERAL (
+    SELECT lowest_price_cents, quantity_on_sale, recorded_at
+    FROM platform_price_history
+    WHERE appearance_id = q.appearance_id
+      AND platform_id = p.id
+      AND recorded_at <= q.at
+      AND recorded_at > q.at - CAST(:lookback AS interval)
+    ORDER BY recorded_at DESC
+    LIMIT 1
+) h
+WHERE CAST(:platform_id AS integer) IS NULL OR p.id = CAST(:platform_id AS integer)
+""")
+
+
+def _merge_archived_prices_as_of(
+        db: Session,
+        prices: dict,
+        queries: List[schemas.PlatformPriceAsOfQuery],
+        ats: List[datetime],
+        platform_id: Optional[int],
+        lookback: timedelta
+) -> None:
+    """
+    Update ``prices``, {(query index, platform_id): point} from the hot table, with later points from archives.
+
+    Only queries that an archive could answer better, because the hot table has no point for that platform
+    or an older one than the archive holds, read the Parquet files.
+    """
+    archives = crud_platform_price_history_archive.get_overlapping_archives(
+        db,
+        platform_id=platform_id,
+        start_date=min(ats) - lookback,
+        end_date=max(ats)
+    )
+    if not archives:
+        return
+
+    archive_paths = set()
+    archived_query_indices = []
+    for query_index, at in enumerate(ats):
+        needed_archives = [
+            archive for archive in archives
+            if archive.min_recorded_at <= at and archive.max_recorded_at > at - lookback
+            and (
+                (query_index, archive.platform_id) not in prices
+                or prices[(query_index, archive.platform_id)][2] < min(archive.max_recorded_at, at)
+            )
+        ]
+        if needed_archives:
+            archived_query_indices.append(query_index)
+            archive_paths.update(archive.path for archive in needed_archives)
+    if not archived_query_indices:
+        return
+
+    archived_table = read_archived_rows(
+        sorted(archive_paths),
+        end_date=max(ats[query_index] for query_index in archived_query_indices),
+        appearance_ids=list({queries[query_index].appearance_id for query_index in archived_query_indices})
+    )
+    series_map = {}
+    for _, appearance_id, series_platform_id, *point in iter_archived_rows(archived_table, ARCHIVE_COLUMNS):
+        if platform_id and series_platform_id != platform_id:
+            continue
+        series_map.setdefault(appearance_id, {}).setdefault(series_platform_id, []).append(point)
+
+    for query_index in archived_query_indices:
+        at = ats[query_index]
+        for series_platform_id, points in series_map.get(queries[query_index].appearance_id, {}).items():
+            # 归档行已按 recorded_at 升序排列
+            position = bisect_right(points, at, key=itemgetter(2))
+            if not position or points[position - 1][2] <= at - lookback:
+                continue
+            # 热数据与归档都有点时取 recorded_at 较晚的一个
+            hot_point = prices.get((query_index, series_platform_id))
+            if hot_point is None or hot_point[2] < points[position - 1][2]:
+                prices[(query_index, series_platform_id)] = points[position - 1]
+
+
+def get_platform_prices_as_of(
+        db: Session,
+        queries: List[schemas.PlatformPriceAsOfQuery],
+        platform_id: Optional[int] = None
+) -> OperationResult[List[schemas.PlatformPriceAsOf]]:
+    """
+    The price in effect on every platform for each (appearance_id, at) query, in query order.
+
+    The price in effect is the last point at or before ``at``, looked back at most PRICE_HISTORY_LOOKBACK_DAYS.
+    """
+    if not queries:
+        return OperationResult(status=OperationStatus.SUCCESS, data=[])
+
+    lookback = timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+    # 未带时区的时间按 UTC 处理
+    ats = [query.at if query.at.tzinfo else query.at.replace(tzinfo=timezone.utc) for query in queries]
+    rows = db.execute(
+        _PRICES_AS_OF_SQL,
+        {
+            "appearance_ids": [query.appearance_id for query in queries],
+            "ats": ats,
+            "lookback": lookback,
+            "platform_id": platform_id,
+        }
+    ).all()
+
+    prices = {(query_index - 1, row_platform_id): point for query_index, row_platform_id, *point in rows}
+    # 热数据缺失或早于归档中的点时，再到已归档的月份中查找
+    _merge_archived_prices_as_of(db, prices, queries, ats, platform_id, lookback)
+
+    prices_by_query = {}
+    for (query_index, row_platform_id), (lowest_price_cents, quantity_on_sale, recorded_at) in sorted(prices.items()):
+        prices_by_query.setdefault(query_index, []).append(schemas.PlatformPriceAsOfPoint(
+            platform_id=row_platform_id,
+            lowest_price_cents=lowest_price_cents,
+            quantity_on_sale=quantity_on_sale,
+            recorded_at=recorded_at
+        ))
+
+    results = []
+    for query_index, query in enumerate(queries):
+        query_prices = prices_by_query.get(query_index, [])
+        results.append(schemas.PlatformPriceAsOf(
+            appearance_id=query.appearance_id,
+            at=query.at,
+            lowest_price_cents=min((price.lowest_price_cents for price in query_prices), default=None),
+            prices=query_prices
+        ))
+    return OperationResult(status=OperationStatus.SUCCESS, data=results)
+
+
+def _iter_archived_price_histories(
+        archives: List[models.PlatformPriceHistoryArchive],
+        appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+) -> Iterator[tuple]:
+    # 逐月读取归档文件，内存占用以单月数据为上限
+    for _, month_archives in groupby(archives, key=attrgetter("month")):
+        archived_table = read_archived_rows(
+            [archive.path for archive in month_archives],
+            appearance_id=appearance_id,
+            start_date=start_date,
+            end_date=end_date,
+            carry_forward=_carry_forward_interval()
+        )
+        yield from iter_archived_rows(archived_table, _PRICE_HISTORY_COLUMNS)
+
+
+def iter_platform_price_histories(
+        db: Session,
+        platform_id: Optional[int] = None,
+        appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+) -> Iterator[Row]:
+    """
+    Yield every matching price point ordered by recorded_at, using a server-side cursor.
+
+    Like get_platform_price_histories, the series starts with the last point before ``start_date``, which
+    holds the price in effect at ``start_date`` when unchanged points are not stored.
+
+    Rows are fetched PRICE_HISTORY_EXPORT_BATCH_SIZE at a time, so memory stays constant however large the
+    result is. Only the columns accepted by the ingest endpoints are selected, so exports can be re-ingested.
+    Archived months are read from their Parquet files and merged in by recorded_at.
+    """
+    history_table = models.PlatformPriceHistory.__table__
+    query = select(*[history_table.c[name] for name in _PRICE_HISTORY_COLUMNS]).where(
+        *_history_conditions(
+            history_table,
+            platform_id=platform_id,
+            appearance_id=appearance_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+    )
+
+    archives = crud_platform_price_history_archive.get_overlapping_archives(
+        db,
+        platform_id=platform_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+
+    query = query.order_by(history_table.c.recorded_at, history_table.c.id)
+    # yield_per 会启用 stream_results，psycopg2 因此使用命名游标分批拉取
+    result = db.execute(query.execution_options(yield_per=settings.PRICE_HISTORY_EXPORT_BATCH_SIZE))
+    try:
+        if archives:
+            archived_rows = _iter_archived_price_histories(
+                archives,
+                appearance_id=appearance_id,
+                start_date=start_date,
+                end_date=end_date
+            )
+            recorded_at_index = _PRICE_HISTORY_COLUMNS.index("recorded_at")
+            yield from heapq.merge(archived_rows, result, key=lambda row: row[recorded_at_index])
+        else:
+            yield from result
+    finally:
+        result.close()
+
+
+def delete_platform_price_history_chunk(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        platform_id: Optional[int] = None,
+        appearance_id: Optional[int] = None,
+        chunk_size: int = 5000
+) -> Tuple[int, Set[int]]:
+    """
+    Delete at most ``chunk_size`` points in [start_date, end_date] and commit, together with the refreshed
+    candles and latest prices of the affected series.
+
+    Returns the number of deleted points and the affected appearance ids; call repeatedly until it deletes
+    nothing. Archived months are not touched.
+    """
+    history_table = models.PlatformPriceHistory.__table__
+    doomed_points = (
+        select(history_table.c.id, history_table.c.recorded_at)
+        .where(*_history_conditions(history_table, platform_id=platform_id, appearance_id=appearance_id))
+        .where(history_table.c.recorded_at >= start_date, history_table.c.recorded_at <= end_date)
+        .limit(chunk_size)
+    )
+    deleted = (
+        delete(history_table)
+        .where(tuple_(history_table.c.id, history_table.c.recorded_at).in_(doomed_points))
+        .returning(history_table.c.appearance_id, history_table.c.platform_id, history_table.c.recorded_at)
+        .cte("deleted")
+    )
+
+    _deleted_price_points.create(bind=db.connection())
+    deleted_count = db.execute(
+        insert(_deleted_price_points)
+        .from_select(["appearance_id", "platform_id", "recorded_at"], select(deleted))
+        .add_cte(deleted)
+    ).rowcount
+    if not deleted_count:
+        db.rollback()
+        return 0, set()
+
+    crud_platform_latest_price.rebuild_removed_platform_latest_prices(db, _deleted_price_points)
+    crud_platform_price_candle.rebuild_platform_price_candle_buckets(db, _deleted_price_points)
+    appearance_ids = set(db.execute(select(_deleted_price_points.c.appearance_id).distinct()).scalars())
+    crud_appearance_market_stats.refresh_appearance_market_stats(db, appearance_ids)
+    db.commit()
+    crud_market_index.fold_market_index_changes(db)
+
+    price_series_cache.invalidate(appearance_ids)
+    price_outlier_filter.invalidate(appearance_ids)
+    return deleted_count, appearance_ids
+
+
 def delete_platform_price_history(db: Session, platform_price_history_id: int) -> OperationResult:
     db_platform_price_history = db.query(models.PlatformPriceHistory).filter(
         models.PlatformPriceHistory.id == platform_price_history_id).first()
@@ -67,6 +1235,23 @@ def delete_platform_price_history(db: Session, platform_price_history_id: int) -
         return OperationResult(status=OperationStatus.NOT_FOUND)
 
     db.delete(db_platform_price_history)
+    db.flush()
+    crud_platform_latest_price.rebuild_platform_latest_prices(
+        db,
+        appearance_id=db_platform_price_history.appearance_id,
+        platform_id=db_platform_price_history.platform_id
+    )
+    crud_platform_price_candle.rebuild_platform_price_candles(
+        db,
+        appearance_id=db_platform_price_history.appearance_id,
+        platform_id=db_platform_price_history.platform_id,
+        start_date=db_platform_price_history.recorded_at,
+        end_date=db_platform_price_history.recorded_at
+    )
+    crud_appearance_market_stats.refresh_appearance_market_stats(db, [db_platform_price_history.appearance_id])
     db.commit()
+    crud_market_index.fold_market_index_changes(db)
+    price_series_cache.invalidate([db_platform_price_history.appearance_id])
+    price_outlier_filter.invalidate([db_platform_price_history.appearance_id])
 
     return OperationResult(status=OperationStatus.SUCCESS)
@@ -0,0 +1,66 @@
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Set
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import app.models as models
+
+
+def get_overlapping_archives(
+        db: Session,
+        platform_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+) -> List[models.PlatformPriceHistoryArchive]:
+    """Archive files that may hold points inside [start_date, end_date], oldest month first."""
+    query = db.query(models.PlatformPriceHistoryArchive)
+    if platform_id:
+        query = query.filter(models.PlatformPriceHistoryArchive.platform_id == platform_id)
+    if start_date:
+        query = query.filter(models.PlatformPriceHistoryArchive.max_recorded_at >= start_date)
+    if end_date:
+        query = query.filter(models.PlatformPriceHistoryArchive.min_recorded_at <= end_date)
+    return query.order_by(models.PlatformPriceHistoryArchive.month, models.PlatformPriceHistoryArchive.id).all()
+
+
+def get_archived_months(db: Session, months: Iterable[date]) -> Set[date]:
+    """The months among ``months`` that have been moved to archive files."""
+    months = set(months)
+    if not months:
+        return set()
+    return set(db.execute(
+        select(models.PlatformPriceHistoryArchive.month)
+        .where(models.PlatformPriceHistoryArchive.month.in_(months))
+        .distinct()
+    ).scalars())
+
+
+def count_archives(db: Session, month: date, platform_id: int) -> int:
+    return db.query(func.count(models.PlatformPriceHistoryArchive.id)).filter(
+        models.PlatformPriceHistoryArchive.month == month,
+        models.PlatformPriceHistoryArchive.platform_id == platform_id
+    ).scalar()
+
+
+def create_archive(
+        db: Session,
+        month: date,
+        platform_id: int,
+        path: str,
+        row_count: int,
+        min_recorded_at: datetime,
+        max_recorded_at: datetime
+) -> models.PlatformPriceHistoryArchive:
+    """Register an archive file; committed by the caller together with the removal of the archived rows."""
+    db_archive = models.PlatformPriceHistoryArchive(
+        month=month,
+        platform_id=platform_id,
+        path=path,
+        row_count=row_count,
+        min_recorded_at=min_recorded_at,
+        max_recorded_at=max_recorded_at
+    )
+    db.add(db_archive)
+    db.flush()
+    return db_archive
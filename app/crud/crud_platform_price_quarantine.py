@@ -0,0 +1,50 @@
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+import app.models as models
+import app.schemas as schemas
+from app.core.operation_result import OperationResult, OperationStatus
+from app.core.paging import PagingData
+
+
+def create_quarantined_prices(db: Session, quarantined_dicts: List[dict]) -> None:
+    """Insert quarantined points; committed by the caller together with the rest of the ingest."""
+    if quarantined_dicts:
+        db.execute(insert(models.PlatformPriceQuarantine), quarantined_dicts)
+
+
+def get_quarantined_prices(
+        db: Session,
+        page: int = 1,
+        page_size: int = 100,
+        appearance_id: Optional[int] = None,
+        platform_id: Optional[int] = None
+) -> OperationResult[PagingData[schemas.PlatformPriceQuarantine]]:
+    query = db.query(models.PlatformPriceQuarantine)
+    if appearance_id:
+        query = query.filter(models.PlatformPriceQuarantine.appearance_id == appearance_id)
+    if platform_id:
+        query = query.filter(models.PlatformPriceQuarantine.platform_id == platform_id)
+
+    total_count = query.count()
+    if total_count == 0:
+        return OperationResult(
+            status=OperationStatus.SUCCESS,
+            data=PagingData(items=[], total_count=0)
+        )
+
+    db_quarantined_prices = (
+        query
+        .order_by(models.PlatformPriceQuarantine.recorded_at.desc(), models.PlatformPriceQuarantine.id.desc())
+        .offset((page - 1) * page_size)
+        .limit(page_size)
+        .all()
+    )
+    items = [schemas.PlatformPriceQuarantine.model_validate(db_price) for db_price in db_quarantined_prices]
+
+    return OperationResult(
+        status=OperationStatus.SUCCESS,
+        data=PagingData(items=items, total_count=total_count)
+    )
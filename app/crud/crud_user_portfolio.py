@@ -1,14 +1,18 @@
 from collections import defaultdict
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
 
 from sqlalchemy import func, desc, asc, cast, Float
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 import app.models as models
 import app.schemas as schemas
 from app.core.config import settings
 from app.core.operation_result import OperationResult, OperationStatus
 from app.core.paging import PagingData
+from app.crud import crud_platform_latest_price
+from app.services.price_downsampling import downsample_series
+from app.services.price_series_cache import price_series_cache
 
 
 def get_user_portfolio(
@@ -17,66 +21,31 @@ def get_user_portfolio(
         page: int,
         page_size: int,
         sort_by: str | None = None,
-        sort_order: str = 'desc'
+        sort_order: str = 'desc',
+        max_points: Optional[int] = None
 ) -> OperationResult[PagingData[schemas.UserPortfolioItem]]:
-    # 1. 购买数据子查询
-    purchase_subquery = (
-        db.query(
-            models.UserPurchaseTransaction.appearance_id,
-            func.sum(models.UserPurchaseTransaction.quantity).label("total_purchased"),
-            func.sum(models.UserPurchaseTransaction.quantity * models.UserPurchaseTransaction.unit_price_cents).label(
-                "total_spent"),
-        )
-        .filter(models.UserPurchaseTransaction.user_id == user_id)
-        .group_by(models.UserPurchaseTransaction.appearance_id)
-        .subquery('purchase_subquery')
-    )
+    # 1. 持仓由交易增量维护，无需再聚合全部交易
+    positions = models.UserPosition
 
-    # 2. 销售数据子查询
-    sale_subquery = (
-        db.query(
-            models.UserSaleTransaction.appearance_id,
-            func.sum(models.UserSaleTransaction.quantity).label("total_sold"),
-        )
-        .filter(models.UserSaleTransaction.user_id == user_id)
-        .group_by(models.UserSaleTransaction.appearance_id)
-        .subquery('sale_subquery')
-    )
-
-    # 3. 最新价格查询
-    latest_price_subquery = (
-        db.query(
-            models.PlatformPriceHistory.appearance_id,
-            models.PlatformPriceHistory.lowest_price_cents.label("price"),
-            models.PlatformPriceHistory.quantity_on_sale,
-        )
-        .distinct(models.PlatformPriceHistory.appearance_id)
-        .order_by(
-            models.PlatformPriceHistory.appearance_id,
-            models.PlatformPriceHistory.recorded_at.desc()
-        )
-        .subquery('latest_price_subquery')
-    )
+    # 2. 最新价格查询（读取维护好的 platform_latest_price，而非扫描全部价格历史）
+    latest_price_subquery = crud_platform_latest_price.get_latest_price_subquery(db)
 
-    # 4. 计算字段
-    quantity = (purchase_subquery.c.total_purchased - func.coalesce(sale_subquery.c.total_sold, 0)).label("quantity")
+    # 3. 计算字段
+    quantity = positions.quantity.label("quantity")
     average_cost = (
-            cast(purchase_subquery.c.total_spent, Float) /
-            func.nullif(cast(purchase_subquery.c.total_purchased, Float), 0)
+            cast(positions.purchased_cost_cents, Float) / func.nullif(positions.purchased_quantity, 0)
     ).label("average_cost")
-    total_investment = (quantity * average_cost).label("total_investment")
+    total_investment = positions.total_cost_cents.label("total_investment")
     current_market_value = (quantity * func.coalesce(latest_price_subquery.c.price, 0)).label("current_market_value")
     profit_loss = (current_market_value - total_investment).label("profit_loss")
 
-    # 5. 基础查询（用于计算总数）
+    # 4. 基础查询（用于计算总数）
     base_query = (
-        db.query(models.Appearance.id)
-        .join(purchase_subquery, models.Appearance.id == purchase_subquery.c.appearance_id)
-        .outerjoin(sale_subquery, models.Appearance.id == sale_subquery.c.appearance_id)
-        .filter(quantity > 0)
+        db.query(positions.appearance_id)
+        .filter(positions.user_id == user_id, positions.quantity > 0)
     )
 
-    # 6. 获取总数
+    # 5. 获取总数
     total_count = base_query.count()
 
     if total_count == 0:
@@ -85,7 +54,7 @@ def get_user_portfolio(
             data=PagingData(items=[], total_count=0)
         )
 
-    # 7. 主查询
+    # 6. 主查询
     query = (
         db.query(
             models.Appearance,
@@ -95,17 +64,18 @@ def get_user_portfolio(
             current_market_value,
             profit_loss
         )
-        .join(purchase_subquery, models.Appearance.id == purchase_subquery.c.appearance_id)
-        .outerjoin(sale_subquery, models.Appearance.id == sale_subquery.c.appearance_id)
+        .join(positions, models.Appearance.id == positions.appearance_id)
         .outerjoin(latest_price_subquery, models.Appearance.id == latest_price_subquery.c.appearance_id)
-        .filter(quantity > 0)
+        .filter(positions.user_id == user_id, positions.quantity > 0)
         .options(
             joinedload(models.Appearance.appearance_types),
-            joinedload(models.Appearance.appearance_aliases)
+            joinedload(models.Appearance.appearance_aliases),
+            selectinload(models.Appearance.market_stats),
+            selectinload(models.Appearance.platform_liquidity)
         )
     )
 
-    # 8. 排序
+    # 7. 排序
     sort_column_map = {
         "quantity": quantity,
         "total_investment": total_investment,
@@ -117,24 +87,35 @@ def get_user_portfolio(
     if sort_by and sort_by in sort_column_map:
         sort_column = sort_column_map[sort_by]
         order_func = asc if sort_order == 'asc' else desc
-        query = query.order_by(order_func(sort_column))
+        query = query.order_by(order_func(sort_column), order_func(positions.appearance_id))
     else:
-        # 默认排序
-        query = query.order_by(desc(total_investment))
+        # 默认排序，与 (user_id, total_cost_cents, appearance_id) 索引一致
+        query = query.order_by(desc(total_investment), desc(positions.appearance_id))
 
-    # 9. 分页
+    # 8. 分页
     portfolio_items_data = query.offset((page - 1) * page_size).limit(page_size).all()
 
-    # 10. 批量获取价格历史（优化为单次查询）
+    # 9. 批量获取价格历史（优化为单次查询）
     appearance_ids = [item[0].id for item in portfolio_items_data]
-    price_histories_map = _get_price_histories_batch(db, appearance_ids, settings.PRICE_HISTORY_FETCH_COUNT)
+    price_histories_map = _get_price_histories_batch(
+        db,
+        appearance_ids,
+        settings.PRICE_HISTORY_FETCH_COUNT,
+        max_points=max_points
+    )
 
-    # 11. 构建结果
+    # 10. 构建结果
     items = []
     for appearance, qty, avg_cost, total_inv, current_mv, pl in portfolio_items_data:
         # 安全的百分比计算
         profit_loss_percentage = (pl / total_inv * 100) if total_inv and total_inv > 0 else 0
 
+        market_stats = (
+            schemas.AppearanceMarketStats.model_validate(appearance.market_stats) if appearance.market_stats else None
+        )
+        platform_liquidity = [
+            schemas.AppearancePlatformLiquidity.model_validate(liquidity) for liquidity in appearance.platform_liquidity
+        ]
         appearance = schemas.Appearance.model_validate(appearance)
 
         items.append(
@@ -147,6 +128,8 @@ def get_user_portfolio(
                 profit_loss=pl or 0,
                 profit_loss_percentage=profit_loss_percentage,
                 price_histories=price_histories_map.get(appearance.id, []),
+                market_stats=market_stats,
+                platform_liquidity=platform_liquidity,
             )
         )
 
@@ -156,54 +139,54 @@ def get_user_portfolio(
 def _get_price_histories_batch(
         db: Session,
         appearance_ids: List[int],
-        limit: int = settings.PRICE_HISTORY_FETCH_COUNT
+        limit: int = settings.PRICE_HISTORY_FETCH_COUNT,
+        max_points: Optional[int] = None
 ) -> dict:
-    """批量获取价格历史"""
+    """批量获取价格历史；指定 max_points 时返回整个回溯窗口，每个平台的序列降采样到 max_points 个点"""
     if not appearance_ids:
         return {}
 
-    price_history_subquery = (
-        db.query(
-            models.PlatformPriceHistory.appearance_id,
-            models.PlatformPriceHistory.platform_id,
-            models.PlatformPriceHistory.lowest_price_cents,
-            models.PlatformPriceHistory.quantity_on_sale,
-            models.PlatformPriceHistory.recorded_at,
-            func.row_number().over(
-                partition_by=models.PlatformPriceHistory.appearance_id,
-                order_by=models.PlatformPriceHistory.recorded_at.desc()
-            ).label('rn')
-        )
-        .filter(models.PlatformPriceHistory.appearance_id.in_(appearance_ids))
-        .subquery()
-    )
+    recorded_after = datetime.now(tz=timezone.utc) - timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+
+    # 从进程内的价格序列缓存中切片，只有未命中的序列才会查询数据库
+    series_map = price_series_cache.get_series(db, appearance_ids)
+    if max_points:
+        # 缓存的序列最多保留 PRICE_SERIES_CACHE_MAX_POINTS 个点，不能覆盖整个回溯窗口的序列改为直接查库
+        uncovered_ids = [
+            appearance_id for appearance_id, series in series_map.items() if not series.covers(recorded_after)
+        ]
+        series_map.update(price_series_cache.load_lookback_window(db, uncovered_ids))
+    points_map = {}
+    for appearance_id, series in series_map.items():
+        window = series.window(start=recorded_after)
+        if max_points:
+            kept_indices = window.start + downsample_series(
+                series.platform_ids[window],
+                series.recorded_at[window],
+                series.prices[window],
+                max_points
+            )
+            points_map[appearance_id] = series.points(kept_indices)
+            continue
+        window = slice(max(window.start, window.stop - limit), window.stop)
+        points_map[appearance_id] = series.points(window)
 
-    price_history_data = (
-        db.query(
-            price_history_subquery.c.appearance_id,
-            price_history_subquery.c.lowest_price_cents,
-            price_history_subquery.c.quantity_on_sale,
-            price_history_subquery.c.recorded_at,
-            models.Platform
-        )
-        .join(models.Platform, price_history_subquery.c.platform_id == models.Platform.id)
-        .filter(price_history_subquery.c.rn <= limit)
-        .order_by(
-            price_history_subquery.c.appearance_id,
-            price_history_subquery.c.recorded_at.desc()
-        )
-        .all()
-    )
+    platform_ids = {point[0] for points in points_map.values() for point in points}
+    platforms = {
+        platform.id: schemas.Platform.model_validate(platform)
+        for platform in db.query(models.Platform).filter(models.Platform.id.in_(platform_ids)).all()
+    } if platform_ids else {}
 
     price_histories_map = defaultdict(list)
-    for appearance_id, lowest_price_cents, quantity_on_sale, recorded_at, platform_obj in price_history_data:
-        price_histories_map[appearance_id].append(
-            schemas.PlatformPriceHistoryPoint(
-                platform=schemas.Platform.model_validate(platform_obj),
-                lowest_price_cents=lowest_price_cents,
-                quantity_on_sale=quantity_on_sale,
-                recorded_at=recorded_at,
+    for appearance_id, points in points_map.items():
+        for platform_id, lowest_price_cents, quantity_on_sale, recorded_at in reversed(points):
+            price_histories_map[appearance_id].append(
+                schemas.PlatformPriceHistoryPoint(
+                    platform=platforms[platform_id],
+                    lowest_price_cents=lowest_price_cents,
+                    quantity_on_sale=quantity_on_sale,
+                    recorded_at=recorded_at,
+                )
             )
-        )
 
-    return price_histories_map
\ No newline at end of file
+    return price_histories_map
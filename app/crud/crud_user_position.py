@@ -0,0 +1,161 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete, func, text, literal, union_all, and_, or_, BigInteger
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+import app.models as models
+
+# 持仓中随交易按差额累加的列，其余列由数据库生成
+POSITION_SUM_COLUMNS = ("purchased_quantity", "purchased_cost_cents", "sold_quantity", "sale_revenue_cents")
+
+
+def purchase_position_change(
+        db_transaction: models.UserPurchaseTransaction,
+        sign: int = 1
+) -> Tuple[int, Dict[str, int]]:
+    """The change a purchase makes to its position; ``sign=-1`` takes it back out."""
+    return db_transaction.appearance_id, {
+        "purchased_quantity": sign * db_transaction.quantity,
+        "purchased_cost_cents": sign * db_transaction.quantity * db_transaction.unit_price_cents,
+    }
+
+
+def sale_position_change(db_transaction: models.UserSaleTransaction, sign: int = 1) -> Tuple[int, Dict[str, int]]:
+    """The change a sale makes to its position; ``sign=-1`` takes it back out."""
+    revenue_cents = db_transaction.quantity * db_transaction.unit_price_cents - (db_transaction.platform_fee_cents or 0)
+    return db_transaction.appearance_id, {
+        "sold_quantity": sign * db_transaction.quantity,
+        "sale_revenue_cents": sign * revenue_cents,
+    }
+
+
+def apply_user_position_changes(db: Session, user_id: int, changes: Iterable[Tuple[int, Dict[str, int]]]) -> None:
+    """
+    Add the changes of transactions of one user to their positions, in the caller's transaction.
+
+    Changes of the same appearance are merged and applied in appearance order, so concurrent edits of one
+    user lock the positions in the same order. Positions left without any transaction are removed.
+    """
+    merged: Dict[int, Dict[str, int]] = {}
+    for appearance_id, change in changes:
+        sums = merged.setdefault(appearance_id, dict.fromkeys(POSITION_SUM_COLUMNS, 0))
+        for column, value in change.items():
+            sums[column] += value
+    if not merged:
+        return
+
+    positions = models.UserPosition
+    insert_stmt = insert(positions).values([
+        {"user_id": user_id, "appearance_id": appearance_id, **sums, "updated_at": func.now()}
+        for appearance_id, sums in sorted(merged.items())
+    ])
+    db.execute(insert_stmt.on_conflict_do_update(
+        index_elements=[positions.user_id, positions.appearance_id],
+        set_={
+            **{
+                column: getattr(positions, column) + getattr(insert_stmt.excluded, column)
+                for column in POSITION_SUM_COLUMNS
+            },
+            "updated_at": insert_stmt.excluded.updated_at,
+        }
+    ))
+    db.execute(
+        delete(positions).where(
+            positions.user_id == user_id,
+            positions.appearance_id.in_(list(merged)),
+            positions.purchased_quantity == 0,
+            positions.sold_quantity == 0
+        )
+    )
+
+
+def _expected_positions(user_id: Optional[int] = None):
+    """The position sums aggregated from the transactions, optionally of one user."""
+    purchases = models.UserPurchaseTransaction
+    sales = models.UserSaleTransaction
+    zero = literal(0, BigInteger)
+
+    purchase_sums = select(
+        purchases.user_id,
+        purchases.appearance_id,
+        func.sum(purchases.quantity).label("purchased_quantity"),
+        func.sum(purchases.quantity * purchases.unit_price_cents).label("purchased_cost_cents"),
+        zero.label("sold_quantity"),
+        zero.label("sale_revenue_cents"),
+    ).group_by(purchases.user_id, purchases.appearance_id)
+    sale_sums = select(
+        sales.user_id,
+        sales.appearance_id,
+        zero.label("purchased_quantity"),
+        zero.label("purchased_cost_cents"),
+        func.sum(sales.quantity).label("sold_quantity"),
+        func.sum(sales.quantity * sales.unit_price_cents - sales.platform_fee_cents).label("sale_revenue_cents"),
+    ).group_by(sales.user_id, sales.appearance_id)
+    if user_id is not None:
+        purchase_sums = purchase_sums.where(purchases.user_id == user_id)
+        sale_sums = sale_sums.where(sales.user_id == user_id)
+
+    sums = union_all(purchase_sums, sale_sums).subquery()
+    return (
+        select(
+            sums.c.user_id,
+            sums.c.appearance_id,
+            *[func.sum(sums.c[column]).cast(BigInteger).label(column) for column in POSITION_SUM_COLUMNS]
+        )
+        .group_by(sums.c.user_id, sums.c.appearance_id)
+        .subquery("expected_positions")
+    )
+
+
+def rebuild_user_positions(db: Session, user_id: Optional[int] = None) -> int:
+    """
+    Recompute the positions, of all users or one, from their transactions and commit.
+
+    The positions table is locked against concurrent transaction edits while it is rebuilt; edits waiting on
+    the lock add their change on top of the rebuilt positions. Returns the number of positions written.
+    """
+    positions = models.UserPosition
+    db.execute(text("LOCK TABLE user_positions IN EXCLUSIVE MODE"))
+
+    delete_stmt = delete(positions)
+    if user_id is not None:
+        delete_stmt = delete_stmt.where(positions.user_id == user_id)
+    db.execute(delete_stmt)
+
+    expected = _expected_positions(user_id)
+    columns = ["user_id", "appearance_id", *POSITION_SUM_COLUMNS]
+    result = db.execute(
+        insert(positions).from_select(
+            [*columns, "updated_at"],
+            select(*[expected.c[column] for column in columns], func.now())
+        )
+    )
+    db.commit()
+    return result.rowcount
+
+
+def verify_user_positions(db: Session, user_id: Optional[int] = None) -> List[Tuple[int, int]]:
+    """(user_id, appearance_id) of the positions that differ from, or are missing in, their transactions."""
+    positions = models.UserPosition
+    expected = _expected_positions(user_id)
+
+    position_user_id = func.coalesce(expected.c.user_id, positions.user_id)
+    position_appearance_id = func.coalesce(expected.c.appearance_id, positions.appearance_id)
+    query = (
+        select(position_user_id, position_appearance_id)
+        .select_from(
+            expected.join(
+                positions,
+                and_(positions.user_id == expected.c.user_id, positions.appearance_id == expected.c.appearance_id),
+                full=True
+            )
+        )
+        .where(or_(*[
+            getattr(positions, column).is_distinct_from(expected.c[column]) for column in POSITION_SUM_COLUMNS
+        ]))
+        .order_by(position_user_id, position_appearance_id)
+    )
+    if user_id is not None:
+        query = query.where(position_user_id == user_id)
+    return [(row_user_id, appearance_id) for row_user_id, appearance_id in db.execute(query).all()]
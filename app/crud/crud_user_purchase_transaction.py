@@ -7,6 +7,7 @@ import app.models as models
 import app.schemas as schemas
 from app.core.operation_result import OperationResult, OperationStatus
 from app.core.paging import PagingData
+from app.crud import crud_user_position
 
 
 def create_user_purchase_transaction(
@@ -16,6 +17,10 @@ def create_user_purchase_transaction(
 ) -> OperationResult[schemas.UserPurchaseTransaction]:
     db_purchase_transaction = models.UserPurchaseTransaction(user_id=user_id, **purchase_transaction.model_dump())
     db.add(db_purchase_transaction)
+    db.flush()
+    crud_user_position.apply_user_position_changes(
+        db, user_id, [crud_user_position.purchase_position_change(db_purchase_transaction)]
+    )
     db.commit()
     db.refresh(db_purchase_transaction)
     return OperationResult(
@@ -102,14 +107,24 @@ def update_user_purchase_transaction(
         transaction_id: int,
         transaction: schemas.UserPurchaseTransactionUpdate
 ) -> OperationResult[schemas.UserPurchaseTransaction]:
-    db_transaction = get_user_purchase_transaction_by_id(db=db, user_id=user_id, transaction_id=transaction_id).data
+    # 锁住交易行，并发修改时按最新的值从持仓中扣除
+    db_transaction = db.query(models.UserPurchaseTransaction).filter(
+        models.UserPurchaseTransaction.user_id == user_id,
+        models.UserPurchaseTransaction.id == transaction_id
+    ).with_for_update().first()
+
     if not db_transaction:
         return OperationResult(status=OperationStatus.NOT_FOUND)
 
+    previous_change = crud_user_position.purchase_position_change(db_transaction, sign=-1)
     update_data = transaction.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_transaction, key, value)
     db.add(db_transaction)
+    db.flush()
+    crud_user_position.apply_user_position_changes(
+        db, user_id, [previous_change, crud_user_position.purchase_position_change(db_transaction)]
+    )
     db.commit()
     db.refresh(db_transaction)
 
@@ -120,11 +135,19 @@ def update_user_purchase_transaction(
 
 
 def delete_user_purchase_transaction(db: Session, user_id: int, transaction_id: int) -> OperationResult:
-    db_transaction = get_user_purchase_transaction_by_id(db=db, user_id=user_id, transaction_id=transaction_id).data
+    # 锁住交易行，并发修改时按最新的值从持仓中扣除
+    db_transaction = db.query(models.UserPurchaseTransaction).filter(
+        models.UserPurchaseTransaction.user_id == user_id,
+        models.UserPurchaseTransaction.id == transaction_id
+    ).with_for_update().first()
+
     if not db_transaction:
         return OperationResult(status=OperationStatus.NOT_FOUND)
 
     db.delete(db_transaction)
+    crud_user_position.apply_user_position_changes(
+        db, user_id, [crud_user_position.purchase_position_change(db_transaction, sign=-1)]
+    )
     db.commit()
 
     return OperationResult(status=OperationStatus.SUCCESS)
@@ -7,6 +7,7 @@ import app.models as models
 import app.schemas as schemas
 from app.core.operation_result import OperationResult, OperationStatus
 from app.core.paging import PagingData
+from app.crud import crud_user_position
 
 
 def create_user_sale_transaction(
@@ -16,6 +17,10 @@ def create_user_sale_transaction(
 ) -> OperationResult[schemas.UserSaleTransaction]:
     db_sale_transaction = models.UserSaleTransaction(user_id=user_id, **sale_transaction.model_dump())
     db.add(db_sale_transaction)
+    db.flush()
+    crud_user_position.apply_user_position_changes(
+        db, user_id, [crud_user_position.sale_position_change(db_sale_transaction)]
+    )
     db.commit()
     db.refresh(db_sale_transaction)
     return OperationResult(
@@ -104,18 +109,24 @@ def update_user_sale_transaction(
         transaction_id: int,
         transaction: schemas.UserSaleTransactionUpdate
 ) -> OperationResult[schemas.UserSaleTransaction]:
+    # 锁住交易行，并发修改时按最新的值从持仓中扣除
     db_transaction = db.query(models.UserSaleTransaction).filter(
         models.UserSaleTransaction.user_id == user_id,
         models.UserSaleTransaction.id == transaction_id
-    ).first()
+    ).with_for_update().first()
 
     if not db_transaction:
         return OperationResult(status=OperationStatus.NOT_FOUND)
 
+    previous_change = crud_user_position.sale_position_change(db_transaction, sign=-1)
     update_data = transaction.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_transaction, key, value)
     db.add(db_transaction)
+    db.flush()
+    crud_user_position.apply_user_position_changes(
+        db, user_id, [previous_change, crud_user_position.sale_position_change(db_transaction)]
+    )
     db.commit()
     db.refresh(db_transaction)
 
@@ -126,15 +137,19 @@ def update_user_sale_transaction(
 
 
 def delete_user_sale_transaction(db: Session, user_id: int, transaction_id: int) -> OperationResult:
+    # 锁住交易行，并发修改时按最新的值从持仓中扣除
     db_transaction = db.query(models.UserSaleTransaction).filter(
         models.UserSaleTransaction.user_id == user_id,
         models.UserSaleTransaction.id == transaction_id
-    ).first()
+    ).with_for_update().first()
 
     if not db_transaction:
         return OperationResult(status=OperationStatus.NOT_FOUND)
 
     db.delete(db_transaction)
+    crud_user_position.apply_user_position_changes(
+        db, user_id, [crud_user_position.sale_position_change(db_transaction, sign=-1)]
+    )
     db.commit()
 
     return OperationResult(status=OperationStatus.SUCCESS)
@@ -4,76 +4,35 @@ from sqlalchemy.orm import Session
 import app.models as models
 import app.schemas as schemas
 from app.core.operation_result import OperationResult, OperationStatus
+from app.crud import crud_platform_latest_price
 
 
 def get_user_stats(db: Session, user_id: int) -> OperationResult[schemas.UserStats]:
-    # 1. Calculate average cost for each purchased appearance
-    purchase_summary = db.query(
-        models.UserPurchaseTransaction.appearance_id,
-        func.sum(models.UserPurchaseTransaction.quantity).label("total_purchased"),
-        func.sum(models.UserPurchaseTransaction.quantity * models.UserPurchaseTransaction.unit_price_cents).label(
-            "total_cost"),
-        (func.sum(models.UserPurchaseTransaction.quantity * models.UserPurchaseTransaction.unit_price_cents) /
-         func.sum(models.UserPurchaseTransaction.quantity)).label("average_cost_cents")
-    ).filter(models.UserPurchaseTransaction.user_id == user_id).group_by(
-        models.UserPurchaseTransaction.appearance_id).subquery()
+    positions = models.UserPosition
 
-    # 2. Summarize sales
-    sale_summary = db.query(
-        models.UserSaleTransaction.appearance_id,
-        func.sum(models.UserSaleTransaction.quantity).label("total_sold"),
-        func.sum(models.UserSaleTransaction.quantity * models.UserSaleTransaction.unit_price_cents -
-                 models.UserSaleTransaction.platform_fee_cents).label("total_revenue")
-    ).filter(models.UserSaleTransaction.user_id == user_id).group_by(
-        models.UserSaleTransaction.appearance_id).subquery()
+    # 1. Realized PnL of every position, from the positions maintained on each transaction change
+    realized_pnl_cents = db.query(func.sum(positions.realized_pnl_cents)).filter(
+        positions.user_id == user_id
+    ).scalar() or 0
 
-    # 3. Calculate Realized PnL
-    realized_pnl_query = db.query(
-        func.sum(sale_summary.c.total_revenue).label("total_revenue"),
-        func.sum(sale_summary.c.total_sold * purchase_summary.c.average_cost_cents).label("total_cogs")
-    ).join(purchase_summary, sale_summary.c.appearance_id == purchase_summary.c.appearance_id).first()
+    # 2. Get the latest price for each appearance from the maintained latest-price table
+    current_prices = crud_platform_latest_price.get_latest_price_subquery(db, name='current_prices')
 
-    realized_pnl_cents = 0
-    if realized_pnl_query and realized_pnl_query.total_revenue is not None:
-        total_revenue = realized_pnl_query.total_revenue or 0
-        total_cogs = realized_pnl_query.total_cogs or 0
-        realized_pnl_cents = total_revenue - total_cogs
-
-    # 4. Calculate current holdings and their value
-    holdings_query = db.query(
-        purchase_summary.c.appearance_id,
-        (purchase_summary.c.total_purchased - func.coalesce(sale_summary.c.total_sold, 0)).label("held_quantity"),
-        purchase_summary.c.average_cost_cents
-    ).outerjoin(sale_summary, purchase_summary.c.appearance_id == sale_summary.c.appearance_id).filter(
-        (purchase_summary.c.total_purchased - func.coalesce(sale_summary.c.total_sold, 0)) > 0
-    ).subquery()
-
-    # 5. Get the latest price for each appearance
-    latest_prices = db.query(
-        models.PlatformPriceHistory.appearance_id,
-        func.max(models.PlatformPriceHistory.recorded_at).label("max_recorded_at")
-    ).group_by(models.PlatformPriceHistory.appearance_id).subquery()
-
-    current_prices = db.query(
-        models.PlatformPriceHistory.appearance_id,
-        models.PlatformPriceHistory.lowest_price_cents
-    ).join(latest_prices, (models.PlatformPriceHistory.appearance_id == latest_prices.c.appearance_id) &
-           (models.PlatformPriceHistory.recorded_at == latest_prices.c.max_recorded_at)).subquery()
-
-    # 6. Calculate total investment and market value for holdings
+    # 3. Calculate total investment and market value for holdings
     stats = db.query(
-        func.sum(holdings_query.c.held_quantity).label("total_appearances_held"),
-        func.sum(holdings_query.c.held_quantity * holdings_query.c.average_cost_cents).label(
-            "total_investment_cents"),
-        func.sum(holdings_query.c.held_quantity * func.coalesce(current_prices.c.lowest_price_cents, 0)).label(
-            "current_market_value_cents")
-    ).outerjoin(current_prices, holdings_query.c.appearance_id == current_prices.c.appearance_id).first()
+        func.sum(positions.quantity).label("total_appearances_held"),
+        func.sum(positions.total_cost_cents).label("total_investment_cents"),
+        func.sum(positions.quantity * func.coalesce(current_prices.c.price, 0)).label("current_market_value_cents")
+    ).outerjoin(current_prices, positions.appearance_id == current_prices.c.appearance_id).filter(
+        positions.user_id == user_id,
+        positions.quantity > 0
+    ).first()
 
     total_appearances_held = stats.total_appearances_held or 0
     total_investment_cents = stats.total_investment_cents or 0
-    current_market_value_cents = stats.current_market_value_cents or 0
+    current_market_value_cents = int(stats.current_market_value_cents or 0)
 
-    # 7. Calculate Estimated PnL
+    # 4. Calculate Estimated PnL
     estimated_pnl_cents = current_market_value_cents - total_investment_cents
     estimated_pnl_percentage = (estimated_pnl_cents / total_investment_cents) * 100 if total_investment_cents > 0 else 0
 
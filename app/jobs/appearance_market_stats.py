@@ -0,0 +1,46 @@
+"""
+Refresh job for appearance_market_stats.
+
+Ingest only refreshes the stats of the appearances it touches, so the 24h / 7d changes and the 30 day range of
+quiet appearances drift as time passes. This job recomputes every appearance, one committed chunk at a time:
+
+    python -m app.jobs.appearance_market_stats --chunk-size 1000
+"""
+import argparse
+import logging
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.crud import crud_appearance_market_stats, crud_market_index
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def run(chunk_size: int) -> int:
+    db = SessionLocal()
+    try:
+        refreshed_count = 0
+        for appearance_ids in crud_appearance_market_stats.get_appearance_id_chunks(db, chunk_size):
+            crud_appearance_market_stats.refresh_appearance_market_stats(db, appearance_ids)
+            db.commit()
+            crud_market_index.fold_market_index_changes(db)
+            refreshed_count += len(appearance_ids)
+            logger.info(f"Refreshed market stats of {refreshed_count} appearances so far")
+        return refreshed_count
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute the market stats of all appearances.")
+    parser.add_argument("--chunk-size", type=int, default=settings.APPEARANCE_MARKET_STATS_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    setup_logging()
+    refreshed_count = run(chunk_size=args.chunk_size)
+    logger.info(f"Market stats refresh finished, refreshed {refreshed_count} appearances")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Batch job computing the most similar appearances of every appearance.
+
+Daily closes of the last APPEARANCE_SIMILARITY_WINDOW_DAYS days are read from the daily candles into one
+matrix, turned into standardized daily log returns and correlated block by block; the top-K neighbours of
+each appearance replace the previous run in appearance_similarities:
+
+    python -m app.jobs.appearance_similarity --window-days 90 --top-k 20
+"""
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.crud import crud_appearance_similarity
+from app.db.database import SessionLocal
+from app.services.appearance_similarity import daily_log_returns, standardize_returns, top_k_similar
+
+logger = logging.getLogger(__name__)
+
+
+def run(window_days: int, top_k: int, min_observations: int, block_size: int) -> int:
+    computed_at = datetime.now(tz=timezone.utc)
+    # 窗口包含今天，共 window_days + 1 个日收盘价，得到 window_days 个日收益率
+    start_day = computed_at.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=window_days)
+    db = SessionLocal()
+    try:
+        appearance_ids, closes = crud_appearance_similarity.load_daily_closes(db, start_day, window_days + 1)
+        logger.info(f"Loaded daily closes of {len(appearance_ids)} appearances since {start_day.date()}")
+
+        standardized, kept = standardize_returns(daily_log_returns(closes), min_observations)
+        del closes
+        logger.info(f"Correlating {len(kept)} appearances with at least {min_observations} daily returns")
+
+        neighbours, correlations = top_k_similar(standardized, top_k, block_size)
+        # top_k_similar 返回的是 kept 内的下标
+        row_count = crud_appearance_similarity.replace_appearance_similarities(
+            db,
+            appearance_ids[kept],
+            neighbours,
+            correlations,
+            computed_at
+        )
+        return row_count
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute the most similar appearances by daily price returns.")
+    parser.add_argument("--window-days", type=int, default=settings.APPEARANCE_SIMILARITY_WINDOW_DAYS)
+    parser.add_argument("--top-k", type=int, default=settings.APPEARANCE_SIMILARITY_TOP_K)
+    parser.add_argument("--min-observations", type=int, default=settings.APPEARANCE_SIMILARITY_MIN_OBSERVATIONS)
+    parser.add_argument("--block-size", type=int, default=settings.APPEARANCE_SIMILARITY_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    setup_logging()
+    row_count = run(
+        window_days=args.window_days,
+        top_k=args.top_k,
+        min_observations=args.min_observations,
+        block_size=args.block_size
+    )
+    logger.info(f"Similarity job finished, stored {row_count} neighbours")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Rebase job for the market indexes.
+
+Ingest chains the indexes forward by price and listings changes only, see fold_market_index_changes. Appearances added to or removed from
+an appearance type, or deleted, change the constituents without a price change; this job recomputes the
+constituents of every index from appearance_market_stats while keeping the current levels:
+
+    python -m app.jobs.market_index_rebase
+"""
+import logging
+
+from app.core.logging_config import setup_logging
+from app.crud import crud_market_index
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+def run() -> int:
+    db = SessionLocal()
+    try:
+        return crud_market_index.rebase_market_indexes(db)
+    finally:
+        db.close()
+
+
+def main():
+    setup_logging()
+    rebased_count = run()
+    logger.info(f"Market index rebase finished, rebased {rebased_count} indexes")
+
+
+if __name__ == "__main__":
+    main()
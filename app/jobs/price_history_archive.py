@@ -0,0 +1,107 @@
+"""
+Archival job that moves old months of platform_price_history to Parquet files on local disk.
+
+Every monthly partition lying entirely before the last PRICE_HISTORY_ARCHIVE_AFTER_MONTHS months is
+written to one zstd compressed Parquet file per platform under PRICE_HISTORY_ARCHIVE_DIR, registered in
+platform_price_history_archives and then truncated. Readers merge the archived files back in when a query
+reaches that far. Run periodically (e.g. daily from cron):
+
+    python -m app.jobs.price_history_archive
+"""
+import argparse
+import logging
+from datetime import date
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.crud import crud_platform_price_history_archive
+from app.db.database import SessionLocal
+from app.jobs.price_history_partitions import list_partitions, add_months, current_month
+from app.services.price_history_archive import ARCHIVE_COLUMNS, archive_path, write_archive_file
+
+logger = logging.getLogger(__name__)
+
+
+def archive_partition(db: Session, partition_name: str, month: date) -> int:
+    """Write one partition to Parquet (a file per platform) and truncate it, in a single transaction."""
+    # 阻止归档期间的并发写入，否则这些点会随 TRUNCATE 一起丢失
+    db.execute(text(f'LOCK TABLE "{partition_name}" IN SHARE MODE'))
+
+    platform_ranges = db.execute(
+        text(
+            f'SELECT platform_id, min(recorded_at), max(recorded_at) FROM "{partition_name}" '
+            f'GROUP BY platform_id ORDER BY platform_id'
+        )
+    ).all()
+    if not platform_ranges:
+        db.rollback()
+        return 0
+
+    archived_count = 0
+    for platform_id, min_recorded_at, max_recorded_at in platform_ranges:
+        part = crud_platform_price_history_archive.count_archives(db, month=month, platform_id=platform_id)
+        path = archive_path(month, platform_id, part)
+
+        # 按 appearance_id 排序写出，按商品查询时可以借助行组统计信息跳过无关数据
+        result = db.execute(
+            text(
+                f'SELECT {", ".join(ARCHIVE_COLUMNS)} FROM "{partition_name}" '
+                f'WHERE platform_id = :platform_id ORDER BY appearance_id, recorded_at'
+            ).execution_options(yield_per=settings.PRICE_HISTORY_EXPORT_BATCH_SIZE),
+            {"platform_id": platform_id}
+        )
+        row_count = write_archive_file(path, result.partitions())
+
+        crud_platform_price_history_archive.create_archive(
+            db,
+            month=month,
+            platform_id=platform_id,
+            path=path,
+            row_count=row_count,
+            min_recorded_at=min_recorded_at,
+            max_recorded_at=max_recorded_at
+        )
+        archived_count += row_count
+        logger.info(f"Archived {row_count} points of platform {platform_id} from {partition_name} to {path}")
+
+    # 保留空分区以免入库时重新创建；入库会拒绝已归档月份的点，避免与归档文件中的点重复
+    db.execute(text(f'TRUNCATE "{partition_name}"'))
+    db.commit()
+    return archived_count
+
+
+def run(archive_after_months: int) -> List[str]:
+    if archive_after_months <= 0:
+        logger.info("Price history archival is disabled")
+        return []
+
+    cutoff_month = add_months(current_month(), -archive_after_months)
+    db = SessionLocal()
+    try:
+        archived_partitions = []
+        for partition_name, month in list_partitions(db):
+            if month >= cutoff_month:
+                break
+            if archive_partition(db, partition_name, month):
+                archived_partitions.append(partition_name)
+        return archived_partitions
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old platform_price_history months to Parquet files.")
+    parser.add_argument("--archive-after-months", type=int, default=settings.PRICE_HISTORY_ARCHIVE_AFTER_MONTHS)
+    args = parser.parse_args()
+
+    setup_logging()
+    archived_partitions = run(archive_after_months=args.archive_after_months)
+    logger.info(f"Archived {len(archived_partitions)} partitions")
+
+
+if __name__ == "__main__":
+    main()
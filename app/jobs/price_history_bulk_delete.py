@@ -0,0 +1,51 @@
+"""
+Delete platform price history points in a time range, in bounded chunks.
+
+Same as ``POST /platform-price-histories/bulk-delete`` but run in the foreground, e.g. to clean up after a bad
+scraper run from a shell:
+
+    python -m app.jobs.price_history_bulk_delete --start 2025-06-01T10:00:00Z --end 2025-06-01T12:00:00Z --platform-id 3
+"""
+import argparse
+import logging
+from datetime import datetime
+
+import app.schemas as schemas
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.services import price_history_delete_jobs
+
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete platform price history points in a time range.")
+    parser.add_argument("--start", type=datetime.fromisoformat, required=True, help="First recorded_at to delete (ISO 8601)")
+    parser.add_argument("--end", type=datetime.fromisoformat, required=True, help="Last recorded_at to delete (ISO 8601)")
+    parser.add_argument("--platform-id", type=int)
+    parser.add_argument("--appearance-id", type=int)
+    parser.add_argument("--chunk-size", type=int, default=settings.PRICE_HISTORY_DELETE_CHUNK_SIZE)
+    parser.add_argument("--pause-seconds", type=float, default=settings.PRICE_HISTORY_DELETE_PAUSE_SECONDS)
+    args = parser.parse_args()
+
+    setup_logging()
+    delete_filter = schemas.PlatformPriceHistoryBulkDelete(
+        start_date=args.start,
+        end_date=args.end,
+        platform_id=args.platform_id,
+        appearance_id=args.appearance_id
+    )
+    if price_history_delete_jobs.reaches_archived_months(delete_filter):
+        parser.error("the range reaches archived months, whose points cannot be deleted")
+    job = price_history_delete_jobs.create_job(delete_filter)
+    deleted_count = price_history_delete_jobs.run_job(
+        job.job_id,
+        delete_filter,
+        chunk_size=args.chunk_size,
+        pause_seconds=args.pause_seconds
+    )
+    logger.info(f"Bulk delete {job.job_id} finished, deleted {deleted_count} points")
+
+
+if __name__ == "__main__":
+    main()
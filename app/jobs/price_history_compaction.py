@@ -0,0 +1,151 @@
+"""
+Compaction job that collapses runs of unchanged points in platform_price_history.
+
+Points equal (price and quantity on sale) to the previous point of their series are removed unless a
+heartbeat interval has passed since the start of the run, which is what change-only ingest stores in the
+first place. Each monthly partition is compacted and committed on its own, together with the rebuilt candles
+and latest prices of the removed points:
+
+    python -m app.jobs.price_history_compaction --from-month 2025-01 --to-month 2025-06
+"""
+import argparse
+import logging
+from datetime import date, datetime
+from typing import Optional
+
+from sqlalchemy import Table, MetaData, Column, BigInteger, Integer, DateTime, select, text
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_platform_latest_price, crud_platform_price_candle
+from app.core.logging_config import setup_logging
+from app.db.database import SessionLocal
+from app.jobs.price_history_partitions import list_partitions, current_month
+from app.services.price_series_cache import price_series_cache
+
+logger = logging.getLogger(__name__)
+
+# 每个分区压缩时删掉的点，用于在同一事务内重算 K 线与最新价
+_compacted_price_points = Table(
+    "platform_price_history_compacted",
+    MetaData(),
+    Column("appearance_id", BigInteger, nullable=False),
+    Column("platform_id", Integer, nullable=False),
+    Column("recorded_at", DateTime(timezone=True), nullable=False),
+    prefixes=["TEMPORARY"],
+    postgresql_on_commit="DROP",
+)
+
+# 每个平台期以起点为锚按心跳间隔分槽，槽内只保留第一个点；platform_latest_price 指向的点始终保留
+_COMPACT_PARTITION_SQL = """
+WITH changes AS (
+    SELECT id, appearance_id, platform_id, recorded_at,
+           lag(lowest_price_cents) OVER pair_points IS DISTINCT FROM lowest_price_cents
+               OR lag(quantity_on_sale) OVER pair_points IS DISTINCT FROM quantity_on_sale
+               OR lag(id) OVER pair_points IS NULL AS starts_run
+    FROM "{partition_name}"
+    WINDOW pair_points AS (PARTITION BY appearance_id, platform_id ORDER BY recorded_at)
+),
+runs AS (
+    SELECT *,
+           count(*) FILTER (WHERE starts_run) OVER (
+               PARTITION BY appearance_id, platform_id ORDER BY recorded_at
+           ) AS run_no
+    FROM changes
+),
+slots AS (
+    SELECT id, appearance_id, platform_id, recorded_at, run_no,
+           coalesce(floor(extract(EPOCH FROM recorded_at - min(recorded_at) OVER (
+               PARTITION BY appearance_id, platform_id, run_no
+           )) / :heartbeat_seconds), 0) AS slot
+    FROM runs
+),
+ranked AS (
+    SELECT id, recorded_at,
+           row_number() OVER (PARTITION BY appearance_id, platform_id, run_no, slot ORDER BY recorded_at) AS slot_rank
+    FROM slots
+),
+deleted AS (
+    DELETE FROM "{partition_name}" h
+    USING ranked r
+    WHERE h.id = r.id
+      AND h.recorded_at = r.recorded_at
+      AND r.slot_rank > 1
+      AND NOT EXISTS (
+          SELECT 1
+          FROM platform_latest_price l
+          WHERE l.appearance_id = h.appearance_id
+            AND l.platform_id = h.platform_id
+            AND l.recorded_at = h.recorded_at
+      )
+    RETURNING h.appearance_id, h.platform_id, h.recorded_at
+)
+INSERT INTO {compacted_table} (appearance_id, platform_id, recorded_at)
+SELECT appearance_id, platform_id, recorded_at
+FROM deleted
+"""
+
+
+def _parse_month(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m").date()
+
+
+def _positive_int(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be positive: {value}")
+    return number
+
+
+def compact_partition(db: Session, partition_name: str, heartbeat_minutes: int) -> int:
+    _compacted_price_points.create(bind=db.connection())
+    deleted_count = db.execute(
+        text(_COMPACT_PARTITION_SQL.format(partition_name=partition_name, compacted_table=_compacted_price_points.name)),
+        {"heartbeat_seconds": heartbeat_minutes * 60}
+    ).rowcount
+    if not deleted_count:
+        db.rollback()
+        return 0
+
+    # 删掉的点不会是最新价指向的点，这里与批量删除走同一套重算，K 线的挂单数统计也随之更新
+    crud_platform_latest_price.rebuild_removed_platform_latest_prices(db, _compacted_price_points)
+    crud_platform_price_candle.rebuild_platform_price_candle_buckets(db, _compacted_price_points)
+    deleted_appearance_ids = set(db.execute(select(_compacted_price_points.c.appearance_id).distinct()).scalars())
+    db.commit()
+
+    # 压缩不改变阶梯序列的取值，但缓存中的序列需要重新加载以释放多余的点
+    price_series_cache.invalidate(deleted_appearance_ids)
+    return deleted_count
+
+
+def run(from_month: Optional[date], to_month: Optional[date], heartbeat_minutes: int) -> int:
+    to_month = to_month or current_month()
+    db = SessionLocal()
+    try:
+        compacted_count = 0
+        for partition_name, month in list_partitions(db):
+            if (from_month and month < from_month) or month > to_month:
+                continue
+            deleted_count = compact_partition(db, partition_name, heartbeat_minutes)
+            logger.info(f"Compacted partition {partition_name}, removed {deleted_count} unchanged points")
+            compacted_count += deleted_count
+        return compacted_count
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collapse runs of unchanged platform price history points.")
+    parser.add_argument("--from-month", type=_parse_month, help="First month to compact (YYYY-MM)")
+    parser.add_argument("--to-month", type=_parse_month, help="Last month to compact (YYYY-MM), defaults to this month")
+    parser.add_argument("--heartbeat-minutes", type=_positive_int,
+                        default=settings.PRICE_HISTORY_HEARTBEAT_MINUTES)
+    args = parser.parse_args()
+
+    setup_logging()
+    compacted_count = run(from_month=args.from_month, to_month=args.to_month, heartbeat_minutes=args.heartbeat_minutes)
+    logger.info(f"Compaction finished, removed {compacted_count} unchanged points")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Worker that drains the asynchronous price history ingest queue.
+
+Batches accepted by ``POST /platform-price-histories/async`` are read from the Redis stream and coalesced
+into transactions of up to PRICE_HISTORY_INGEST_MAX_ROWS rows, flushed at least every
+PRICE_HISTORY_INGEST_FLUSH_SECONDS. A batch that fails is marked failed on its own; one that keeps crashing
+workers is moved to PRICE_HISTORY_INGEST_DEAD_LETTER_STREAM after PRICE_HISTORY_INGEST_MAX_DELIVERIES
+deliveries. Run one or more long-lived workers:
+
+    python -m app.jobs.price_history_ingest_worker
+"""
+import argparse
+import logging
+import os
+import socket
+import time
+from bisect import bisect_right
+from collections import Counter
+from itertools import accumulate
+from typing import List
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import app.schemas as schemas
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.crud import crud_platform_price_history
+from app.db.database import SessionLocal
+from app.services import price_history_ingest_queue as ingest_queue
+from app.services.price_history_ingest_queue import QueuedBatch
+
+logger = logging.getLogger(__name__)
+
+# 每次从流中读取的最大消息数（每条消息是一个批次）
+_READ_COUNT = 100
+
+
+def _mark_done(batches: List[QueuedBatch], rejections: List[schemas.PlatformPriceHistoryRejection]) -> None:
+    # 拒绝记录的下标指向合并后的列表，按各批次的起始偏移量换算回批次
+    batch_offsets = list(accumulate(len(batch.histories) for batch in batches))
+    rejected_counts = Counter(bisect_right(batch_offsets, rejection.index) for rejection in rejections)
+    for batch_index, batch in enumerate(batches):
+        ingest_queue.mark_batch(batch, ingest_queue.BATCH_DONE, rejected=rejected_counts[batch_index])
+
+
+def _ingest(batches: List[QueuedBatch], on_conflict: str, changes_only: bool) -> None:
+    db = SessionLocal()
+    try:
+        histories = [history for batch in batches for history in batch.histories]
+        try:
+            operation_result = crud_platform_price_history.create_platform_price_histories(
+                db,
+                histories=histories,
+                on_conflict=on_conflict,
+                changes_only=changes_only
+            )
+        except Exception as e:
+            # 任何异常都只让对应的批次失败，不能让 worker 退出后反复重投同一批消息
+            db.rollback()
+            if len(batches) == 1:
+                if isinstance(e, SQLAlchemyError):
+                    logger.warning(f"Price history batch {batches[0].batch_id} failed: {e}")
+                else:
+                    logger.exception(f"Price history batch {batches[0].batch_id} failed unexpectedly")
+                ingest_queue.mark_batches(batches, ingest_queue.BATCH_FAILED, error=str(getattr(e, "orig", e)))
+                return
+            logger.warning(f"Coalesced ingest of {len(batches)} batches failed, retrying them one by one: {e}")
+        else:
+            _mark_done(batches, operation_result.data.rejected)
+            logger.info(f"Ingested {len(batches)} batches, {operation_result.data}")
+            return
+    finally:
+        db.close()
+
+    # 合并后的事务失败时逐批重试，只让有问题的批次失败
+    for batch in batches:
+        _ingest([batch], on_conflict, changes_only)
+
+
+def flush(batches: List[QueuedBatch]) -> None:
+    """Ingest ``batches`` with one transaction per ingest mode, then acknowledge them."""
+    batches_by_mode = {}
+    for batch in batches:
+        batches_by_mode.setdefault((batch.on_conflict, batch.changes_only), []).append(batch)
+
+    for (on_conflict, changes_only), mode_batches in batches_by_mode.items():
+        ingest_queue.mark_batches(mode_batches, ingest_queue.BATCH_PROCESSING)
+        _ingest(mode_batches, on_conflict, changes_only)
+
+    ingest_queue.acknowledge(batches)
+
+
+def run(consumer: str, max_rows: int, flush_seconds: float, once: bool = False) -> None:
+    ingest_queue.ensure_consumer_group()
+    logger.info(f"Price history ingest worker {consumer} started")
+
+    pending: List[QueuedBatch] = []
+    pending_rows = 0
+    first_pending_at = None
+    while True:
+        wait_seconds = flush_seconds if first_pending_at is None else flush_seconds - (time.monotonic() - first_pending_at)
+        batches = ingest_queue.read_batches(consumer, count=_READ_COUNT, block_ms=max(int(wait_seconds * 1000), 1))
+        if batches and first_pending_at is None:
+            first_pending_at = time.monotonic()
+        pending.extend(batches)
+        pending_rows += sum(len(batch.histories) for batch in batches)
+
+        if not pending:
+            if once:
+                return
+            continue
+
+        if pending_rows >= max_rows or time.monotonic() - first_pending_at >= flush_seconds or (once and not batches):
+            flush(pending)
+            pending, pending_rows, first_pending_at = [], 0, None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drain the asynchronous platform price history ingest queue.")
+    parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--max-rows", type=int, default=settings.PRICE_HISTORY_INGEST_MAX_ROWS)
+    parser.add_argument("--flush-seconds", type=float, default=settings.PRICE_HISTORY_INGEST_FLUSH_SECONDS)
+    parser.add_argument("--once", action="store_true", help="Exit once the queue is drained")
+    args = parser.parse_args()
+
+    setup_logging()
+    run(consumer=args.consumer, max_rows=args.max_rows, flush_seconds=args.flush_seconds, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
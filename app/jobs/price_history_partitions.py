@@ -0,0 +1,177 @@
+"""
+Maintenance job for the monthly partitions of platform_price_history.
+
+Expired months are detached concurrently, so reads and ingest keep running meanwhile. Their hourly and
+daily candles and their archive files are removed with them. platform_latest_price is kept on purpose:
+it holds the last known price of a series, which still values holdings after its points have expired.
+
+Run periodically (e.g. daily from cron):
+
+    python -m app.jobs.price_history_partitions
+"""
+import argparse
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+from typing import List, Tuple
+
+from sqlalchemy import text, delete
+from sqlalchemy.orm import Session
+
+import app.models as models
+from app.core.config import settings
+from app.core.logging_config import setup_logging
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+_PARTITION_NAME_PATTERN = re.compile(r"^platform_price_history_(\d{4})_(\d{2})$")
+_RETENTION_ACTIONS = ("detach", "drop")
+
+
+def add_months(month: date, months: int) -> date:
+    month_index = month.year * 12 + month.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def current_month() -> date:
+    today = datetime.now(tz=timezone.utc).date()
+    return today.replace(day=1)
+
+
+def create_future_partitions(db: Session, months_ahead: int) -> None:
+    from_month = current_month()
+    to_month = add_months(from_month, months_ahead)
+    db.execute(
+        text("SELECT ensure_platform_price_history_partitions(:from_month, :to_month)"),
+        {"from_month": from_month, "to_month": to_month}
+    )
+    db.commit()
+    logger.info(f"Ensured platform_price_history partitions from {from_month} to {to_month}")
+
+
+def _partition_names(db: Session, detach_pending: bool) -> List[str]:
+    return db.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'platform_price_history'::regclass AND i.inhdetachpending = :detach_pending"
+        ),
+        {"detach_pending": detach_pending}
+    ).scalars().all()
+
+
+def list_partitions(db: Session) -> List[Tuple[str, date]]:
+    """Attached partitions and their months, oldest first; partitions still being detached are left out."""
+    partition_names = _partition_names(db, detach_pending=False)
+
+    partitions = []
+    for partition_name in partition_names:
+        match = _PARTITION_NAME_PATTERN.match(partition_name)
+        if not match:
+            logger.warning(f"Skipping partition with unexpected name: {partition_name}")
+            continue
+        partitions.append((partition_name, date(int(match.group(1)), int(match.group(2)), 1)))
+
+    return sorted(partitions, key=lambda partition: partition[1])
+
+
+def _alter_parent(db: Session, statement: str) -> None:
+    # DETACH ... CONCURRENTLY 不能在事务块中执行，使用独立的自动提交连接
+    with db.get_bind().connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        connection.execute(text(statement))
+
+
+def _delete_expired_candles(db: Session, month: date) -> None:
+    # 分区按 UTC 月份划分，K 线按同样的边界删除
+    month_start = datetime(month.year, month.month, 1, tzinfo=timezone.utc)
+    next_month = add_months(month, 1)
+    month_end = datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)
+    for candle_model in (models.PlatformPriceCandleHourly, models.PlatformPriceCandleDaily):
+        db.execute(
+            delete(candle_model).where(candle_model.bucket_start >= month_start, candle_model.bucket_start < month_end)
+        )
+
+
+def _expire_archives(db: Session, cutoff_month: date, action: str) -> None:
+    """Unregister the archive files of months before ``cutoff_month``; ``drop`` also deletes them from disk."""
+    archives = models.PlatformPriceHistoryArchive
+    paths = db.execute(
+        delete(archives).where(archives.month < cutoff_month).returning(archives.path)
+    ).scalars().all()
+    db.commit()
+    if action != "drop":
+        return
+    # 先提交登记的删除再删文件，失败时不会留下指向已删除文件的登记
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    if paths:
+        logger.info(f"Deleted {len(paths)} archive files before {cutoff_month}")
+
+
+def apply_retention(db: Session, retention_months: int, action: str) -> List[str]:
+    """
+    Detach (and optionally drop) every partition that lies completely before the retention window.
+
+    Partitions are detached with DETACH PARTITION ... CONCURRENTLY, which only takes a SHARE UPDATE EXCLUSIVE
+    lock on platform_price_history; a detach interrupted by a previous run is finalized first. The candles
+    and archive files of expired months are removed as well.
+    """
+    if action not in _RETENTION_ACTIONS:
+        raise ValueError(f"Unknown retention action: {action}")
+    if retention_months <= 0:
+        return []
+
+    cutoff_month = add_months(current_month(), -retention_months)
+    pending_partitions = _partition_names(db, detach_pending=True)
+    partitions = list_partitions(db)
+    # 并发分离需要等待主表上已有的事务结束，不能让本会话的事务挂着
+    db.commit()
+
+    for partition_name in pending_partitions:
+        _alter_parent(db, f'ALTER TABLE platform_price_history DETACH PARTITION "{partition_name}" FINALIZE')
+        logger.info(f"Finalized pending detach of partition {partition_name}")
+
+    expired_partitions = []
+    for partition_name, month in partitions:
+        if month >= cutoff_month:
+            break
+
+        _alter_parent(db, f'ALTER TABLE platform_price_history DETACH PARTITION "{partition_name}" CONCURRENTLY')
+        if action == "drop":
+            db.execute(text(f'DROP TABLE "{partition_name}"'))
+        _delete_expired_candles(db, month)
+        db.commit()
+
+        logger.info(f"Partition {partition_name} expired and was {'dropped' if action == 'drop' else 'detached'}")
+        expired_partitions.append(partition_name)
+
+    _expire_archives(db, cutoff_month, action)
+    return expired_partitions
+
+
+def run(months_ahead: int, retention_months: int, action: str) -> None:
+    db = SessionLocal()
+    try:
+        create_future_partitions(db, months_ahead=months_ahead)
+        apply_retention(db, retention_months=retention_months, action=action)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create and expire platform_price_history partitions.")
+    parser.add_argument("--months-ahead", type=int, default=settings.PRICE_HISTORY_PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--retention-months", type=int, default=settings.PRICE_HISTORY_RETENTION_MONTHS)
+    parser.add_argument("--action", choices=_RETENTION_ACTIONS, default=settings.PRICE_HISTORY_RETENTION_ACTION)
+    args = parser.parse_args()
+
+    setup_logging()
+    run(months_ahead=args.months_ahead, retention_months=args.retention_months, action=args.action)
+
+
+if __name__ == "__main__":
+    main()
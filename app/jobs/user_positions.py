@@ -0,0 +1,64 @@
+"""
+Rebuild and verification job for user_positions.
+
+Positions are kept up to date by the purchase and sale transaction endpoints. Run the rebuild once after
+creating the table, or whenever the verification reports drift, e.g. after editing transactions in SQL:
+
+    python -m app.jobs.user_positions --verify
+    python -m app.jobs.user_positions --user-id 42
+
+Verification only reads; it exits with status 1 when any position differs from its transactions.
+"""
+import argparse
+import logging
+import sys
+from typing import Optional
+
+from app.core.logging_config import setup_logging
+from app.crud import crud_user_position
+from app.db.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# 日志中最多列出的不一致持仓数
+_MAX_LOGGED_MISMATCHES = 20
+
+
+def run(user_id: Optional[int] = None, verify: bool = False) -> int:
+    """Rebuild the positions, or with ``verify`` only count the mismatching ones."""
+    db = SessionLocal()
+    try:
+        if not verify:
+            return crud_user_position.rebuild_user_positions(db, user_id=user_id)
+
+        mismatches = crud_user_position.verify_user_positions(db, user_id=user_id)
+        for mismatch_user_id, appearance_id in mismatches[:_MAX_LOGGED_MISMATCHES]:
+            logger.warning(
+                f"Position of user {mismatch_user_id} in appearance {appearance_id} differs from its transactions"
+            )
+        return len(mismatches)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild or verify user positions from their transactions.")
+    parser.add_argument("--user-id", type=int, help="Only this user, defaults to all users")
+    parser.add_argument(
+        "--verify", action="store_true", help="Compare the positions with the transactions without writing"
+    )
+    args = parser.parse_args()
+
+    setup_logging()
+    count = run(user_id=args.user_id, verify=args.verify)
+    if not args.verify:
+        logger.info(f"User positions rebuild finished, wrote {count} positions")
+        return
+    if count:
+        logger.error(f"User positions verification found {count} mismatching positions")
+        sys.exit(1)
+    logger.info("User positions verification found no mismatches")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ from starlette.requests import Request
 from starlette.responses import JSONResponse
 
 from app.api import auth, user_stats, user_portfolio, appearance, appearance_type, appearance_alias, platform, \
-    user_purchase_transaction, user_sale_transaction, platform_price_history, watchlist, watchlist_item
+    user_purchase_transaction, user_sale_transaction, platform_price_history, watchlist, watchlist_item, market_index
 from app.core.exceptions import BusinessException
 from app.core.logging_config import setup_logging
 from app.core.result_codes import ResultCode
@@ -91,6 +91,7 @@ app.include_router(platform.router, prefix="/platforms", tags=["platforms"])
 app.include_router(user_purchase_transaction.router, prefix="/user-purchase-transactions", tags=["transactions"])
 app.include_router(user_sale_transaction.router, prefix="/user-sale-transactions", tags=["transactions"])
 app.include_router(platform_price_history.router, prefix="/platform-price-histories", tags=["platforms"])
+app.include_router(market_index.router, prefix="/market-indexes", tags=["market-indexes"])
 
 # Watchlist 类
 app.include_router(watchlist.router, prefix="/watchlists", tags=["watchlists"])
@@ -1,11 +1,19 @@
 from .appearance import Appearance
+from .appearance_market_stats import AppearanceMarketStats, AppearancePlatformLiquidity
+from .appearance_similarity import AppearanceSimilarity
 from .appearance_alias import AppearanceAlias
 from .appearance_type import AppearanceType
 from .associations import appearance_type_relations
+from .market_index import MarketIndex, MarketIndexLevel, MarketIndexChange
 from .platform import Platform
 from .platform_appearance_relation import PlatformAppearanceRelation
+from .platform_latest_price import PlatformLatestPrice
+from .platform_price_candle import PlatformPriceCandleHourly, PlatformPriceCandleDaily
 from .platform_price_history import PlatformPriceHistory
+from .platform_price_history_archive import PlatformPriceHistoryArchive
+from .platform_price_quarantine import PlatformPriceQuarantine
 from .user import User
+from .user_position import UserPosition
 from .user_purchase_transaction import UserPurchaseTransaction
 from .user_sale_transaction import UserSaleTransaction
 from .watchlist import Watchlist
@@ -17,7 +25,19 @@ __all__ = [
     "Platform",
     "AppearanceType",
     "AppearanceAlias",
+    "AppearanceMarketStats",
+    "AppearancePlatformLiquidity",
+    "AppearanceSimilarity",
     "PlatformPriceHistory",
+    "PlatformPriceHistoryArchive",
+    "PlatformPriceQuarantine",
+    "PlatformLatestPrice",
+    "PlatformPriceCandleHourly",
+    "PlatformPriceCandleDaily",
+    "MarketIndex",
+    "MarketIndexLevel",
+    "MarketIndexChange",
+    "UserPosition",
     "UserPurchaseTransaction",
     "UserSaleTransaction",
     "PlatformAppearanceRelation",
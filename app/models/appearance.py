@@ -23,3 +23,10 @@ class Appearance(Base):
     appearance_aliases = relationship("AppearanceAlias", back_populates="appearance", cascade="all, delete-orphan")
     platform_relations = relationship("PlatformAppearanceRelation", back_populates="appearance")
     platform_price_histories = relationship("PlatformPriceHistory", back_populates="appearance")
+    market_stats = relationship("AppearanceMarketStats", back_populates="appearance", uselist=False, viewonly=True)
+    platform_liquidity = relationship(
+        "AppearancePlatformLiquidity",
+        back_populates="appearance",
+        viewonly=True,
+        order_by="AppearancePlatformLiquidity.platform_id"
+    )
@@ -0,0 +1,49 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, DateTime, Float, Integer
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+
+class AppearanceMarketStats(Base):
+    __tablename__ = "appearance_market_stats"
+
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    # 与持仓估值一致：取各平台中最近一次记录的最新价
+    current_price_cents = Column(BigInteger)
+    listings_count = Column(BigInteger)
+    # 相对 24 小时 / 7 天前价格的涨跌幅（小数），参考价取当时所在小时 K 线的收盘价
+    change_24h = Column(Float)
+    change_7d = Column(Float)
+    min_price_30d_cents = Column(BigInteger)
+    max_price_30d_cents = Column(BigInteger)
+    # 跨平台价差，仅统计近期有报价的平台，至少两个平台时才有值
+    lowest_price_cents = Column(BigInteger)
+    highest_price_cents = Column(BigInteger)
+    spread_cents = Column(BigInteger)
+    # 在最便宜的平台买入、扣除手续费后在其他平台卖出的最佳毛利
+    margin_cents = Column(BigInteger)
+    # 各平台流动性指标的汇总，见 AppearancePlatformLiquidity
+    average_listings = Column(Float)
+    listings_trend = Column(Float)
+    turnover_rate = Column(Float)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    appearance = relationship("Appearance", back_populates="market_stats")
+
+
+class AppearancePlatformLiquidity(Base):
+    __tablename__ = "appearance_platform_liquidity"
+
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    platform_id = Column(Integer, ForeignKey('platforms.id'), primary_key=True)
+    # 最近窗口内每日平均挂单数的均值，及其相对前一个等长窗口的变化（小数）
+    average_listings = Column(Float, nullable=False)
+    previous_average_listings = Column(Float)
+    listings_trend = Column(Float)
+    # 窗口内日收盘挂单数的累计减少量，视为已成交（或撤下）的挂单
+    delisted_listings = Column(BigInteger, nullable=False)
+    # 换手率近似：减少的挂单数 / 平均挂单数
+    turnover_rate = Column(Float)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    appearance = relationship("Appearance", back_populates="platform_liquidity")
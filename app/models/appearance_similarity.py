@@ -0,0 +1,18 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, DateTime, Float, SmallInteger
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+
+class AppearanceSimilarity(Base):
+    __tablename__ = "appearance_similarities"
+
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    # 1 为最相似
+    rank = Column(SmallInteger, primary_key=True)
+    similar_appearance_id = Column(BigInteger, ForeignKey('appearances.id'), nullable=False)
+    # 日对数收益率的相关系数
+    correlation = Column(Float, nullable=False)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
+
+    similar_appearance = relationship("Appearance", foreign_keys=[similar_appearance_id])
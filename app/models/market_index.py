@@ -0,0 +1,44 @@
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, DateTime, Float, String
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class MarketIndex(Base):
+    __tablename__ = "market_indexes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # 为空表示全市场指数
+    appearance_type_id = Column(Integer, ForeignKey('appearance_types.id'), nullable=True)
+    weighting = Column(String(20), nullable=False)
+    level = Column(Float, nullable=False)
+    # 按挂单数加权时为成分股 Σ 挂单数 × 当前价，作为下一次链接的分母
+    weighted_sum = Column(Float, nullable=False, default=0)
+    constituent_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    appearance_type = relationship("AppearanceType")
+
+
+class MarketIndexLevel(Base):
+    __tablename__ = "market_index_levels"
+
+    market_index_id = Column(Integer, ForeignKey('market_indexes.id'), primary_key=True)
+    # 每小时保留该小时最后的点位
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    level = Column(Float, nullable=False)
+    constituent_count = Column(Integer, nullable=False)
+
+
+class MarketIndexChange(Base):
+    __tablename__ = "market_index_changes"
+
+    id = Column(BigInteger, primary_key=True)
+    # 入库时只追加外观当前价与挂单数的变化，由 fold_market_index_changes 在独立的短事务中链接进指数
+    appearance_id = Column(BigInteger, nullable=False)
+    old_price_cents = Column(BigInteger)
+    old_listings = Column(BigInteger)
+    new_price_cents = Column(BigInteger)
+    new_listings = Column(BigInteger)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
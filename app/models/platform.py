@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer
+from sqlalchemy import Column, String, Integer, Float
 from sqlalchemy.orm import relationship
 
 from app.db.database import Base
@@ -9,5 +9,7 @@ class Platform(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False, unique=True, index=True)
+    # 卖家在该平台成交时被收取的手续费比例
+    fee_rate = Column(Float, nullable=False, default=0, server_default="0")
 
     appearance_relations = relationship("PlatformAppearanceRelation", back_populates="platform")
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, Integer, DateTime
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+
+class PlatformLatestPrice(Base):
+    __tablename__ = "platform_latest_price"
+
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    platform_id = Column(Integer, ForeignKey('platforms.id'), primary_key=True)
+    lowest_price_cents = Column(BigInteger, nullable=False)
+    quantity_on_sale = Column(Integer)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+    appearance = relationship("Appearance")
+    platform = relationship("Platform")
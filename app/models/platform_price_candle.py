@@ -0,0 +1,41 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, Integer, DateTime
+
+from app.db.database import Base
+
+
+class PlatformPriceCandleHourly(Base):
+    __tablename__ = "platform_price_candles_hourly"
+
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    platform_id = Column(Integer, ForeignKey('platforms.id'), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    open_price_cents = Column(BigInteger, nullable=False)
+    high_price_cents = Column(BigInteger, nullable=False)
+    low_price_cents = Column(BigInteger, nullable=False)
+    close_price_cents = Column(BigInteger, nullable=False)
+    min_quantity_on_sale = Column(Integer)
+    # 桶内挂单数之和与有挂单数的点数，用于计算平均挂单数
+    quantity_on_sale_sum = Column(BigInteger)
+    quantity_on_sale_count = Column(Integer)
+    close_quantity_on_sale = Column(Integer)
+    open_recorded_at = Column(DateTime(timezone=True), nullable=False)
+    close_recorded_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class PlatformPriceCandleDaily(Base):
+    __tablename__ = "platform_price_candles_daily"
+
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    platform_id = Column(Integer, ForeignKey('platforms.id'), primary_key=True)
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    open_price_cents = Column(BigInteger, nullable=False)
+    high_price_cents = Column(BigInteger, nullable=False)
+    low_price_cents = Column(BigInteger, nullable=False)
+    close_price_cents = Column(BigInteger, nullable=False)
+    min_quantity_on_sale = Column(Integer)
+    # 桶内挂单数之和与有挂单数的点数，用于计算平均挂单数
+    quantity_on_sale_sum = Column(BigInteger)
+    quantity_on_sale_count = Column(Integer)
+    close_quantity_on_sale = Column(Integer)
+    open_recorded_at = Column(DateTime(timezone=True), nullable=False)
+    close_recorded_at = Column(DateTime(timezone=True), nullable=False)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, ForeignKey, Integer, DateTime
+from sqlalchemy import Column, BigInteger, ForeignKey, Integer, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from app.db.database import Base
@@ -6,13 +6,16 @@ from app.db.database import Base
 
 class PlatformPriceHistory(Base):
     __tablename__ = "platform_price_history"
+    __table_args__ = (
+        UniqueConstraint('appearance_id', 'platform_id', 'recorded_at', name='uq_platform_price_history_point'),
+    )
 
     id = Column(BigInteger, primary_key=True, index=True)
     appearance_id = Column(BigInteger, ForeignKey('appearances.id'), nullable=False)
     platform_id = Column(Integer, ForeignKey('platforms.id'), nullable=False)
     lowest_price_cents = Column(BigInteger, nullable=False)
     quantity_on_sale = Column(Integer)
-    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    recorded_at = Column(DateTime(timezone=True), primary_key=True, nullable=False)
 
     appearance = relationship("Appearance", back_populates="platform_price_histories")
     platform = relationship("Platform")
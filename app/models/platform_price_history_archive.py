@@ -0,0 +1,20 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, Integer, DateTime, Date, Text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class PlatformPriceHistoryArchive(Base):
+    __tablename__ = "platform_price_history_archives"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    month = Column(Date, nullable=False)
+    platform_id = Column(Integer, ForeignKey('platforms.id'), nullable=False)
+    path = Column(Text, nullable=False, unique=True)
+    row_count = Column(BigInteger, nullable=False)
+    min_recorded_at = Column(DateTime(timezone=True), nullable=False)
+    max_recorded_at = Column(DateTime(timezone=True), nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    platform = relationship("Platform")
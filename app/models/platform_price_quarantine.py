@@ -0,0 +1,22 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, Integer, DateTime, Float
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class PlatformPriceQuarantine(Base):
+    __tablename__ = "platform_price_quarantine"
+
+    id = Column(BigInteger, primary_key=True, index=True)
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), nullable=False)
+    platform_id = Column(Integer, ForeignKey('platforms.id'), nullable=False)
+    lowest_price_cents = Column(BigInteger, nullable=False)
+    quantity_on_sale = Column(Integer)
+    recorded_at = Column(DateTime(timezone=True), nullable=False)
+    # 判定时参考窗口的中位价与稳健 z 分数（基于对数价格）
+    median_price_cents = Column(BigInteger, nullable=False)
+    deviation = Column(Float, nullable=False)
+    quarantined_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    platform = relationship("Platform")
@@ -0,0 +1,36 @@
+from sqlalchemy import Column, BigInteger, ForeignKey, DateTime, Float, Computed
+from sqlalchemy.orm import relationship
+
+from app.db.database import Base
+
+
+class UserPosition(Base):
+    __tablename__ = "user_positions"
+
+    user_id = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+    appearance_id = Column(BigInteger, ForeignKey('appearances.id'), primary_key=True)
+    # 买入与卖出的累计值，随交易的增删改按差额累加
+    purchased_quantity = Column(BigInteger, nullable=False, default=0)
+    purchased_cost_cents = Column(BigInteger, nullable=False, default=0)
+    sold_quantity = Column(BigInteger, nullable=False, default=0)
+    # 卖出所得，已扣除平台手续费
+    sale_revenue_cents = Column(BigInteger, nullable=False, default=0)
+    # 由累计值生成：持仓数量，按全部买入的平均成本计的持仓成本与已实现盈亏
+    quantity = Column(BigInteger, Computed("purchased_quantity - sold_quantity"))
+    total_cost_cents = Column(
+        Float,
+        Computed(
+            "(purchased_quantity - sold_quantity) * purchased_cost_cents::DOUBLE PRECISION "
+            "/ NULLIF(purchased_quantity, 0)"
+        )
+    )
+    realized_pnl_cents = Column(
+        Float,
+        Computed(
+            "sale_revenue_cents - sold_quantity * purchased_cost_cents::DOUBLE PRECISION "
+            "/ NULLIF(purchased_quantity, 0)"
+        )
+    )
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    appearance = relationship("Appearance")
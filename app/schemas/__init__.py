@@ -1,9 +1,18 @@
-from .appearance import Appearance, AppearanceCreate, AppearanceUpdate
+from .appearance import Appearance, AppearanceCreate, AppearanceUpdate, AppearanceMarketStats, \
+    AppearancePlatformLiquidity, AppearanceWithMarketStats, SimilarAppearance
+from .appearance_analytics import AppearancePriceAnalytics, AppearancePriceAnalyticsPoint
 from .appearance_alias import AppearanceAlias, AppearanceAliasCreate, AppearanceAliasUpdate, AppearanceAliasSimple
 from .appearance_type import AppearanceType, AppearanceTypeCreate, AppearanceTypeUpdate
+from .market_index import MarketIndex, MarketIndexLevel, MarketIndexHistory
 from .platform import Platform, PlatformCreate, PlatformUpdate
 from .platform_appearance_relation import PlatformAppearanceRelation, PlatformAppearanceRelationCreate
-from .platform_price_history import PlatformPriceHistory, PlatformPriceHistoryCreate, PlatformPriceHistoryPoint
+from .platform_latest_price import PlatformLatestPrice, AppearancePriceSpread
+from .platform_price_candle import PlatformPriceCandle
+from .platform_price_history import PlatformPriceHistory, PlatformPriceHistoryCreate, PlatformPriceHistoryPoint, \
+    PlatformPriceHistoryIngestResult, PlatformPriceHistoryExternalCreate, PlatformAppearanceReference, \
+    PlatformPriceHistoryIngestBatch, PlatformPriceHistoryRejection, PlatformPriceSeries, PlatformPriceSeriesPoint, \
+    PlatformPriceAsOfQuery, PlatformPriceAsOfPoint, PlatformPriceAsOf, PlatformPriceQuarantine, \
+    PlatformPriceHistoryBulkDelete, PlatformPriceHistoryDeleteJob
 from .token import Token, TokenRefreshRequest, UserWithToken
 from .user import User, UserCreate, UserLogin, UserPublic
 from .user_portfolio import UserPortfolioItem
@@ -19,6 +28,12 @@ __all__ = [
     "Appearance",
     "AppearanceCreate",
     "AppearanceUpdate",
+    "AppearanceMarketStats",
+    "AppearancePlatformLiquidity",
+    "AppearanceWithMarketStats",
+    "SimilarAppearance",
+    "AppearancePriceAnalytics",
+    "AppearancePriceAnalyticsPoint",
     "AppearanceAlias",
     "AppearanceAliasCreate",
     "AppearanceAliasUpdate",
@@ -36,6 +51,27 @@ __all__ = [
     "PlatformPriceHistory",
     "PlatformPriceHistoryCreate",
     "PlatformPriceHistoryPoint",
+    "PlatformPriceHistoryIngestResult",
+    "PlatformPriceHistoryExternalCreate",
+    "PlatformAppearanceReference",
+    "PlatformPriceHistoryIngestBatch",
+    "PlatformPriceHistoryRejection",
+    "PlatformPriceSeries",
+    "PlatformPriceSeriesPoint",
+    "PlatformPriceAsOfQuery",
+    "PlatformPriceAsOfPoint",
+    "PlatformPriceAsOf",
+    "PlatformPriceQuarantine",
+    "PlatformPriceHistoryBulkDelete",
+    "PlatformPriceHistoryDeleteJob",
+    "PlatformPriceCandle",
+    "PlatformLatestPrice",
+    "AppearancePriceSpread",
+
+    # Market index
+    "MarketIndex",
+    "MarketIndexLevel",
+    "MarketIndexHistory",
 
     # Token / Auth
     "Token",
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional, List
 
 from pydantic import BaseModel, ConfigDict
@@ -27,3 +28,47 @@ class Appearance(BaseModel):
     image_url: Optional[str] = None
     appearance_aliases: List[AppearanceAliasSimple] = None
     appearance_types: List[AppearanceType] = None
+
+
+class AppearanceMarketStats(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    current_price_cents: Optional[int] = None
+    listings_count: Optional[int] = None
+    change_24h: Optional[float] = None
+    change_7d: Optional[float] = None
+    min_price_30d_cents: Optional[int] = None
+    max_price_30d_cents: Optional[int] = None
+    lowest_price_cents: Optional[int] = None
+    highest_price_cents: Optional[int] = None
+    spread_cents: Optional[int] = None
+    margin_cents: Optional[int] = None
+    average_listings: Optional[float] = None
+    listings_trend: Optional[float] = None
+    turnover_rate: Optional[float] = None
+    updated_at: datetime
+
+
+class AppearancePlatformLiquidity(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    platform_id: int
+    average_listings: float
+    listings_trend: Optional[float] = None
+    delisted_listings: int
+    turnover_rate: Optional[float] = None
+    updated_at: datetime
+
+
+class AppearanceWithMarketStats(Appearance):
+    market_stats: Optional[AppearanceMarketStats] = None
+    platform_liquidity: List[AppearancePlatformLiquidity] = []
+
+
+class SimilarAppearance(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    rank: int
+    correlation: float
+    computed_at: datetime
+    similar_appearance: Appearance
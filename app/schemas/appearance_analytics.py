@@ -0,0 +1,30 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class AppearancePriceAnalyticsPoint(BaseModel):
+    day: datetime
+    close_price_cents: int
+    moving_average_short_cents: Optional[float] = None
+    moving_average_long_cents: Optional[float] = None
+    # 按年化的滚动波动率（日对数收益率标准差 × √365）
+    rolling_volatility: Optional[float] = None
+
+
+class AppearancePriceAnalytics(BaseModel):
+    appearance_id: int
+    platform_id: Optional[int] = None
+    window_days: int
+    short_ma_days: int
+    long_ma_days: int
+    volatility_days: int
+    observation_count: int
+    current_price_cents: Optional[int] = None
+    volatility: Optional[float] = None
+    max_drawdown: Optional[float] = None
+    moving_average_short_cents: Optional[float] = None
+    moving_average_long_cents: Optional[float] = None
+    z_score: Optional[float] = None
+    points: List[AppearancePriceAnalyticsPoint] = []
@@ -0,0 +1,26 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class MarketIndex(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    # 为空表示全市场指数
+    appearance_type_id: Optional[int] = None
+    weighting: str
+    level: float
+    constituent_count: int
+    updated_at: datetime
+
+
+class MarketIndexLevel(BaseModel):
+    bucket_start: datetime
+    level: float
+    constituent_count: int
+
+
+class MarketIndexHistory(MarketIndex):
+    levels: List[MarketIndexLevel] = []
@@ -1,10 +1,12 @@
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class PlatformBase(BaseModel):
     name: str
+    # 卖出手续费比例，例如 0.025 表示 2.5%
+    fee_rate: float = Field(0, ge=0, lt=1)
 
 
 class PlatformCreate(PlatformBase):
@@ -13,6 +15,7 @@ class PlatformCreate(PlatformBase):
 
 class PlatformUpdate(BaseModel):
     name: Optional[str] = None
+    fee_rate: Optional[float] = Field(None, ge=0, lt=1)
 
 
 class Platform(PlatformBase):
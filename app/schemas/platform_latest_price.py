@@ -0,0 +1,24 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class PlatformLatestPrice(BaseModel):
+    platform_id: int
+    lowest_price_cents: int
+    quantity_on_sale: Optional[int] = None
+    recorded_at: datetime
+    fee_rate: float
+    # 扣除平台手续费后卖家实得
+    net_price_cents: int
+
+
+class AppearancePriceSpread(BaseModel):
+    appearance_id: int
+    appearance_name: str
+    lowest_price_cents: int
+    highest_price_cents: int
+    spread_cents: int
+    margin_cents: Optional[int] = None
+    platform_prices: List[PlatformLatestPrice] = []
@@ -0,0 +1,18 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class PlatformPriceCandle(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    appearance_id: int
+    platform_id: int
+    bucket_start: datetime
+    open_price_cents: int
+    high_price_cents: int
+    low_price_cents: int
+    close_price_cents: int
+    min_quantity_on_sale: Optional[int] = None
+    close_quantity_on_sale: Optional[int] = None
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
@@ -18,6 +18,54 @@ class PlatformPriceHistoryCreate(PlatformPriceHistoryBase):
     pass
 
 
+class PlatformPriceHistoryExternalCreate(BaseModel):
+    """A price point identified by the platform's own item id instead of our appearance_id."""
+    platform_id: int
+    platform_appearance_id: str
+    lowest_price_cents: int
+    quantity_on_sale: Optional[int] = None
+    recorded_at: datetime
+
+
+class PlatformAppearanceReference(BaseModel):
+    platform_id: int
+    platform_appearance_id: str
+
+
+class PlatformPriceHistoryRejection(BaseModel):
+    # 被拒绝的点在请求列表中的下标
+    index: int
+    reason: str
+
+
+class PlatformPriceHistoryIngestResult(BaseModel):
+    accepted: int
+    inserted: int
+    updated: int
+    skipped: int
+    # change-only 模式下因与上一个点相同而未写入的点数
+    unchanged: int = 0
+    # 按平台商品 ID 入库时无法解析的商品，对应的点不会写入
+    unresolved: List[PlatformAppearanceReference] = []
+    # 被离群值过滤器隔离到 platform_price_quarantine 的点数
+    quarantined: int = 0
+    # 序列确认移动到新价位后，从隔离表放回并写入的之前被隔离的点数
+    released: int = 0
+    # 引用了不存在的饰品或平台的点，其余点照常写入
+    rejected: List[PlatformPriceHistoryRejection] = []
+
+
+class PlatformPriceHistoryIngestBatch(BaseModel):
+    batch_id: str
+    status: str
+    row_count: int
+    # 因引用不存在的饰品或平台而未写入的点数
+    rejected: int = 0
+    enqueued_at: datetime
+    processed_at: Optional[datetime] = None
+    error: Optional[str] = None
+
+
 class PlatformPriceHistory(PlatformPriceHistoryBase):
     model_config = ConfigDict(from_attributes=True)
 
@@ -31,3 +79,62 @@ class PlatformPriceHistoryPoint(BaseModel):
     lowest_price_cents: float
     quantity_on_sale: Optional[int] = None
     recorded_at: datetime
+
+
+class PlatformPriceSeriesPoint(BaseModel):
+    lowest_price_cents: int
+    quantity_on_sale: Optional[int] = None
+    recorded_at: datetime
+
+
+class PlatformPriceSeries(BaseModel):
+    appearance_id: int
+    platform_id: int
+    points: List[PlatformPriceSeriesPoint] = []
+
+
+class PlatformPriceAsOfQuery(BaseModel):
+    appearance_id: int
+    at: datetime
+
+
+class PlatformPriceAsOfPoint(BaseModel):
+    platform_id: int
+    lowest_price_cents: int
+    quantity_on_sale: Optional[int] = None
+    recorded_at: datetime
+
+
+class PlatformPriceAsOf(BaseModel):
+    appearance_id: int
+    at: datetime
+    # 各平台在该时刻生效价格中的最低价，没有任何平台有价格时为空
+    lowest_price_cents: Optional[int] = None
+    prices: List[PlatformPriceAsOfPoint] = []
+
+
+class PlatformPriceQuarantine(PlatformPriceHistoryBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    median_price_cents: int
+    deviation: float
+    quarantined_at: datetime
+
+
+class PlatformPriceHistoryBulkDelete(BaseModel):
+    start_date: datetime
+    end_date: datetime
+    platform_id: Optional[int] = None
+    appearance_id: Optional[int] = None
+
+
+class PlatformPriceHistoryDeleteJob(PlatformPriceHistoryBulkDelete):
+    job_id: str
+    status: str
+    # 已删除的点数，任务运行期间随每个分块更新
+    deleted: int = 0
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
@@ -1,8 +1,8 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, ConfigDict
 
-from .appearance import Appearance
+from .appearance import Appearance, AppearanceMarketStats, AppearancePlatformLiquidity
 from .platform_price_history import PlatformPriceHistoryPoint
 
 
@@ -17,3 +17,6 @@ class UserPortfolioItem(BaseModel):
     profit_loss: float
     profit_loss_percentage: float
     price_histories: List[PlatformPriceHistoryPoint] = []
+    # 平均挂单数与换手率反映持仓能否顺利卖出
+    market_stats: Optional[AppearanceMarketStats] = None
+    platform_liquidity: List[AppearancePlatformLiquidity] = []
@@ -0,0 +1,71 @@
+from typing import Tuple
+
+import numpy as np
+
+
+def carry_forward(closes: np.ndarray) -> np.ndarray:
+    """
+    Daily closes laid out one row per series and one column per day, with missing days (NaN) set to the
+    previous close, as a price stands until the next change. Days before the first close stay NaN.
+    """
+    observed = ~np.isnan(closes)
+    last_observed = np.where(observed, np.arange(closes.shape[-1]), 0)
+    np.maximum.accumulate(last_observed, axis=-1, out=last_observed)
+    filled = np.take_along_axis(closes, last_observed, axis=-1)
+    filled[~np.maximum.accumulate(observed, axis=-1)] = np.nan
+    return filled
+
+
+def daily_log_returns(closes: np.ndarray) -> np.ndarray:
+    """
+    Daily log returns of price series laid out one row per appearance and one column per day.
+
+    Missing days count as a zero return, see carry_forward; days before the first price stay NaN.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(carry_forward(closes)), axis=-1)
+
+
+def standardize_returns(returns: np.ndarray, min_observations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rows of ``returns`` centred and scaled to unit length, so the dot product of two rows is their correlation.
+
+    Missing returns become zero after centring, i.e. they do not contribute, which equals the Pearson
+    correlation for series observed on the same days. Returns the standardized float32 rows and the indices
+    of the rows kept: those with at least ``min_observations`` returns and any variation at all.
+    """
+    observed = ~np.isnan(returns)
+    observation_counts = observed.sum(axis=1)
+    means = np.nansum(returns, axis=1) / np.maximum(observation_counts, 1)
+    centred = np.where(observed, returns - means[:, None], 0.0)
+    norms = np.linalg.norm(centred, axis=1)
+    kept = np.flatnonzero((observation_counts >= min_observations) & (norms > 1e-12))
+    return (centred[kept] / norms[kept, None]).astype(np.float32), kept
+
+
+def top_k_similar(standardized: np.ndarray, k: int, block_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For every row, the ``k`` other rows with the highest correlation, in descending order.
+
+    The correlation matrix is computed one block of ``block_size`` rows at a time, so memory stays at
+    ``block_size`` x rows regardless of the number of series. Returns the neighbour indices and their
+    correlations, both of shape (rows, min(k, rows - 1)).
+    """
+    row_count = len(standardized)
+    k = min(k, row_count - 1)
+    neighbours = np.empty((row_count, max(k, 0)), dtype=np.intp)
+    scores = np.empty((row_count, max(k, 0)), dtype=np.float32)
+    if k <= 0:
+        return neighbours, scores
+
+    for start in range(0, row_count, block_size):
+        stop = min(start + block_size, row_count)
+        similarities = standardized[start:stop] @ standardized.T
+        # 排除自身
+        similarities[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+        candidates = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(similarities, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1, kind="stable")
+        neighbours[start:stop] = np.take_along_axis(candidates, order, axis=1)
+        scores[start:stop] = np.take_along_axis(candidate_scores, order, axis=1)
+    return neighbours, scores
@@ -0,0 +1,68 @@
+import logging
+import threading
+import time
+from typing import Iterable, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_appearance, crud_platform
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogIdCache:
+    """
+    Per-process sets of existing appearance and platform ids, used to reject price points with dangling
+    references before they reach the foreign key constraints.
+
+    Like PlatformAppearanceResolver, the sets are reloaded once older than ``refresh_seconds`` and early on
+    unknown ids, rate limited by ``miss_refresh_seconds``.
+    """
+
+    def __init__(self, refresh_seconds: int, miss_refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        self._appearance_ids: Set[int] = set()
+        self._platform_ids: Set[int] = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _reload(self, db: Session) -> None:
+        self._appearance_ids = crud_appearance.get_appearance_ids(db)
+        self._platform_ids = crud_platform.get_platform_ids(db)
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(self._appearance_ids)} appearance ids and {len(self._platform_ids)} platform ids")
+
+    def _age(self) -> float:
+        return float("inf") if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def unknown_ids(
+            self,
+            db: Session,
+            appearance_ids: Iterable[int],
+            platform_ids: Iterable[int]
+    ) -> Tuple[Set[int], Set[int]]:
+        """The appearance ids and platform ids that do not exist."""
+        appearance_ids, platform_ids = set(appearance_ids), set(platform_ids)
+        with self._lock:
+            if self._age() >= self.refresh_seconds:
+                self._reload(db)
+            elif (
+                    not (appearance_ids <= self._appearance_ids and platform_ids <= self._platform_ids)
+                    and self._age() >= self.miss_refresh_seconds
+            ):
+                self._reload(db)
+            known_appearance_ids, known_platform_ids = self._appearance_ids, self._platform_ids
+
+        return appearance_ids - known_appearance_ids, platform_ids - known_platform_ids
+
+
+catalog_id_cache = CatalogIdCache(
+    refresh_seconds=settings.CATALOG_ID_REFRESH_SECONDS,
+    miss_refresh_seconds=settings.CATALOG_ID_MISS_REFRESH_SECONDS
+)
@@ -0,0 +1,61 @@
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.crud import crud_platform_appearance_relation
+
+logger = logging.getLogger(__name__)
+
+PlatformAppearanceKey = Tuple[int, str]
+
+
+class PlatformAppearanceResolver:
+    """
+    Per-process map of (platform_id, platform_appearance_id) to appearance_id, loaded from
+    platform_appearance_relations.
+
+    The whole map is reloaded once it is older than ``refresh_seconds``. Unknown keys trigger an early
+    reload, rate limited by ``miss_refresh_seconds``, so newly added relations are picked up quickly
+    without a batch full of bogus ids reloading the table on every request.
+    """
+
+    def __init__(self, refresh_seconds: int, miss_refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self.miss_refresh_seconds = miss_refresh_seconds
+        self._map: Dict[PlatformAppearanceKey, int] = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _reload(self, db: Session) -> None:
+        self._map = crud_platform_appearance_relation.get_platform_appearance_map(db)
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {len(self._map)} platform appearance relations")
+
+    def _age(self) -> float:
+        return float("inf") if self._loaded_at is None else time.monotonic() - self._loaded_at
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def resolve(self, db: Session, keys: Iterable[PlatformAppearanceKey]) -> Dict[PlatformAppearanceKey, int]:
+        """appearance_id of every resolvable key; unknown keys are left out."""
+        keys = set(keys)
+        with self._lock:
+            if self._age() >= self.refresh_seconds:
+                self._reload(db)
+            elif not keys <= self._map.keys() and self._age() >= self.miss_refresh_seconds:
+                self._reload(db)
+            relation_map = self._map
+
+        return {key: relation_map[key] for key in keys if key in relation_map}
+
+
+platform_appearance_resolver = PlatformAppearanceResolver(
+    refresh_seconds=settings.PLATFORM_APPEARANCE_REFRESH_SECONDS,
+    miss_refresh_seconds=settings.PLATFORM_APPEARANCE_MISS_REFRESH_SECONDS
+)
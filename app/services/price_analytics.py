@@ -0,0 +1,41 @@
+from typing import Optional
+
+import numpy as np
+
+# 市场每天都在交易，年化按 365 天计
+TRADING_DAYS_PER_YEAR = 365
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over ``window`` values; NaN until a full window is available."""
+    result = np.full(len(values), np.nan)
+    if len(values) >= window:
+        sums = np.cumsum(np.insert(values, 0, 0.0))
+        result[window - 1:] = (sums[window:] - sums[:-window]) / window
+    return result
+
+
+def rolling_std(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing sample standard deviation over ``window`` values; NaN until a full window is available."""
+    result = np.full(len(values), np.nan)
+    if window >= 2 and len(values) >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window)
+        result[window - 1:] = windows.std(axis=1, ddof=1)
+    return result
+
+
+def max_drawdown(prices: np.ndarray) -> float:
+    """Largest fall from a running peak, as a non-positive fraction of the peak."""
+    if not len(prices):
+        return 0.0
+    return float(np.min(prices / np.maximum.accumulate(prices) - 1))
+
+
+def z_score(value: float, sample: np.ndarray) -> Optional[float]:
+    """Distance of ``value`` from the mean of ``sample`` in sample standard deviations, None for a flat sample."""
+    if len(sample) < 2:
+        return None
+    spread = sample.std(ddof=1)
+    if spread == 0:
+        return None
+    return float((value - sample.mean()) / spread)
@@ -0,0 +1,66 @@
+import numpy as np
+
+# LTTB 需要保留首尾两点，中间至少一个桶
+MIN_POINTS = 3
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets downsampling of one series sorted by ``x``.
+
+    The first and last points are always kept; the points in between are split into ``max_points - 2``
+    buckets, and from each bucket the point forming the largest triangle with the previously kept point and
+    the average of the next bucket is kept.
+    """
+    point_count = len(x)
+    if point_count <= max_points:
+        return np.arange(point_count)
+    if max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+
+    x = x.astype(np.float64)
+    y = y.astype(np.float64)
+    edges = np.linspace(1, point_count - 1, max_points - 1).astype(np.intp)
+    bucket_sizes = np.diff(edges)
+
+    # 每个桶的“下一个桶均值”，最后一个桶的下一个点就是终点
+    next_x = np.append((np.add.reduceat(x[1:-1], edges[:-1] - 1) / bucket_sizes)[1:], x[-1])
+    next_y = np.append((np.add.reduceat(y[1:-1], edges[:-1] - 1) / bucket_sizes)[1:], y[-1])
+
+    kept = np.empty(max_points, dtype=np.intp)
+    kept[0], kept[-1] = 0, point_count - 1
+    previous = 0
+    for bucket in range(max_points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[previous] - next_x[bucket]) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y[bucket] - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def downsample_series(series_keys: np.ndarray, x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indices (ascending) of the points kept when every series is downsampled to ``max_points`` on its own.
+
+    ``series_keys`` identifies the series of each point, either one id per point or one row of ids per point,
+    e.g. (appearance_id, platform_id). Points need not be sorted.
+    """
+    if len(x) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    series_keys = np.asarray(series_keys).reshape(len(x), -1)
+    # lexsort 以最后一个键为主键：先按序列，再按 x 排序
+    order = np.lexsort((x, *series_keys.T[::-1]))
+    sorted_keys = series_keys[order]
+    boundaries = np.flatnonzero(np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)) + 1
+    starts = np.concatenate(([0], boundaries))
+    stops = np.concatenate((boundaries, [len(order)]))
+
+    kept = [
+        order[start:stop][lttb_indices(x[order[start:stop]], y[order[start:stop]], max_points)]
+        for start, stop in zip(starts, stops)
+    ]
+    return np.sort(np.concatenate(kept))
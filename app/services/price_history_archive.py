@@ -0,0 +1,129 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from app.core.config import settings
+
+ARCHIVE_COLUMNS = ["id", "appearance_id", "platform_id", "lowest_price_cents", "quantity_on_sale", "recorded_at"]
+
+ARCHIVE_SCHEMA = pa.schema([
+    ("id", pa.int64()),
+    ("appearance_id", pa.int64()),
+    ("platform_id", pa.int32()),
+    ("lowest_price_cents", pa.int64()),
+    ("quantity_on_sale", pa.int32()),
+    ("recorded_at", pa.timestamp("us", tz="UTC")),
+])
+
+# 行组不宜过大，按 appearance_id 查询时可以借助行组统计信息跳过无关数据
+_ROW_GROUP_SIZE = 64 * 1024
+
+
+def archive_path(month: date, platform_id: int, part: int) -> str:
+    """Hive style layout: <archive dir>/month=YYYY-MM/platform_id=<id>/part-<n>.parquet"""
+    return os.path.join(
+        settings.PRICE_HISTORY_ARCHIVE_DIR,
+        f"month={month:%Y-%m}",
+        f"platform_id={platform_id}",
+        f"part-{part}.parquet"
+    )
+
+
+def write_archive_file(path: str, batches: Iterable[Sequence[Sequence]]) -> int:
+    """
+    Write row batches (tuples in ARCHIVE_COLUMNS order) to a zstd compressed Parquet file.
+
+    The file is written under a temporary name and renamed once complete, so a crash never leaves a
+    truncated archive behind. Returns the number of rows written.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary_path = f"{path}.tmp"
+    row_count = 0
+    with pq.ParquetWriter(temporary_path, ARCHIVE_SCHEMA, compression="zstd") as writer:
+        for batch in batches:
+            columns = list(zip(*batch))
+            writer.write_table(
+                pa.Table.from_arrays(
+                    [pa.array(column, type=field.type) for column, field in zip(columns, ARCHIVE_SCHEMA)],
+                    schema=ARCHIVE_SCHEMA
+                ),
+                row_group_size=_ROW_GROUP_SIZE
+            )
+            row_count += len(batch)
+    os.replace(temporary_path, path)
+    return row_count
+
+
+def _utc(value: datetime) -> datetime:
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _with_carried_forward_points(table: pa.Table, start_date: datetime) -> pa.Table:
+    """Points from ``start_date`` on, plus the last point before it of every (appearance, platform)."""
+    is_before = pc.less(table["recorded_at"], pa.scalar(start_date, type=ARCHIVE_SCHEMA.field("recorded_at").type))
+    points_before = table.filter(is_before)
+    points_from = table.filter(pc.invert(is_before))
+    if points_before.num_rows == 0:
+        return points_from
+
+    last_before = points_before.group_by(["appearance_id", "platform_id"]).aggregate([("recorded_at", "max")])
+    last_before = pa.table({
+        "appearance_id": last_before["appearance_id"],
+        "platform_id": last_before["platform_id"],
+        "recorded_at": last_before["recorded_at_max"],
+    })
+    carried_forward = points_before.join(last_before, keys=["appearance_id", "platform_id", "recorded_at"])
+    return pa.concat_tables([points_from, carried_forward.select(points_from.column_names)])
+
+
+def read_archived_rows(
+        paths: List[str],
+        appearance_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        descending: bool = False,
+        carry_forward: Optional[timedelta] = None,
+        appearance_ids: Optional[List[int]] = None,
+        platform_id: Optional[int] = None
+) -> pa.Table:
+    """
+    Matching archived points of ``paths`` as one table sorted by recorded_at (then id).
+
+    The filters are pushed down into the Parquet reader, so row groups whose statistics exclude them are
+    skipped without being decoded. With ``carry_forward`` the last point of each series within that interval
+    before ``start_date`` is included too, like the carried forward point of the Postgres readers.
+    """
+    filters = []
+    if platform_id:
+        filters.append(("platform_id", "=", platform_id))
+    if appearance_id:
+        filters.append(("appearance_id", "=", appearance_id))
+    if appearance_ids:
+        filters.append(("appearance_id", "in", appearance_ids))
+    if start_date:
+        lower_bound = _utc(start_date) - carry_forward if carry_forward else _utc(start_date)
+        filters.append(("recorded_at", ">=", lower_bound))
+    if end_date:
+        filters.append(("recorded_at", "<=", _utc(end_date)))
+
+    tables = [pq.read_table(path, filters=filters or None, schema=ARCHIVE_SCHEMA) for path in paths]
+    if not tables:
+        return ARCHIVE_SCHEMA.empty_table()
+
+    table = pa.concat_tables(tables)
+    if start_date and carry_forward:
+        table = _with_carried_forward_points(table, _utc(start_date))
+
+    order = "descending" if descending else "ascending"
+    return table.sort_by([("recorded_at", order), ("id", order)])
+
+
+def iter_archived_rows(table: pa.Table, columns: List[str], batch_size: int = 10000) -> Iterator[tuple]:
+    """Rows of ``table`` as tuples of ``columns``, converted batch by batch."""
+    for batch in table.select(columns).to_batches(max_chunksize=batch_size):
+        yield from zip(*[batch.column(name).to_pylist() for name in columns])
+
@@ -0,0 +1,110 @@
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import app.schemas as schemas
+from app.core.config import settings
+from app.crud import crud_platform_price_history, crud_platform_price_history_archive
+from app.db.database import SessionLocal
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def _status_key(job_id: str) -> str:
+    return f"price_history_delete_job:{job_id}"
+
+
+def _set_status(job_id: str, **fields) -> None:
+    key = _status_key(job_id)
+    pipeline = redis_client.pipeline()
+    pipeline.hset(key, mapping={name: value for name, value in fields.items() if value is not None})
+    pipeline.expire(key, settings.PRICE_HISTORY_DELETE_STATUS_TTL_HOURS * 3600)
+    pipeline.execute()
+
+
+def _now() -> str:
+    return datetime.now(tz=timezone.utc).isoformat()
+
+
+def create_job(delete_filter: schemas.PlatformPriceHistoryBulkDelete) -> schemas.PlatformPriceHistoryDeleteJob:
+    job_id = uuid.uuid4().hex
+    job = schemas.PlatformPriceHistoryDeleteJob(
+        job_id=job_id,
+        status=JOB_QUEUED,
+        created_at=datetime.now(tz=timezone.utc),
+        **delete_filter.model_dump()
+    )
+    _set_status(job_id, **job.model_dump(mode="json", exclude={"job_id"}))
+    return job
+
+
+def get_job(job_id: str) -> Optional[schemas.PlatformPriceHistoryDeleteJob]:
+    fields = {key.decode(): value.decode() for key, value in redis_client.hgetall(_status_key(job_id)).items()}
+    if not fields:
+        return None
+    return schemas.PlatformPriceHistoryDeleteJob(job_id=job_id, **fields)
+
+
+def reaches_archived_months(delete_filter: schemas.PlatformPriceHistoryBulkDelete) -> bool:
+    """Whether the range overlaps archived months, whose points live in Parquet files the jobs do not rewrite."""
+    db = SessionLocal()
+    try:
+        return bool(crud_platform_price_history_archive.get_overlapping_archives(
+            db,
+            platform_id=delete_filter.platform_id,
+            start_date=delete_filter.start_date,
+            end_date=delete_filter.end_date
+        ))
+    finally:
+        db.close()
+
+
+def run_job(
+        job_id: str,
+        delete_filter: schemas.PlatformPriceHistoryBulkDelete,
+        chunk_size: int = settings.PRICE_HISTORY_DELETE_CHUNK_SIZE,
+        pause_seconds: float = settings.PRICE_HISTORY_DELETE_PAUSE_SECONDS
+) -> int:
+    """
+    Delete the matching points chunk by chunk, one short transaction each, recording progress after every chunk.
+
+    Pausing between chunks keeps replicas and concurrent ingest from falling behind. Archived months are not
+    touched, see ``reaches_archived_months``. Returns the number of deleted points; any error marks the job
+    failed, as it runs where nobody would see the exception.
+    """
+    _set_status(job_id, status=JOB_RUNNING, started_at=_now())
+    deleted_count = 0
+    db = SessionLocal()
+    try:
+        while True:
+            chunk_count, _ = crud_platform_price_history.delete_platform_price_history_chunk(
+                db,
+                chunk_size=chunk_size,
+                **delete_filter.model_dump()
+            )
+            if not chunk_count:
+                break
+            deleted_count += chunk_count
+            _set_status(job_id, deleted=deleted_count)
+            logger.info(f"Price history delete job {job_id} deleted {deleted_count} points so far")
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    except Exception as e:
+        db.rollback()
+        logger.exception(f"Price history delete job {job_id} failed after deleting {deleted_count} points")
+        _set_status(job_id, status=JOB_FAILED, deleted=deleted_count, finished_at=_now(), error=str(getattr(e, "orig", e)))
+        return deleted_count
+    finally:
+        db.close()
+
+    _set_status(job_id, status=JOB_DONE, deleted=deleted_count, finished_at=_now())
+    logger.info(f"Price history delete job {job_id} finished, deleted {deleted_count} points")
+    return deleted_count
@@ -0,0 +1,200 @@
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from pydantic import TypeAdapter
+from redis import ResponseError
+
+import app.schemas as schemas
+from app.core.config import settings
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+CONSUMER_GROUP = "price_history_ingest_workers"
+
+BATCH_QUEUED = "queued"
+BATCH_PROCESSING = "processing"
+BATCH_DONE = "done"
+BATCH_FAILED = "failed"
+
+_histories_adapter = TypeAdapter(List[schemas.PlatformPriceHistoryCreate])
+
+
+def _status_key(batch_id: str) -> str:
+    return f"price_history_ingest_batch:{batch_id}"
+
+
+def _decode(mapping: dict) -> dict:
+    return {
+        (key.decode() if isinstance(key, bytes) else key): (value.decode() if isinstance(value, bytes) else value)
+        for key, value in mapping.items()
+    }
+
+
+def _set_status(batch_id: str, **fields) -> None:
+    key = _status_key(batch_id)
+    pipeline = redis_client.pipeline()
+    pipeline.hset(key, mapping={name: value for name, value in fields.items() if value is not None})
+    pipeline.expire(key, settings.PRICE_HISTORY_INGEST_STATUS_TTL_HOURS * 3600)
+    pipeline.execute()
+
+
+@dataclass
+class QueuedBatch:
+    message_id: str
+    batch_id: str
+    on_conflict: str
+    changes_only: bool
+    histories: List[schemas.PlatformPriceHistoryCreate]
+
+
+def enqueue_batch(
+        histories: List[schemas.PlatformPriceHistoryCreate],
+        on_conflict: str,
+        changes_only: bool
+) -> schemas.PlatformPriceHistoryIngestBatch:
+    """Append an already validated batch to the ingest stream and record it as queued."""
+    batch_id = uuid.uuid4().hex
+    enqueued_at = datetime.now(tz=timezone.utc)
+    _set_status(
+        batch_id,
+        status=BATCH_QUEUED,
+        row_count=len(histories),
+        enqueued_at=enqueued_at.isoformat()
+    )
+    redis_client.xadd(
+        settings.PRICE_HISTORY_INGEST_STREAM,
+        {
+            "batch_id": batch_id,
+            "on_conflict": on_conflict,
+            "changes_only": int(changes_only),
+            "histories": _histories_adapter.dump_json(histories),
+        }
+    )
+    return schemas.PlatformPriceHistoryIngestBatch(
+        batch_id=batch_id,
+        status=BATCH_QUEUED,
+        row_count=len(histories),
+        enqueued_at=enqueued_at
+    )
+
+
+def get_batch_status(batch_id: str) -> Optional[schemas.PlatformPriceHistoryIngestBatch]:
+    fields = _decode(redis_client.hgetall(_status_key(batch_id)))
+    if not fields:
+        return None
+    return schemas.PlatformPriceHistoryIngestBatch(batch_id=batch_id, **fields)
+
+
+def mark_batch(batch: QueuedBatch, status: str, error: Optional[str] = None, rejected: Optional[int] = None) -> None:
+    processed_at = datetime.now(tz=timezone.utc).isoformat() if status in (BATCH_DONE, BATCH_FAILED) else None
+    _set_status(batch.batch_id, status=status, processed_at=processed_at, error=error, rejected=rejected)
+
+
+def mark_batches(batches: List[QueuedBatch], status: str, error: Optional[str] = None) -> None:
+    for batch in batches:
+        mark_batch(batch, status, error=error)
+
+
+def ensure_consumer_group() -> None:
+    try:
+        redis_client.xgroup_create(settings.PRICE_HISTORY_INGEST_STREAM, CONSUMER_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def _to_batch(message_id, fields: dict) -> QueuedBatch:
+    fields = _decode(fields)
+    return QueuedBatch(
+        message_id=message_id.decode() if isinstance(message_id, bytes) else message_id,
+        batch_id=fields["batch_id"],
+        on_conflict=fields["on_conflict"],
+        changes_only=fields["changes_only"] == "1",
+        histories=_histories_adapter.validate_json(fields["histories"]),
+    )
+
+
+def _dead_letter(message_id, fields: dict, reason: str) -> None:
+    """Move a message to the dead-letter stream, acknowledge it and mark its batch failed."""
+    fields = _decode(fields)
+    logger.error(f"Moving price history ingest message {message_id} to the dead-letter stream: {reason}")
+    pipeline = redis_client.pipeline()
+    pipeline.xadd(settings.PRICE_HISTORY_INGEST_DEAD_LETTER_STREAM, {**fields, "error": reason})
+    pipeline.xack(settings.PRICE_HISTORY_INGEST_STREAM, CONSUMER_GROUP, message_id)
+    pipeline.xdel(settings.PRICE_HISTORY_INGEST_STREAM, message_id)
+    pipeline.execute()
+    if "batch_id" in fields:
+        _set_status(
+            fields["batch_id"],
+            status=BATCH_FAILED,
+            processed_at=datetime.now(tz=timezone.utc).isoformat(),
+            error=reason
+        )
+
+
+def _delivery_counts(message_ids: list) -> List[int]:
+    pipeline = redis_client.pipeline()
+    for message_id in message_ids:
+        pipeline.xpending_range(
+            settings.PRICE_HISTORY_INGEST_STREAM, CONSUMER_GROUP, min=message_id, max=message_id, count=1
+        )
+    return [pending[0]["times_delivered"] if pending else 0 for pending in pipeline.execute()]
+
+
+def read_batches(consumer: str, count: int, block_ms: int) -> List[QueuedBatch]:
+    """
+    Next batches for ``consumer``; batches left unacknowledged by a crashed worker are claimed first.
+
+    Claimed batches already delivered PRICE_HISTORY_INGEST_MAX_DELIVERIES times, and messages that cannot be
+    decoded, are dead-lettered instead of returned, so a poison message cannot stall the workers.
+    """
+    _, claimed, *_ = redis_client.xautoclaim(
+        settings.PRICE_HISTORY_INGEST_STREAM,
+        CONSUMER_GROUP,
+        consumer,
+        min_idle_time=settings.PRICE_HISTORY_INGEST_CLAIM_IDLE_SECONDS * 1000,
+        count=count
+    )
+    messages = [message for message in claimed if message[1]]
+    if messages:
+        # XAUTOCLAIM 计入本次投递，次数超过上限说明该批次反复导致 worker 崩溃
+        delivery_counts = _delivery_counts([message_id for message_id, _ in messages])
+        retried_messages = []
+        for (message_id, fields), delivery_count in zip(messages, delivery_counts):
+            if delivery_count > settings.PRICE_HISTORY_INGEST_MAX_DELIVERIES:
+                _dead_letter(message_id, fields, f"Delivered {delivery_count} times without completing")
+            else:
+                retried_messages.append((message_id, fields))
+        messages = retried_messages
+    if not messages:
+        response = redis_client.xreadgroup(
+            CONSUMER_GROUP,
+            consumer,
+            {settings.PRICE_HISTORY_INGEST_STREAM: ">"},
+            count=count,
+            block=block_ms
+        )
+        messages = [message for _, stream_messages in response or [] for message in stream_messages]
+
+    batches = []
+    for message_id, fields in messages:
+        try:
+            batches.append(_to_batch(message_id, fields))
+        except Exception as e:
+            _dead_letter(message_id, fields, f"Undecodable message: {e}")
+    return batches
+
+
+def acknowledge(batches: List[QueuedBatch]) -> None:
+    message_ids = [batch.message_id for batch in batches]
+    if not message_ids:
+        return
+    pipeline = redis_client.pipeline()
+    pipeline.xack(settings.PRICE_HISTORY_INGEST_STREAM, CONSUMER_GROUP, *message_ids)
+    # 已处理的消息直接删除，避免流无限增长
+    pipeline.xdel(settings.PRICE_HISTORY_INGEST_STREAM, *message_ids)
+    pipeline.execute()
@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Iterator, List, Optional, Sequence
+
+import anyio.from_thread
+
+PRICE_HISTORY_STREAM_COLUMNS = ["appearance_id", "platform_id", "lowest_price_cents", "quantity_on_sale", "recorded_at"]
+_REQUIRED_COLUMNS = {"appearance_id", "platform_id", "lowest_price_cents", "recorded_at"}
+
+CSV_FORMAT = "csv"
+NDJSON_FORMAT = "ndjson"
+
+_FORMAT_MEDIA_TYPES = {
+    CSV_FORMAT: "text/csv",
+    NDJSON_FORMAT: "application/x-ndjson",
+}
+
+_CONTENT_TYPE_FORMATS = {
+    "text/csv": CSV_FORMAT,
+    "application/x-ndjson": NDJSON_FORMAT,
+    "application/ndjson": NDJSON_FORMAT,
+}
+
+# 每次解压最多产出的字节数，压缩比极高的请求体也只会一块一块地展开
+_MAX_DECOMPRESSED_CHUNK = 1024 * 1024
+
+
+def resolve_stream_format(content_type: Optional[str]) -> Optional[str]:
+    if not content_type:
+        return None
+    return _CONTENT_TYPE_FORMATS.get(content_type.split(";")[0].strip().lower())
+
+
+def media_type_for_format(stream_format: str) -> str:
+    return _FORMAT_MEDIA_TYPES[stream_format]
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def encode_price_history_export(
+        rows: Iterable[Sequence],
+        stream_format: str,
+        rows_per_chunk: int = 1000
+) -> Iterator[bytes]:
+    """
+    Encode rows of PRICE_HISTORY_STREAM_COLUMNS as CSV (with header) or NDJSON, in chunks of ``rows_per_chunk``.
+
+    The output is accepted as-is by the streaming ingest endpoint.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    if stream_format == CSV_FORMAT:
+        writer.writerow(PRICE_HISTORY_STREAM_COLUMNS)
+
+    pending_rows = 0
+    for row in rows:
+        values = [_export_value(value) for value in row]
+        if stream_format == NDJSON_FORMAT:
+            buffer.write(json.dumps(dict(zip(PRICE_HISTORY_STREAM_COLUMNS, values))))
+            buffer.write("\n")
+        else:
+            writer.writerow(values)
+
+        pending_rows += 1
+        if pending_rows >= rows_per_chunk:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+            pending_rows = 0
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class PriceHistoryStreamReader:
+    """
+    File-like adapter between an async request body and psycopg2's ``copy_expert``.
+
+    ``read`` is called from a worker thread and pulls the next body chunk from the event loop, so the
+    body is never held in memory as a whole. Gzip is decoded on the fly and NDJSON lines are converted
+    to CSV rows. The first CSV line must be a header naming the columns.
+
+    psycopg2 reports an exception raised inside ``read`` only as a cancelled COPY, so the original
+    error is kept in ``error`` for the caller to report.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes], stream_format: str, gzipped: bool = False):
+        self._chunks = chunks
+        self._stream_format = stream_format
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16) if gzipped else None
+        self._pending = b""
+        self._output = bytearray()
+        self._exhausted = False
+        self.columns: List[str] = []
+        self.error: Optional[Exception] = None
+
+    def _next_raw_chunk(self) -> Optional[bytes]:
+        if self._decompressor is not None and self._decompressor.unconsumed_tail:
+            # 上一块还没有解压完，先把剩下的部分展开
+            return self._decompressor.decompress(self._decompressor.unconsumed_tail, _MAX_DECOMPRESSED_CHUNK)
+        try:
+            chunk = anyio.from_thread.run(self._chunks.__anext__)
+        except StopAsyncIteration:
+            return None
+        if self._decompressor is not None:
+            chunk = self._decompressor.decompress(chunk, _MAX_DECOMPRESSED_CHUNK)
+        return chunk
+
+    def _next_line(self) -> Optional[bytes]:
+        while b"\n" not in self._pending:
+            chunk = self._next_raw_chunk()
+            if chunk is None:
+                if self._decompressor is not None:
+                    self._pending += self._decompressor.flush()
+                line, self._pending = self._pending, b""
+                return line or None
+            self._pending += chunk
+        line, self._pending = self._pending.split(b"\n", 1)
+        return line + b"\n"
+
+    def read_header(self) -> List[str]:
+        """Determine the column order of the stream; must be called before handing the reader to COPY."""
+        if self._stream_format == NDJSON_FORMAT:
+            self.columns = list(PRICE_HISTORY_STREAM_COLUMNS)
+            return self.columns
+
+        header = self._next_line()
+        if header is None:
+            raise ValueError("Empty price history stream")
+        columns = [column.strip() for column in header.decode("utf-8-sig").strip().split(",")]
+        unknown_columns = set(columns) - set(PRICE_HISTORY_STREAM_COLUMNS)
+        missing_columns = _REQUIRED_COLUMNS - set(columns)
+        if unknown_columns or missing_columns:
+            raise ValueError(f"Invalid CSV header, unknown: {unknown_columns}, missing: {missing_columns}")
+        self.columns = columns
+        return self.columns
+
+    def _ndjson_line_to_csv(self, line: bytes) -> bytes:
+        if not line.strip():
+            return b""
+        record = json.loads(line)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(
+            ["" if record.get(column) is None else record[column] for column in PRICE_HISTORY_STREAM_COLUMNS]
+        )
+        return buffer.getvalue().encode("utf-8")
+
+    def _fill(self, size: int) -> None:
+        while not self._exhausted and len(self._output) < size:
+            if self._stream_format == NDJSON_FORMAT:
+                line = self._next_line()
+                if line is None:
+                    self._exhausted = True
+                    break
+                self._output += self._ndjson_line_to_csv(line)
+            else:
+                if self._pending:
+                    self._output += self._pending
+                    self._pending = b""
+                    continue
+                chunk = self._next_raw_chunk()
+                if chunk is None:
+                    if self._decompressor is not None:
+                        self._output += self._decompressor.flush()
+                    self._exhausted = True
+                    break
+                self._output += chunk
+
+    def read(self, size: int = 8192) -> bytes:
+        try:
+            self._fill(size)
+        except (ValueError, zlib.error) as e:
+            # JSON 解析错误与 UnicodeDecodeError 都是 ValueError
+            self.error = e
+            raise
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        return data
@@ -0,0 +1,209 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import Session
+
+import app.models as models
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SeriesKey = Tuple[int, int]
+
+# 正态分布下 MAD 与标准差的换算系数
+_MAD_SCALE = 1.4826
+
+
+def _log_prices(prices: Sequence[int]) -> np.ndarray:
+    return np.log(np.maximum(np.asarray(prices, dtype=np.float64), 1))
+
+
+@dataclass
+class OutlierCheck:
+    """Per incoming point: whether it is an outlier, the reference median and its robust z-score."""
+    is_outlier: np.ndarray
+    medians: np.ndarray
+    deviations: np.ndarray
+
+
+class PriceOutlierFilter:
+    """
+    Flags incoming prices far from the recent prices of their (appearance, platform) series.
+
+    Each point is scored as the distance of its log price from the median log price of the last ``window``
+    points of its series, in units of the scaled median absolute deviation (MAD). The scale never drops
+    below ``min_spread`` so a flat series does not flag ordinary price moves. Series with fewer than
+    ``min_points`` points are not judged.
+
+    A window ending in ``rebase_points`` points that agree with each other but would all be flagged against
+    the points before them restarts from those points, so a genuine move to a new price level is followed
+    once enough of its points have been stored, see is_level_shift.
+
+    The reference windows are kept per process in an LRU of at most ``max_series`` series; missing ones
+    are loaded with a single query per batch and accepted points are rolled in after each ingest.
+    """
+
+    def __init__(
+            self,
+            threshold: float,
+            window: int,
+            min_points: int,
+            min_spread: float,
+            max_series: int,
+            rebase_points: int = 0
+    ):
+        self.threshold = threshold
+        self.window = window
+        self.min_points = min_points
+        self.min_spread = min_spread
+        self.max_series = max_series
+        self.rebase_points = rebase_points
+        self._windows: "OrderedDict[SeriesKey, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold > 0
+
+    def _median_and_scale(self, log_prices: np.ndarray) -> Tuple[float, float]:
+        median = float(np.median(log_prices))
+        return median, max(float(np.median(np.abs(log_prices - median))) * _MAD_SCALE, self.min_spread)
+
+    def _agree(self, log_prices: np.ndarray) -> bool:
+        # 以最小离散度为尺度，不能用这些点自身的 MAD，否则分散的点会把尺度撑大而互相认可
+        return bool((np.abs(log_prices - np.median(log_prices)) / self.min_spread <= self.threshold).all())
+
+    def is_level_shift(self, prices: Sequence[int]) -> bool:
+        """Whether consecutive quarantined ``prices`` of one series are enough consistent points to be a new level."""
+        if not self.rebase_points or len(prices) < self.rebase_points:
+            return False
+        return self._agree(_log_prices(prices))
+
+    def _rebase(self, log_prices: np.ndarray) -> np.ndarray:
+        """Restart the window from its trailing ``rebase_points`` points when they form a new price level."""
+        if not self.rebase_points or len(log_prices) <= self.rebase_points:
+            return log_prices
+        head, tail = log_prices[:-self.rebase_points], log_prices[-self.rebase_points:]
+        head_median, head_scale = self._median_and_scale(head)
+        if np.abs(tail - head_median).min() / head_scale > self.threshold and self._agree(tail):
+            return tail
+        return log_prices
+
+    def _load(self, db: Session, keys: List[SeriesKey]) -> Dict[SeriesKey, np.ndarray]:
+        history = models.PlatformPriceHistory
+        recorded_after = datetime.now(tz=timezone.utc) - timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+        ranked = (
+            select(
+                history.appearance_id,
+                history.platform_id,
+                history.lowest_price_cents,
+                history.recorded_at,
+                func.row_number().over(
+                    partition_by=(history.appearance_id, history.platform_id),
+                    order_by=history.recorded_at.desc()
+                ).label("rn")
+            )
+            .where(
+                tuple_(history.appearance_id, history.platform_id).in_(keys),
+                history.recorded_at >= recorded_after
+            )
+            .subquery()
+        )
+        rows = db.execute(
+            select(ranked.c.appearance_id, ranked.c.platform_id, ranked.c.lowest_price_cents)
+            .where(ranked.c.rn <= self.window)
+            .order_by(ranked.c.appearance_id, ranked.c.platform_id, ranked.c.recorded_at)
+        ).all()
+
+        prices_map = {key: [] for key in keys}
+        for appearance_id, platform_id, lowest_price_cents in rows:
+            prices_map[(appearance_id, platform_id)].append(lowest_price_cents)
+        return {key: self._rebase(_log_prices(prices)[-self.window:]) for key, prices in prices_map.items()}
+
+    def _store(self, key: SeriesKey, log_prices: np.ndarray) -> None:
+        self._windows[key] = self._rebase(log_prices[-self.window:])
+        self._windows.move_to_end(key)
+        while len(self._windows) > self.max_series:
+            self._windows.popitem(last=False)
+
+    def _get_windows(self, db: Session, keys: List[SeriesKey]) -> List[np.ndarray]:
+        with self._lock:
+            windows = {key: self._windows[key] for key in keys if key in self._windows}
+        missing = [key for key in keys if key not in windows]
+        if missing:
+            loaded = self._load(db, missing)
+            with self._lock:
+                for key, log_prices in loaded.items():
+                    self._store(key, log_prices)
+            windows.update(loaded)
+        return [windows[key] for key in keys]
+
+    def check(
+            self,
+            db: Session,
+            appearance_ids: np.ndarray,
+            platform_ids: np.ndarray,
+            prices: np.ndarray
+    ) -> OutlierCheck:
+        """Score incoming points (parallel arrays) against the recent prices of their series."""
+        series, series_index = np.unique(np.column_stack((appearance_ids, platform_ids)), axis=0, return_inverse=True)
+        series_index = series_index.reshape(-1)
+        windows = self._get_windows(db, [(int(appearance_id), int(platform_id)) for appearance_id, platform_id in series])
+
+        # 各序列窗口长度不一，补 NaN 成矩阵后整体求中位数与 MAD
+        reference = np.full((len(windows), self.window), np.nan)
+        for row, log_prices in enumerate(windows):
+            reference[row, :len(log_prices)] = log_prices
+        point_counts = np.count_nonzero(~np.isnan(reference), axis=1)
+        judged = point_counts >= self.min_points
+
+        medians = np.zeros(len(windows))
+        scales = np.ones(len(windows))
+        if judged.any():
+            medians[judged] = np.nanmedian(reference[judged], axis=1)
+            mads = np.nanmedian(np.abs(reference[judged] - medians[judged, None]), axis=1)
+            scales[judged] = np.maximum(mads * _MAD_SCALE, self.min_spread)
+
+        log_prices = _log_prices(prices)
+        deviations = np.abs(log_prices - medians[series_index]) / scales[series_index]
+        deviations[~judged[series_index]] = 0
+        return OutlierCheck(
+            is_outlier=deviations > self.threshold,
+            medians=np.rint(np.exp(medians[series_index])).astype(np.int64),
+            deviations=deviations
+        )
+
+    def record(self, points: Sequence[Sequence]) -> None:
+        """Roll stored (appearance_id, platform_id, lowest_price_cents) points, in time order, into cached windows."""
+        new_prices: Dict[SeriesKey, List[int]] = {}
+        for appearance_id, platform_id, lowest_price_cents in points:
+            new_prices.setdefault((appearance_id, platform_id), []).append(lowest_price_cents)
+
+        with self._lock:
+            for key, prices in new_prices.items():
+                log_prices = self._windows.get(key)
+                if log_prices is None:
+                    continue
+                self._store(key, np.concatenate((log_prices, _log_prices(prices))))
+
+    def invalidate(self, appearance_ids) -> None:
+        appearance_ids = set(appearance_ids)
+        with self._lock:
+            for key in [key for key in self._windows if key[0] in appearance_ids]:
+                del self._windows[key]
+
+
+price_outlier_filter = PriceOutlierFilter(
+    threshold=settings.PRICE_OUTLIER_THRESHOLD,
+    window=settings.PRICE_OUTLIER_WINDOW,
+    min_points=settings.PRICE_OUTLIER_MIN_POINTS,
+    min_spread=settings.PRICE_OUTLIER_MIN_SPREAD,
+    max_series=settings.PRICE_OUTLIER_CACHE_MAX_SERIES,
+    rebase_points=settings.PRICE_OUTLIER_REBASE_POINTS
+)
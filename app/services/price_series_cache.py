@@ -0,0 +1,302 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Union
+
+import numpy as np
+from redis import RedisError
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+import app.models as models
+from app.core.config import settings
+from app.db.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# quantity_on_sale 为空时在数组中的占位值
+_MISSING_QUANTITY = -1
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_micros(value: int) -> datetime:
+    return _EPOCH + timedelta(microseconds=int(value))
+
+
+def _version_key(appearance_id: int) -> str:
+    return f"price_series_version:{appearance_id}"
+
+
+@dataclass
+class PriceSeries:
+    """
+    Recent price points of one appearance across all platforms, as parallel arrays ordered by recorded_at.
+
+    Every point recorded at or after ``complete_from`` is present; older points may have been cut off by
+    the per-series point limit or the lookback window.
+    """
+    version: Optional[int]
+    complete_from: int
+    recorded_at: np.ndarray
+    platform_ids: np.ndarray
+    prices: np.ndarray
+    quantities: np.ndarray
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Sequence], version: Optional[int], complete_from: int) -> "PriceSeries":
+        """Build a series from (platform_id, lowest_price_cents, quantity_on_sale, recorded_at) rows sorted by time."""
+        return cls(
+            version=version,
+            complete_from=complete_from,
+            recorded_at=np.fromiter((_to_micros(row[3]) for row in rows), dtype=np.int64, count=len(rows)),
+            platform_ids=np.fromiter((row[0] for row in rows), dtype=np.int32, count=len(rows)),
+            prices=np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows)),
+            quantities=np.fromiter(
+                (_MISSING_QUANTITY if row[2] is None else row[2] for row in rows), dtype=np.int64, count=len(rows)
+            ),
+        )
+
+    def __len__(self) -> int:
+        return len(self.recorded_at)
+
+    @property
+    def nbytes(self) -> int:
+        return self.recorded_at.nbytes + self.platform_ids.nbytes + self.prices.nbytes + self.quantities.nbytes
+
+    def covers(self, start: datetime) -> bool:
+        return _to_micros(start) >= self.complete_from
+
+    def append(self, other: "PriceSeries", max_points: int) -> None:
+        self.recorded_at = np.concatenate((self.recorded_at, other.recorded_at))[-max_points:]
+        self.platform_ids = np.concatenate((self.platform_ids, other.platform_ids))[-max_points:]
+        self.prices = np.concatenate((self.prices, other.prices))[-max_points:]
+        self.quantities = np.concatenate((self.quantities, other.quantities))[-max_points:]
+        if len(self.recorded_at) == max_points:
+            self.complete_from = max(self.complete_from, int(self.recorded_at[0]))
+
+    def window(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> slice:
+        """Index range of the points recorded within [start, end]."""
+        lower = 0 if start is None else int(np.searchsorted(self.recorded_at, _to_micros(start), side="left"))
+        upper = len(self) if end is None else int(np.searchsorted(self.recorded_at, _to_micros(end), side="right"))
+        return slice(lower, upper)
+
+    def points(self, index: Union[slice, np.ndarray]) -> List[tuple]:
+        """(platform_id, lowest_price_cents, quantity_on_sale, recorded_at) tuples for ``index``."""
+        return [
+            (int(platform_id), int(price), None if quantity == _MISSING_QUANTITY else int(quantity),
+             _from_micros(recorded_at))
+            for platform_id, price, quantity, recorded_at in zip(
+                self.platform_ids[index], self.prices[index], self.quantities[index], self.recorded_at[index]
+            )
+        ]
+
+
+class PriceSeriesCache:
+    """
+    Per-process LRU cache of recent appearance price series, bounded by the total size of its arrays.
+
+    Each appearance has a version counter in Redis that every ingest / delete increments. A cached series is
+    only served while its version still matches, so writes made through other workers are picked up on the
+    next read, while the worker performing an ingest appends the new points in place.
+    """
+
+    def __init__(self, max_bytes: int, max_points_per_series: int):
+        self.max_bytes = max_bytes
+        self.max_points_per_series = max_points_per_series
+        self._series: "OrderedDict[int, PriceSeries]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def cached_appearance_ids(self) -> Set[int]:
+        with self._lock:
+            return set(self._series)
+
+    def _get_versions(self, appearance_ids: List[int]) -> Optional[List[int]]:
+        try:
+            versions = redis_client.mget([_version_key(appearance_id) for appearance_id in appearance_ids])
+        except RedisError as e:
+            logger.warning(f"Could not read price series versions, bypassing cache: {e}")
+            return None
+        return [int(version) if version is not None else 0 for version in versions]
+
+    def _bump_versions(self, appearance_ids: Iterable[int]) -> Optional[Dict[int, int]]:
+        appearance_ids = list(appearance_ids)
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for appearance_id in appearance_ids:
+                pipeline.incr(_version_key(appearance_id))
+            return dict(zip(appearance_ids, pipeline.execute()))
+        except RedisError as e:
+            logger.warning(f"Could not bump price series versions: {e}")
+            return None
+
+    def _store(self, appearance_id: int, series: PriceSeries) -> None:
+        previous = self._series.pop(appearance_id, None)
+        if previous is not None:
+            self._bytes -= previous.nbytes
+        self._series[appearance_id] = series
+        self._bytes += series.nbytes
+        self._evict()
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._series:
+            _, evicted = self._series.popitem(last=False)
+            self._bytes -= evicted.nbytes
+
+    def _drop(self, appearance_id: int) -> None:
+        series = self._series.pop(appearance_id, None)
+        if series is not None:
+            self._bytes -= series.nbytes
+
+    def _load(self, db: Session, appearance_ids: List[int], limit_points: bool = True) -> Dict[int, List[tuple]]:
+        history = models.PlatformPriceHistory
+        recorded_after = datetime.now(tz=timezone.utc) - timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+        ranked = (
+            select(
+                history.appearance_id,
+                history.platform_id,
+                history.lowest_price_cents,
+                history.quantity_on_sale,
+                history.recorded_at,
+                func.row_number().over(
+                    partition_by=history.appearance_id,
+                    order_by=history.recorded_at.desc()
+                ).label("rn")
+            )
+            .where(history.appearance_id.in_(appearance_ids), history.recorded_at >= recorded_after)
+            .subquery()
+        )
+        query = (
+            select(ranked.c.appearance_id, ranked.c.platform_id, ranked.c.lowest_price_cents,
+                   ranked.c.quantity_on_sale, ranked.c.recorded_at)
+            .order_by(ranked.c.appearance_id, ranked.c.recorded_at)
+        )
+        if limit_points:
+            query = query.where(ranked.c.rn <= self.max_points_per_series)
+        rows = db.execute(query).all()
+
+        rows_map = {appearance_id: [] for appearance_id in appearance_ids}
+        for appearance_id, *point in rows:
+            rows_map[appearance_id].append(point)
+        return rows_map
+
+    def _build(self, rows: List[tuple], version: Optional[int]) -> PriceSeries:
+        recorded_after = datetime.now(tz=timezone.utc) - timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+        complete_from = _to_micros(recorded_after)
+        if len(rows) >= self.max_points_per_series:
+            complete_from = max(complete_from, _to_micros(rows[0][3]))
+        return PriceSeries.from_rows(rows, version=version, complete_from=complete_from)
+
+    def get_series(self, db: Session, appearance_ids: List[int]) -> Dict[int, PriceSeries]:
+        """Series of ``appearance_ids``, loading the missing or outdated ones with a single query."""
+        appearance_ids = list(dict.fromkeys(appearance_ids))
+        if not appearance_ids:
+            return {}
+
+        versions = self._get_versions(appearance_ids) if self.enabled else None
+        if versions is None:
+            rows_map = self._load(db, appearance_ids)
+            return {appearance_id: self._build(rows, None) for appearance_id, rows in rows_map.items()}
+
+        series_map = {}
+        with self._lock:
+            for appearance_id, version in zip(appearance_ids, versions):
+                series = self._series.get(appearance_id)
+                if series is not None and series.version == version:
+                    self._series.move_to_end(appearance_id)
+                    series_map[appearance_id] = series
+
+        missing = [appearance_id for appearance_id in appearance_ids if appearance_id not in series_map]
+        if missing:
+            # 先读版本号再查库，期间发生的写入会使版本号前进，下次读取时自然重新加载
+            rows_map = self._load(db, missing)
+            version_map = dict(zip(appearance_ids, versions))
+            with self._lock:
+                for appearance_id in missing:
+                    series = self._build(rows_map[appearance_id], version_map[appearance_id])
+                    self._store(appearance_id, series)
+                    series_map[appearance_id] = series
+
+        return series_map
+
+    def load_lookback_window(self, db: Session, appearance_ids: List[int]) -> Dict[int, PriceSeries]:
+        """
+        Every point of ``appearance_ids`` within the lookback window, read from the database and not cached.
+
+        For callers that need more history than a cached series holds, see PriceSeries.covers.
+        """
+        appearance_ids = list(dict.fromkeys(appearance_ids))
+        if not appearance_ids:
+            return {}
+        rows_map = self._load(db, appearance_ids, limit_points=False)
+        recorded_after = datetime.now(tz=timezone.utc) - timedelta(days=settings.PRICE_HISTORY_LOOKBACK_DAYS)
+        return {
+            appearance_id: PriceSeries.from_rows(rows, version=None, complete_from=_to_micros(recorded_after))
+            for appearance_id, rows in rows_map.items()
+        }
+
+    def record_ingest(
+            self,
+            touched_ids: Set[int],
+            rewritten_ids: Set[int],
+            new_points: Dict[int, List[tuple]]
+    ) -> None:
+        """
+        Publish committed writes: bump the versions of ``touched_ids`` and append ``new_points`` in place.
+
+        Series of ``rewritten_ids`` (existing points updated), series that moved on in another worker and
+        series receiving points older than their last one are dropped instead.
+        """
+        if not touched_ids or not self.enabled:
+            return
+        new_versions = self._bump_versions(touched_ids)
+
+        with self._lock:
+            for appearance_id in touched_ids:
+                series = self._series.get(appearance_id)
+                if series is None:
+                    continue
+                points = new_points.get(appearance_id)
+                if (
+                        new_versions is None
+                        or appearance_id in rewritten_ids
+                        or not points
+                        or new_versions[appearance_id] != series.version + 1
+                        or (len(series) and _to_micros(points[0][3]) < series.recorded_at[-1])
+                ):
+                    self._drop(appearance_id)
+                    continue
+
+                self._bytes -= series.nbytes
+                series.append(PriceSeries.from_rows(points, None, 0), self.max_points_per_series)
+                series.version = new_versions[appearance_id]
+                self._bytes += series.nbytes
+                self._series.move_to_end(appearance_id)
+            self._evict()
+
+    def invalidate(self, appearance_ids: Iterable[int]) -> None:
+        appearance_ids = set(appearance_ids)
+        if not appearance_ids or not self.enabled:
+            return
+        self._bump_versions(appearance_ids)
+        with self._lock:
+            for appearance_id in appearance_ids:
+                self._drop(appearance_id)
+
+
+price_series_cache = PriceSeriesCache(
+    max_bytes=settings.PRICE_SERIES_CACHE_MAX_BYTES,
+    max_points_per_series=max(settings.PRICE_SERIES_CACHE_MAX_POINTS, settings.PRICE_HISTORY_FETCH_COUNT)
+)
@@ -7,8 +7,9 @@ CREATE TABLE appearance_types
 
 CREATE TABLE platforms
 (
-    id   SERIAL PRIMARY KEY,
-    name VARCHAR(100) NOT NULL UNIQUE
+    id       SERIAL PRIMARY KEY,
+    name     VARCHAR(100)     NOT NULL UNIQUE,
+    fee_rate DOUBLE PRECISION NOT NULL DEFAULT 0 CHECK (fee_rate >= 0 AND fee_rate < 1)
 );
 
 CREATE TABLE appearances
@@ -53,16 +54,183 @@ CREATE TABLE platform_appearance_relations
     CONSTRAINT fk_platform_appearance_relations_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE
 );
 
+-- Partitioned by month on recorded_at, see the partition functions below
 CREATE TABLE platform_price_history
 (
-    id                 BIGSERIAL PRIMARY KEY,
+    id                 BIGSERIAL,
     appearance_id      BIGINT      NOT NULL,
     platform_id        INTEGER     NOT NULL,
     lowest_price_cents BIGINT      NOT NULL,
     quantity_on_sale   INTEGER,
     recorded_at         TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (id, recorded_at),
+    CONSTRAINT uq_platform_price_history_point UNIQUE (appearance_id, platform_id, recorded_at),
     CONSTRAINT fk_platform_price_history_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
     CONSTRAINT fk_platform_price_history_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+) PARTITION BY RANGE (recorded_at);
+
+-- Parquet files holding price history moved out of platform_price_history, see app/jobs/price_history_archive.py
+CREATE TABLE platform_price_history_archives
+(
+    id              BIGSERIAL PRIMARY KEY,
+    month           DATE        NOT NULL,
+    platform_id     INTEGER     NOT NULL,
+    path            TEXT        NOT NULL UNIQUE,
+    row_count       BIGINT      NOT NULL,
+    min_recorded_at TIMESTAMPTZ NOT NULL,
+    max_recorded_at TIMESTAMPTZ NOT NULL,
+    archived_at     TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    CONSTRAINT fk_platform_price_history_archives_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+);
+
+-- Incoming price points held back by the outlier filter instead of entering platform_price_history
+CREATE TABLE platform_price_quarantine
+(
+    id                 BIGSERIAL PRIMARY KEY,
+    appearance_id      BIGINT           NOT NULL,
+    platform_id        INTEGER          NOT NULL,
+    lowest_price_cents BIGINT           NOT NULL,
+    quantity_on_sale   INTEGER,
+    recorded_at        TIMESTAMPTZ      NOT NULL,
+    median_price_cents BIGINT           NOT NULL,
+    deviation          DOUBLE PRECISION NOT NULL,
+    quarantined_at     TIMESTAMPTZ      NOT NULL DEFAULT NOW(),
+    CONSTRAINT fk_platform_price_quarantine_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
+    CONSTRAINT fk_platform_price_quarantine_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+);
+
+CREATE TABLE platform_latest_price
+(
+    appearance_id      BIGINT      NOT NULL,
+    platform_id        INTEGER     NOT NULL,
+    lowest_price_cents BIGINT      NOT NULL,
+    quantity_on_sale   INTEGER,
+    recorded_at        TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (appearance_id, platform_id),
+    CONSTRAINT fk_platform_latest_price_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
+    CONSTRAINT fk_platform_latest_price_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+);
+
+CREATE TABLE platform_price_candles_hourly
+(
+    appearance_id          BIGINT      NOT NULL,
+    platform_id            INTEGER     NOT NULL,
+    bucket_start           TIMESTAMPTZ NOT NULL,
+    open_price_cents       BIGINT      NOT NULL,
+    high_price_cents       BIGINT      NOT NULL,
+    low_price_cents        BIGINT      NOT NULL,
+    close_price_cents      BIGINT      NOT NULL,
+    min_quantity_on_sale   INTEGER,
+    quantity_on_sale_sum   BIGINT,
+    quantity_on_sale_count INTEGER,
+    close_quantity_on_sale INTEGER,
+    open_recorded_at       TIMESTAMPTZ NOT NULL,
+    close_recorded_at      TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (appearance_id, platform_id, bucket_start),
+    CONSTRAINT fk_platform_price_candles_hourly_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
+    CONSTRAINT fk_platform_price_candles_hourly_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+);
+
+CREATE TABLE platform_price_candles_daily
+(
+    appearance_id          BIGINT      NOT NULL,
+    platform_id            INTEGER     NOT NULL,
+    bucket_start           TIMESTAMPTZ NOT NULL,
+    open_price_cents       BIGINT      NOT NULL,
+    high_price_cents       BIGINT      NOT NULL,
+    low_price_cents        BIGINT      NOT NULL,
+    close_price_cents      BIGINT      NOT NULL,
+    min_quantity_on_sale   INTEGER,
+    quantity_on_sale_sum   BIGINT,
+    quantity_on_sale_count INTEGER,
+    close_quantity_on_sale INTEGER,
+    open_recorded_at       TIMESTAMPTZ NOT NULL,
+    close_recorded_at      TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (appearance_id, platform_id, bucket_start),
+    CONSTRAINT fk_platform_price_candles_daily_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
+    CONSTRAINT fk_platform_price_candles_daily_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+);
+
+CREATE TABLE appearance_market_stats
+(
+    appearance_id       BIGINT PRIMARY KEY,
+    current_price_cents BIGINT,
+    listings_count      BIGINT,
+    change_24h          DOUBLE PRECISION,
+    change_7d           DOUBLE PRECISION,
+    min_price_30d_cents BIGINT,
+    max_price_30d_cents BIGINT,
+    lowest_price_cents  BIGINT,
+    highest_price_cents BIGINT,
+    spread_cents        BIGINT,
+    margin_cents        BIGINT,
+    average_listings    DOUBLE PRECISION,
+    listings_trend      DOUBLE PRECISION,
+    turnover_rate       DOUBLE PRECISION,
+    updated_at          TIMESTAMPTZ NOT NULL,
+    CONSTRAINT fk_appearance_market_stats_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE
+);
+
+CREATE TABLE appearance_platform_liquidity
+(
+    appearance_id             BIGINT           NOT NULL,
+    platform_id               INTEGER          NOT NULL,
+    average_listings          DOUBLE PRECISION NOT NULL,
+    previous_average_listings DOUBLE PRECISION,
+    listings_trend            DOUBLE PRECISION,
+    delisted_listings         BIGINT           NOT NULL,
+    turnover_rate             DOUBLE PRECISION,
+    updated_at                TIMESTAMPTZ      NOT NULL,
+    PRIMARY KEY (appearance_id, platform_id),
+    CONSTRAINT fk_appearance_platform_liquidity_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
+    CONSTRAINT fk_appearance_platform_liquidity_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE RESTRICT
+);
+
+CREATE TABLE appearance_similarities
+(
+    appearance_id         BIGINT           NOT NULL,
+    rank                  SMALLINT         NOT NULL,
+    similar_appearance_id BIGINT           NOT NULL,
+    correlation           DOUBLE PRECISION NOT NULL,
+    computed_at           TIMESTAMPTZ      NOT NULL,
+    PRIMARY KEY (appearance_id, rank),
+    CONSTRAINT fk_appearance_similarities_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE,
+    CONSTRAINT fk_appearance_similarities_similar FOREIGN KEY (similar_appearance_id) REFERENCES appearances (id) ON DELETE CASCADE
+);
+
+CREATE TABLE market_indexes
+(
+    id                 SERIAL PRIMARY KEY,
+    appearance_type_id INTEGER,
+    weighting          VARCHAR(20)      NOT NULL,
+    level              DOUBLE PRECISION NOT NULL,
+    weighted_sum       DOUBLE PRECISION NOT NULL DEFAULT 0,
+    constituent_count  INTEGER          NOT NULL DEFAULT 0,
+    updated_at         TIMESTAMPTZ      NOT NULL DEFAULT NOW(),
+    UNIQUE (appearance_type_id, weighting),
+    CONSTRAINT fk_market_indexes_appearance_type FOREIGN KEY (appearance_type_id) REFERENCES appearance_types (id) ON DELETE CASCADE
+);
+
+CREATE TABLE market_index_levels
+(
+    market_index_id   INTEGER          NOT NULL,
+    bucket_start      TIMESTAMPTZ      NOT NULL,
+    level             DOUBLE PRECISION NOT NULL,
+    constituent_count INTEGER          NOT NULL,
+    PRIMARY KEY (market_index_id, bucket_start),
+    CONSTRAINT fk_market_index_levels_index FOREIGN KEY (market_index_id) REFERENCES market_indexes (id) ON DELETE CASCADE
+);
+
+-- Append-only changes of appearance prices and listings, folded into market_indexes outside the ingest transaction
+CREATE TABLE market_index_changes
+(
+    id              BIGSERIAL PRIMARY KEY,
+    appearance_id   BIGINT      NOT NULL,
+    old_price_cents BIGINT,
+    old_listings    BIGINT,
+    new_price_cents BIGINT,
+    new_listings    BIGINT,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 CREATE TABLE users
@@ -111,6 +279,27 @@ CREATE TABLE user_sale_transactions
     CONSTRAINT fk_user_sale_transactions_platform FOREIGN KEY (platform_id) REFERENCES platforms (id) ON DELETE SET NULL
 );
 
+CREATE TABLE user_positions
+(
+    user_id              BIGINT      NOT NULL,
+    appearance_id        BIGINT      NOT NULL,
+    purchased_quantity   BIGINT      NOT NULL DEFAULT 0,
+    purchased_cost_cents BIGINT      NOT NULL DEFAULT 0,
+    sold_quantity        BIGINT      NOT NULL DEFAULT 0,
+    sale_revenue_cents   BIGINT      NOT NULL DEFAULT 0,
+    quantity             BIGINT GENERATED ALWAYS AS (purchased_quantity - sold_quantity) STORED,
+    total_cost_cents     DOUBLE PRECISION GENERATED ALWAYS AS (
+        (purchased_quantity - sold_quantity) * purchased_cost_cents::DOUBLE PRECISION / NULLIF(purchased_quantity, 0)
+    ) STORED,
+    realized_pnl_cents   DOUBLE PRECISION GENERATED ALWAYS AS (
+        sale_revenue_cents - sold_quantity * purchased_cost_cents::DOUBLE PRECISION / NULLIF(purchased_quantity, 0)
+    ) STORED,
+    updated_at           TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, appearance_id),
+    CONSTRAINT fk_user_positions_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE,
+    CONSTRAINT fk_user_positions_appearance FOREIGN KEY (appearance_id) REFERENCES appearances (id) ON DELETE CASCADE
+);
+
 CREATE TABLE watchlists
 (
     id         BIGSERIAL PRIMARY KEY,
@@ -144,6 +333,22 @@ CREATE INDEX idx_platform_appearance_relations_appearance ON platform_appearance
 CREATE INDEX idx_platform_price_history_appearance_recorded ON platform_price_history (appearance_id, recorded_at DESC);
 CREATE INDEX idx_platform_price_history_recorded ON platform_price_history (recorded_at DESC);
 CREATE INDEX idx_platform_price_history_platform_recorded ON platform_price_history (platform_id, recorded_at DESC);
+CREATE INDEX idx_platform_price_history_archives_range ON platform_price_history_archives (min_recorded_at, max_recorded_at);
+CREATE INDEX idx_platform_price_quarantine_appearance_recorded ON platform_price_quarantine (appearance_id, recorded_at DESC);
+CREATE INDEX idx_platform_latest_price_appearance_recorded ON platform_latest_price (appearance_id, recorded_at DESC);
+CREATE INDEX idx_platform_price_candles_hourly_appearance_bucket ON platform_price_candles_hourly (appearance_id, bucket_start);
+CREATE INDEX idx_platform_price_candles_daily_appearance_bucket ON platform_price_candles_daily (appearance_id, bucket_start);
+CREATE INDEX idx_appearance_market_stats_current_price ON appearance_market_stats (current_price_cents, appearance_id);
+CREATE INDEX idx_appearance_market_stats_listings ON appearance_market_stats (listings_count, appearance_id);
+CREATE INDEX idx_appearance_market_stats_change_24h ON appearance_market_stats (change_24h, appearance_id);
+CREATE INDEX idx_appearance_market_stats_change_7d ON appearance_market_stats (change_7d, appearance_id);
+CREATE INDEX idx_appearance_market_stats_spread ON appearance_market_stats (spread_cents, appearance_id);
+CREATE INDEX idx_appearance_market_stats_margin ON appearance_market_stats (margin_cents, appearance_id);
+CREATE INDEX idx_appearance_market_stats_average_listings ON appearance_market_stats (average_listings, appearance_id);
+CREATE INDEX idx_appearance_market_stats_turnover_rate ON appearance_market_stats (turnover_rate, appearance_id);
+CREATE INDEX idx_appearance_similarities_similar ON appearance_similarities (similar_appearance_id);
+-- The market-wide indexes have no appearance_type_id, which the UNIQUE constraint does not cover
+CREATE UNIQUE INDEX uq_market_indexes_market_weighting ON market_indexes (weighting) WHERE appearance_type_id IS NULL;
 CREATE INDEX idx_user_purchase_transactions_appearance ON user_purchase_transactions (appearance_id);
 CREATE INDEX idx_user_purchase_transactions_purchased ON user_purchase_transactions (purchased_at DESC);
 CREATE INDEX idx_user_purchase_transactions_user_appearance ON user_purchase_transactions (user_id, appearance_id);
@@ -152,9 +357,55 @@ CREATE INDEX idx_user_sale_transactions_appearance ON user_sale_transactions (ap
 CREATE INDEX idx_user_sale_transactions_sold ON user_sale_transactions (sold_at DESC);
 CREATE INDEX idx_user_sale_transactions_user_appearance ON user_sale_transactions (user_id, appearance_id);
 CREATE INDEX idx_user_sale_transactions_user_sold ON user_sale_transactions (user_id, sold_at DESC);
+CREATE INDEX idx_user_positions_user_total_cost ON user_positions (user_id, total_cost_cents, appearance_id);
 CREATE INDEX idx_watchlists_user ON watchlists (user_id);
 CREATE INDEX idx_watchlists_user_name ON watchlists (user_id, name);
 CREATE INDEX idx_watchlist_items_watchlist ON watchlist_items (watchlist_id);
 CREATE INDEX idx_watchlist_items_appearance ON watchlist_items (appearance_id);
 CREATE INDEX idx_users_email ON users (email);
-CREATE INDEX idx_users_is_active ON users (is_active);
\ No newline at end of file
+CREATE INDEX idx_users_is_active ON users (is_active);
+
+-- Functions
+-- Monthly partitions of platform_price_history are named platform_price_history_YYYY_MM and cover one UTC month
+CREATE OR REPLACE FUNCTION create_platform_price_history_partition(month_start DATE) RETURNS TEXT AS
+$$
+DECLARE
+    partition_start DATE := date_trunc('month', month_start)::DATE;
+    partition_name  TEXT := format('platform_price_history_%s', to_char(partition_start, 'YYYY_MM'));
+BEGIN
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+                'CREATE TABLE %I PARTITION OF platform_price_history FOR VALUES FROM (%L) TO (%L)',
+                partition_name,
+                partition_start::TIMESTAMP AT TIME ZONE 'UTC',
+                (partition_start + INTERVAL '1 month')::TIMESTAMP AT TIME ZONE 'UTC'
+                );
+    ELSIF NOT EXISTS (SELECT 1
+                      FROM pg_inherits
+                      WHERE inhrelid = to_regclass(partition_name)
+                        AND inhparent = 'platform_price_history'::regclass
+                        AND NOT inhdetachpending) THEN
+        -- A month detached by retention keeps its table; never write new points next to expired data
+        RAISE EXCEPTION 'Partition % exists but is not attached to platform_price_history', partition_name
+            USING ERRCODE = 'object_not_in_prerequisite_state';
+    END IF;
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION ensure_platform_price_history_partitions(from_month DATE, to_month DATE) RETURNS VOID AS
+$$
+DECLARE
+    current_month DATE := date_trunc('month', from_month)::DATE;
+BEGIN
+    WHILE current_month <= to_month
+        LOOP
+            PERFORM create_platform_price_history_partition(current_month);
+            current_month := (current_month + INTERVAL '1 month')::DATE;
+        END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Initial partitions, later months are created by app.jobs.price_history_partitions and on ingest
+SELECT ensure_platform_price_history_partitions((NOW() AT TIME ZONE 'UTC')::DATE,
+                                                ((NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months')::DATE);
\ No newline at end of file
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.models as models
+import app.schemas as schemas
+from app.crud import crud_platform_price_history
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _history(appearance_id, platform_id, price, hours_ago) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        lowest_price_cents=price,
+        quantity_on_sale=10,
+        recorded_at=NOW - timedelta(hours=hours_ago)
+    )
+
+
+@pytest.fixture
+def flat_platforms(db, catalog):
+    """Two platforms quoting flat but different prices, the more expensive one reporting last."""
+    (platform_id, other_platform_id), (appearance_id, *_) = catalog
+    crud_platform_price_history.create_platform_price_histories(db, [
+        _history(appearance_id, platform_id, 1000, 30),
+        _history(appearance_id, other_platform_id, 1200, 30),
+        _history(appearance_id, platform_id, 1000, 3),
+        _history(appearance_id, other_platform_id, 1200, 1),
+    ])
+    return appearance_id
+
+
+def test_flat_platforms_do_not_change(db, flat_platforms):
+    market_stats = db.get(models.AppearanceMarketStats, flat_platforms)
+
+    assert market_stats.change_24h == 0
+    assert market_stats.change_7d is None
+
+
+def test_change_compares_the_same_platforms(db, catalog, flat_platforms):
+    (platform_id, _), _ = catalog
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(flat_platforms, platform_id, 1100, 0)]
+    )
+
+    market_stats = db.get(models.AppearanceMarketStats, flat_platforms)
+
+    assert market_stats.change_24h == pytest.approx(0.1)
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+import app.schemas as schemas
+from app.crud import crud_appearance, crud_platform_price_history
+from app.crud.crud_appearance import TOP_MOVERS_GAINERS, TOP_MOVERS_LOSERS
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _history(appearance_id, platform_id, price, hours_ago) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        lowest_price_cents=price,
+        quantity_on_sale=10,
+        recorded_at=NOW - timedelta(hours=hours_ago)
+    )
+
+
+def _top_mover_ids(db, direction):
+    return [appearance.id for appearance in crud_appearance.get_top_movers(db, direction=direction).data]
+
+
+def test_flat_platforms_are_not_movers(db, catalog):
+    (platform_id, other_platform_id), (flat_appearance_id, rising_appearance_id, _) = catalog
+    # 两个平台各自价格不变，只是价位不同、最后上报的平台更贵
+    crud_platform_price_history.create_platform_price_histories(db, [
+        _history(flat_appearance_id, platform_id, 1000, 30),
+        _history(flat_appearance_id, other_platform_id, 1200, 30),
+        _history(flat_appearance_id, platform_id, 1000, 3),
+        _history(flat_appearance_id, other_platform_id, 1200, 1),
+        _history(rising_appearance_id, platform_id, 1000, 30),
+        _history(rising_appearance_id, platform_id, 1100, 1),
+    ])
+
+    assert _top_mover_ids(db, TOP_MOVERS_GAINERS) == [rising_appearance_id]
+    assert _top_mover_ids(db, TOP_MOVERS_LOSERS) == []
@@ -0,0 +1,51 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import app.schemas as schemas
+from app.core.config import settings
+from app.crud import crud_market_index, crud_platform_price_history
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _history(appearance_id, platform_id, price, hours_ago) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        lowest_price_cents=price,
+        quantity_on_sale=10,
+        recorded_at=NOW - timedelta(hours=hours_ago)
+    )
+
+
+def _levels(db):
+    return {market_index.weighting: market_index.level for market_index in crud_market_index.get_market_indexes(db).data}
+
+
+def test_platforms_taking_turns_do_not_move_the_indexes(db, catalog):
+    (platform_id, other_platform_id), (appearance_id, *_) = catalog
+    base_levels = {weighting: settings.MARKET_INDEX_BASE_LEVEL for weighting in crud_market_index.WEIGHTINGS}
+
+    # 两个平台价格都不变，只是交替上报不同的价位
+    for hours_ago, reporting_platform_id, price in ((4, platform_id, 1000), (3, other_platform_id, 1200),
+                                                    (2, platform_id, 1000), (1, other_platform_id, 1200)):
+        crud_platform_price_history.create_platform_price_histories(
+            db, [_history(appearance_id, reporting_platform_id, price, hours_ago)]
+        )
+        assert _levels(db) == base_levels
+
+
+def test_cheapest_price_change_moves_the_indexes(db, catalog):
+    (platform_id, other_platform_id), (appearance_id, *_) = catalog
+    crud_platform_price_history.create_platform_price_histories(db, [
+        _history(appearance_id, platform_id, 1000, 2), _history(appearance_id, other_platform_id, 1200, 2)
+    ])
+
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, 1100, 1)]
+    )
+
+    assert _levels(db) == {
+        weighting: pytest.approx(settings.MARKET_INDEX_BASE_LEVEL * 1.1) for weighting in crud_market_index.WEIGHTINGS
+    }
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+import app.models as models
+import app.schemas as schemas
+from app.crud import crud_platform_price_history
+from app.crud.crud_platform_price_history import ON_CONFLICT_UPDATE
+
+HOUR_START = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+
+
+def _history(appearance_id, platform_id, price, minute) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        lowest_price_cents=price,
+        quantity_on_sale=10,
+        recorded_at=HOUR_START + timedelta(minutes=minute)
+    )
+
+
+def _hourly_candle(db, appearance_id, platform_id) -> models.PlatformPriceCandleHourly:
+    return db.scalars(
+        select(models.PlatformPriceCandleHourly).where(
+            models.PlatformPriceCandleHourly.appearance_id == appearance_id,
+            models.PlatformPriceCandleHourly.platform_id == platform_id,
+            models.PlatformPriceCandleHourly.bucket_start == HOUR_START
+        )
+    ).one()
+
+
+def test_ingest_builds_candles(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, price, minute) for price, minute in ((1000, 0), (1040, 20), (990, 40))]
+    )
+
+    candle = _hourly_candle(db, appearance_id, platform_id)
+    assert (candle.open_price_cents, candle.high_price_cents, candle.low_price_cents, candle.close_price_cents) == \
+           (1000, 1040, 990, 990)
+    assert candle.quantity_on_sale_count == 3
+
+
+def test_updated_points_rebuild_their_buckets(db, catalog):
+    (platform_id, other_platform_id), (appearance_id, *_) = catalog
+    crud_platform_price_history.create_platform_price_histories(
+        db,
+        [_history(appearance_id, platform_id, price, minute) for price, minute in ((1000, 0), (1040, 20), (990, 40))]
+        + [_history(appearance_id, other_platform_id, 1500, 10)]
+    )
+
+    # 覆盖掉最高价的点后，最高价只能由重算得到，不能由合并得到
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, 1010, 20)], on_conflict=ON_CONFLICT_UPDATE
+    )
+
+    candle = _hourly_candle(db, appearance_id, platform_id)
+    assert (candle.open_price_cents, candle.high_price_cents, candle.low_price_cents, candle.close_price_cents) == \
+           (1000, 1010, 990, 990)
+    assert candle.quantity_on_sale_count == 3
+    assert _hourly_candle(db, appearance_id, other_platform_id).high_price_cents == 1500
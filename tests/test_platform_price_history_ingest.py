@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+import app.models as models
+import app.schemas as schemas
+from app.crud import crud_platform_price_history
+from app.crud.crud_platform_price_history import ON_CONFLICT_UPDATE
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _history(appearance_id, platform_id, price, hours_ago) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        lowest_price_cents=price,
+        recorded_at=NOW - timedelta(hours=hours_ago)
+    )
+
+
+def _stored_prices(db, appearance_id, platform_id):
+    return db.scalars(
+        select(models.PlatformPriceHistory.lowest_price_cents)
+        .where(models.PlatformPriceHistory.appearance_id == appearance_id,
+               models.PlatformPriceHistory.platform_id == platform_id)
+        .order_by(models.PlatformPriceHistory.recorded_at)
+    ).all()
+
+
+def _latest_price(db, appearance_id, platform_id):
+    return db.get(models.PlatformLatestPrice, (appearance_id, platform_id)).lowest_price_cents
+
+
+def test_repeated_batch_is_skipped(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+    histories = [_history(appearance_id, platform_id, 1000 + hours_ago, hours_ago) for hours_ago in (3, 2, 1)]
+
+    first = crud_platform_price_history.create_platform_price_histories(db, histories).data
+    second = crud_platform_price_history.create_platform_price_histories(db, histories).data
+
+    assert (first.inserted, first.skipped) == (3, 0)
+    assert (second.inserted, second.updated, second.skipped) == (0, 0, 3)
+    assert _stored_prices(db, appearance_id, platform_id) == [1003, 1002, 1001]
+
+
+def test_duplicate_points_in_one_batch_are_stored_once(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+    histories = [_history(appearance_id, platform_id, 1000, 1), _history(appearance_id, platform_id, 1000, 1)]
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories(db, histories).data
+
+    assert ingest_result.inserted == 1
+    assert _stored_prices(db, appearance_id, platform_id) == [1000]
+
+
+def test_update_overwrites_existing_point_and_latest_price(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, 1000, 2), _history(appearance_id, platform_id, 1010, 1)]
+    )
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, 1020, 1)], on_conflict=ON_CONFLICT_UPDATE
+    ).data
+
+    assert (ingest_result.inserted, ingest_result.updated) == (0, 1)
+    assert _stored_prices(db, appearance_id, platform_id) == [1000, 1020]
+    assert _latest_price(db, appearance_id, platform_id) == 1020
+
+
+def test_unknown_references_are_rejected_individually(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+    histories = [_history(appearance_id, platform_id, 1000, 1), _history(appearance_id + 1000, platform_id, 1000, 1)]
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories(db, histories).data
+
+    assert ingest_result.inserted == 1
+    assert len(ingest_result.rejected) == 1
+    assert _stored_prices(db, appearance_id, platform_id) == [1000]
+
+
+def _external_history(platform_id, platform_appearance_id, price) -> schemas.PlatformPriceHistoryExternalCreate:
+    return schemas.PlatformPriceHistoryExternalCreate(
+        platform_id=platform_id,
+        platform_appearance_id=platform_appearance_id,
+        lowest_price_cents=price,
+        recorded_at=NOW - timedelta(hours=1)
+    )
+
+
+def test_ingest_by_platform_appearance_id_reports_unresolved_ids(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+    db.add(models.PlatformAppearanceRelation(
+        platform_id=platform_id, appearance_id=appearance_id, platform_appearance_id="item-1"
+    ))
+    db.commit()
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories_by_platform_appearance_id(
+        db, [_external_history(platform_id, "item-1", 1000), _external_history(platform_id, "item-2", 1000)]
+    ).data
+
+    assert ingest_result.inserted == 1
+    assert [reference.platform_appearance_id for reference in ingest_result.unresolved] == ["item-2"]
+    assert _stored_prices(db, appearance_id, platform_id) == [1000]
+
+
+def test_ingest_by_platform_appearance_id_retries_after_stale_relations(db, catalog):
+    (platform_id, _), (appearance_id, _, removed_appearance_id) = catalog
+    db.add_all([
+        models.PlatformAppearanceRelation(
+            platform_id=platform_id, appearance_id=appearance_id, platform_appearance_id="item-1"
+        ),
+        models.PlatformAppearanceRelation(
+            platform_id=platform_id, appearance_id=removed_appearance_id, platform_appearance_id="item-3"
+        ),
+    ])
+    db.commit()
+    crud_platform_price_history.create_platform_price_histories_by_platform_appearance_id(
+        db, [_external_history(platform_id, "item-1", 1000)]
+    )
+    # 映射已加载进进程内缓存后，饰品连同映射一起被删除
+    db.query(models.PlatformAppearanceRelation).filter_by(appearance_id=removed_appearance_id).delete()
+    db.query(models.Appearance).filter_by(id=removed_appearance_id).delete()
+    db.commit()
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories_by_platform_appearance_id(
+        db, [_external_history(platform_id, "item-1", 1010), _external_history(platform_id, "item-3", 1000)],
+        on_conflict=ON_CONFLICT_UPDATE
+    ).data
+
+    assert ingest_result.updated == 1
+    assert [reference.platform_appearance_id for reference in ingest_result.unresolved] == ["item-3"]
+    assert _latest_price(db, appearance_id, platform_id) == 1010
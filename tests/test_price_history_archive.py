@@ -0,0 +1,96 @@
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+import app.schemas as schemas
+from app.core.config import settings
+from app.core.operation_result import OperationStatus
+from app.crud import crud_platform_price_history
+from app.crud.crud_platform_price_history import REJECTED_ARCHIVED
+from app.jobs.price_history_archive import archive_partition
+
+ARCHIVED_MONTH = date(2025, 3, 1)
+ARCHIVED_START = datetime(2025, 3, 10, tzinfo=timezone.utc)
+HOT_START = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+
+
+def _history(appearance_id, platform_id, price, recorded_at) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id, platform_id=platform_id, lowest_price_cents=price, recorded_at=recorded_at
+    )
+
+
+@pytest.fixture
+def archived(db, catalog, tmp_path, monkeypatch):
+    """Three days of points per platform archived to Parquet, plus one hot point per platform."""
+    monkeypatch.setattr(settings, "PRICE_HISTORY_ARCHIVE_DIR", str(tmp_path))
+    platform_ids, (appearance_id, other_appearance_id, _) = catalog
+    crud_platform_price_history.create_platform_price_histories(db, [
+        _history(series_appearance_id, platform_id, 1000 + day, ARCHIVED_START + timedelta(days=day))
+        for series_appearance_id in (appearance_id, other_appearance_id)
+        for platform_id in platform_ids
+        for day in range(3)
+    ])
+    assert archive_partition(db, f"platform_price_history_{ARCHIVED_MONTH:%Y_%m}", ARCHIVED_MONTH) == 12
+
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, 1100, HOT_START) for platform_id in platform_ids]
+    )
+
+
+def test_reads_merge_archived_points(db, catalog, archived):
+    (platform_id, _), (appearance_id, *_) = catalog
+
+    page = crud_platform_price_history.get_platform_price_histories(
+        db, platform_id=platform_id, appearance_id=appearance_id
+    ).data
+
+    assert page.total_count == 4
+    assert [(item.platform_id, item.lowest_price_cents) for item in page.items] == \
+           [(platform_id, 1100), (platform_id, 1002), (platform_id, 1001), (platform_id, 1000)]
+
+
+def test_bounded_range_reads_archived_points(db, catalog, archived):
+    page = crud_platform_price_history.get_platform_price_histories(
+        db, start_date=ARCHIVED_START + timedelta(days=1), end_date=ARCHIVED_START + timedelta(days=1, hours=1)
+    ).data
+
+    assert page.total_count == 4
+    assert {item.lowest_price_cents for item in page.items} == {1001}
+
+
+def test_unbounded_read_of_archived_months_is_refused(db, archived):
+    operation_result = crud_platform_price_history.get_platform_price_histories(db, start_date=ARCHIVED_START)
+
+    assert operation_result.status == OperationStatus.INVALID
+
+
+def test_hot_only_read_is_not_bounded(db, archived):
+    page = crud_platform_price_history.get_platform_price_histories(db, start_date=HOT_START).data
+
+    assert page.total_count == 2
+
+
+def test_points_in_archived_months_are_rejected(db, catalog, archived):
+    (platform_id, _), (appearance_id, *_) = catalog
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories(db, [
+        _history(appearance_id, platform_id, 1000, ARCHIVED_START),
+        _history(appearance_id, platform_id, 1200, HOT_START + timedelta(hours=1)),
+    ]).data
+
+    assert ingest_result.inserted == 1
+    assert [(rejection.index, rejection.reason) for rejection in ingest_result.rejected] == [(0, REJECTED_ARCHIVED)]
+    page = crud_platform_price_history.get_platform_price_histories(
+        db, platform_id=platform_id, appearance_id=appearance_id
+    ).data
+    assert page.total_count == 5
+
+
+def test_bulk_delete_of_archived_months_is_refused(client, archived):
+    response = client.post("/platform-price-histories/bulk-delete", json={
+        "start_date": ARCHIVED_START.isoformat(), "end_date": HOT_START.isoformat()
+    })
+
+    assert response.status_code == 400
+    assert response.json()["code"] == 3105
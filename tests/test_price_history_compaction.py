@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+import app.models as models
+import app.schemas as schemas
+from app.crud import crud_platform_price_history
+from app.jobs.price_history_compaction import compact_partition
+
+HOUR_START = datetime(2025, 3, 10, 8, tzinfo=timezone.utc)
+
+
+def _history(appearance_id, platform_id, price, minutes) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id,
+        platform_id=platform_id,
+        lowest_price_cents=price,
+        quantity_on_sale=10,
+        recorded_at=HOUR_START + timedelta(minutes=minutes)
+    )
+
+
+def test_compaction_rebuilds_candles_and_keeps_latest_price(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+    # 第一个小时内价格不变，第二个小时开始变价，最后一个点与前一个点相同
+    crud_platform_price_history.create_platform_price_histories(
+        db,
+        [_history(appearance_id, platform_id, 1000, minutes) for minutes in range(0, 60, 10)]
+        + [_history(appearance_id, platform_id, 1100, 70), _history(appearance_id, platform_id, 1100, 80)]
+    )
+    partition_name = f"platform_price_history_{HOUR_START:%Y_%m}"
+
+    removed = compact_partition(db, partition_name, heartbeat_minutes=60)
+
+    history = models.PlatformPriceHistory
+    remaining = db.scalars(
+        select(history.recorded_at).where(history.appearance_id == appearance_id).order_by(history.recorded_at)
+    ).all()
+    assert removed == 5
+    assert remaining == [HOUR_START, HOUR_START + timedelta(minutes=70), HOUR_START + timedelta(minutes=80)]
+
+    candle = db.get(models.PlatformPriceCandleHourly, (appearance_id, platform_id, HOUR_START))
+    assert (candle.open_price_cents, candle.close_price_cents, candle.quantity_on_sale_count) == (1000, 1000, 1)
+    assert candle.close_recorded_at == HOUR_START
+
+    latest_price = db.get(models.PlatformLatestPrice, (appearance_id, platform_id))
+    assert (latest_price.lowest_price_cents, latest_price.recorded_at) == (1100, HOUR_START + timedelta(minutes=80))
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.exc import DBAPIError
+
+import app.models as models
+import app.schemas as schemas
+from app.core.config import settings
+from app.crud import crud_platform_price_history
+from app.crud.crud_platform_price_history import REJECTED_EXPIRED
+from app.jobs.price_history_partitions import add_months, apply_retention, current_month, list_partitions
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+EXPIRED_MONTH = add_months(current_month(), -4)
+EXPIRED_PARTITION = f"platform_price_history_{EXPIRED_MONTH:%Y_%m}"
+
+
+def _history(appearance_id, platform_id, recorded_at) -> schemas.PlatformPriceHistoryCreate:
+    return schemas.PlatformPriceHistoryCreate(
+        appearance_id=appearance_id, platform_id=platform_id, lowest_price_cents=1000, recorded_at=recorded_at
+    )
+
+
+def _expired_recorded_at() -> datetime:
+    return datetime(EXPIRED_MONTH.year, EXPIRED_MONTH.month, 10, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def expired_month(db, catalog):
+    """A point stored in a month that the retention window of two months then detaches."""
+    (platform_id, _), (appearance_id, *_) = catalog
+    crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, _expired_recorded_at())]
+    )
+
+
+def test_backfill_creates_missing_partition(db, catalog):
+    (platform_id, _), (appearance_id, *_) = catalog
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories(
+        db, [_history(appearance_id, platform_id, _expired_recorded_at())]
+    ).data
+
+    assert ingest_result.inserted == 1
+    assert EXPIRED_MONTH in {month for _, month in list_partitions(db)}
+
+
+def test_retention_detaches_expired_months(db, expired_month):
+    expired_partitions = apply_retention(db, retention_months=2, action="detach")
+
+    assert expired_partitions == [EXPIRED_PARTITION]
+    assert EXPIRED_MONTH not in {month for _, month in list_partitions(db)}
+    assert db.scalar(select(func.count()).select_from(models.PlatformPriceHistory)) == 0
+
+
+def test_points_in_detached_months_are_rejected(db, catalog, expired_month, monkeypatch):
+    (platform_id, _), (appearance_id, *_) = catalog
+    apply_retention(db, retention_months=2, action="detach")
+    monkeypatch.setattr(settings, "PRICE_HISTORY_RETENTION_MONTHS", 2)
+
+    ingest_result = crud_platform_price_history.create_platform_price_histories(
+        db,
+        [_history(appearance_id, platform_id, _expired_recorded_at() + timedelta(days=1)),
+         _history(appearance_id, platform_id, NOW)]
+    ).data
+
+    assert ingest_result.inserted == 1
+    assert [(rejection.index, rejection.reason) for rejection in ingest_result.rejected] == [(0, REJECTED_EXPIRED)]
+
+
+def test_detached_partition_is_not_recreated(db, expired_month):
+    apply_retention(db, retention_months=2, action="detach")
+
+    with pytest.raises(DBAPIError, match="not attached"):
+        db.execute(select(func.create_platform_price_history_partition(EXPIRED_MONTH)))
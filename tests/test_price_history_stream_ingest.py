@@ -0,0 +1,82 @@
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import func, select
+
+import app.models as models
+from app.core.result_codes import ResultCode
+
+STREAM_URL = "/platform-price-histories/stream"
+
+
+def _ndjson(rows) -> bytes:
+    return "".join(json.dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+def _rows(catalog, count=3):
+    (platform_id, _), (appearance_id, *_) = catalog
+    start = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(hours=count)
+    return [
+        {
+            "appearance_id": appearance_id,
+            "platform_id": platform_id,
+            "lowest_price_cents": 1000 + index,
+            "recorded_at": (start + timedelta(hours=index)).isoformat(),
+        }
+        for index in range(count)
+    ]
+
+
+def _stored_points(db) -> int:
+    return db.scalar(select(func.count()).select_from(models.PlatformPriceHistory))
+
+
+def test_csv_stream_is_ingested(client, db, catalog):
+    rows = _rows(catalog)
+    body = "appearance_id,platform_id,lowest_price_cents,recorded_at\n" + "".join(
+        f"{row['appearance_id']},{row['platform_id']},{row['lowest_price_cents']},{row['recorded_at']}\n"
+        for row in rows
+    )
+
+    response = client.post(STREAM_URL, content=body.encode("utf-8"), headers={"Content-Type": "text/csv"})
+
+    assert response.status_code == 201
+    assert response.json()["data"]["inserted"] == len(rows)
+    assert _stored_points(db) == len(rows)
+
+
+def test_gzipped_ndjson_stream_is_ingested(client, db, catalog):
+    rows = _rows(catalog)
+
+    response = client.post(
+        STREAM_URL,
+        content=gzip.compress(_ndjson(rows)),
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 201
+    assert _stored_points(db) == len(rows)
+
+
+def test_malformed_ndjson_line_is_rejected(client, db, catalog):
+    body = _ndjson(_rows(catalog)) + b"{not json\n"
+
+    response = client.post(STREAM_URL, content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 400
+    assert response.json()["code"] == ResultCode.INVALID_PRICE_HISTORY_STREAM.code
+    assert _stored_points(db) == 0
+
+
+def test_corrupt_gzip_body_is_rejected(client, db, catalog):
+    body = gzip.compress(_ndjson(_rows(catalog)))[:-12] + b"garbage-tail"
+
+    response = client.post(
+        STREAM_URL,
+        content=body,
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+    )
+
+    assert response.status_code == 400
+    assert _stored_points(db) == 0
@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.services.price_outlier_filter import PriceOutlierFilter, _log_prices
+
+KEY = (1, 1)
+
+
+def _filter(rebase_points: int = 5) -> PriceOutlierFilter:
+    price_filter = PriceOutlierFilter(
+        threshold=10, window=30, min_points=5, min_spread=0.1, max_series=100, rebase_points=rebase_points
+    )
+    # 预先放入参考窗口，check 不会再查库
+    rng = np.random.default_rng(0)
+    price_filter._store(KEY, _log_prices(np.rint(1000 * np.exp(rng.normal(0, 0.03, 30)))))
+    return price_filter
+
+
+def _is_outlier(price_filter: PriceOutlierFilter, price: int) -> bool:
+    outlier_check = price_filter.check(None, np.array([KEY[0]]), np.array([KEY[1]]), np.array([price]))
+    return bool(outlier_check.is_outlier[0])
+
+
+def test_genuine_level_shift_rebases_window():
+    price_filter = _filter()
+    new_level = [5000, 5010, 4990, 5005, 4995]
+    assert all(_is_outlier(price_filter, price) for price in new_level)
+    assert not price_filter.is_level_shift(new_level[:4])
+    assert price_filter.is_level_shift(new_level)
+
+    price_filter.record([(*KEY, price) for price in new_level])
+    assert not _is_outlier(price_filter, 5003)
+    assert _is_outlier(price_filter, 1000)
+
+
+def test_inconsistent_points_are_not_a_level_shift():
+    price_filter = _filter()
+    assert not price_filter.is_level_shift([1, 100000, 5000, 20, 700000])
+
+    price_filter.record([(*KEY, 1000), (*KEY, 1010)])
+    assert _is_outlier(price_filter, 5000)
+
+
+def test_level_shift_disabled():
+    price_filter = _filter(rebase_points=0)
+    new_level = [5000, 5010, 4990, 5005, 4995]
+    assert not price_filter.is_level_shift(new_level)
+
+    price_filter.record([(*KEY, price) for price in new_level])
+    assert _is_outlier(price_filter, 5003)
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import update
+
+import app.models as models
+import app.schemas as schemas
+from app.crud import crud_user_position, crud_user_purchase_transaction, crud_user_sale_transaction
+
+TRADED_AT = datetime(2025, 3, 10, tzinfo=timezone.utc)
+
+
+def _purchase(appearance_id, quantity, unit_price_cents) -> schemas.UserPurchaseTransactionCreate:
+    return schemas.UserPurchaseTransactionCreate(
+        appearance_id=appearance_id, quantity=quantity, unit_price_cents=unit_price_cents, purchased_at=TRADED_AT
+    )
+
+
+def _sale(appearance_id, quantity, unit_price_cents, platform_fee_cents=0) -> schemas.UserSaleTransactionCreate:
+    return schemas.UserSaleTransactionCreate(
+        appearance_id=appearance_id, quantity=quantity, unit_price_cents=unit_price_cents,
+        platform_fee_cents=platform_fee_cents, sold_at=TRADED_AT
+    )
+
+
+def _position_sums(db, user_id, appearance_id):
+    position = db.get(models.UserPosition, (user_id, appearance_id), populate_existing=True)
+    if position is None:
+        return None
+    return tuple(getattr(position, column) for column in crud_user_position.POSITION_SUM_COLUMNS)
+
+
+def test_transaction_edits_keep_positions_in_sync(db, catalog, admin_user):
+    _, (appearance_id, other_appearance_id, _) = catalog
+    user_id = admin_user.id
+
+    first_purchase = crud_user_purchase_transaction.create_user_purchase_transaction(
+        db, user_id, _purchase(appearance_id, 4, 1000)
+    ).data
+    crud_user_purchase_transaction.create_user_purchase_transaction(db, user_id, _purchase(appearance_id, 2, 1300))
+    sale = crud_user_sale_transaction.create_user_sale_transaction(
+        db, user_id, _sale(appearance_id, 3, 1500, platform_fee_cents=100)
+    ).data
+    # 修改交易的外观后，两个外观的持仓都要随之调整
+    crud_user_purchase_transaction.update_user_purchase_transaction(
+        db, user_id, first_purchase.id,
+        schemas.UserPurchaseTransactionUpdate(**_purchase(other_appearance_id, 5, 900).model_dump())
+    )
+    crud_user_sale_transaction.update_user_sale_transaction(
+        db, user_id, sale.id, schemas.UserSaleTransactionUpdate(**_sale(appearance_id, 1, 1500).model_dump())
+    )
+
+    assert _position_sums(db, user_id, appearance_id) == (2, 2600, 1, 1500)
+    assert _position_sums(db, user_id, other_appearance_id) == (5, 4500, 0, 0)
+    assert crud_user_position.verify_user_positions(db) == []
+
+    crud_user_purchase_transaction.delete_user_purchase_transaction(db, user_id, first_purchase.id)
+
+    assert _position_sums(db, user_id, other_appearance_id) is None
+    assert crud_user_position.verify_user_positions(db) == []
+
+
+def test_rebuild_repairs_drift(db, catalog, admin_user):
+    _, (appearance_id, *_) = catalog
+    user_id = admin_user.id
+    crud_user_purchase_transaction.create_user_purchase_transaction(db, user_id, _purchase(appearance_id, 4, 1000))
+    crud_user_sale_transaction.create_user_sale_transaction(db, user_id, _sale(appearance_id, 1, 1200))
+    # 绕过交易接口直接改 SQL，持仓与交易不再一致
+    db.execute(update(models.UserPurchaseTransaction).values(quantity=6))
+    db.commit()
+
+    assert crud_user_position.verify_user_positions(db) == [(user_id, appearance_id)]
+
+    assert crud_user_position.rebuild_user_positions(db) == 1
+    assert crud_user_position.verify_user_positions(db) == []
+    assert _position_sums(db, user_id, appearance_id) == (6, 6000, 1, 1200)